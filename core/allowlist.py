@@ -0,0 +1,90 @@
+"""IP allowlists compiled for fast membership tests.
+
+Entries are addresses or CIDR blocks, IPv4 or IPv6. They are compiled once
+into sorted, merged ``[start, end]`` integer intervals per IP version, so a
+lookup is one `bisect` over however many ranges are configured, and the
+client address is parsed exactly once. IPv4-mapped IPv6 addresses
+(``::ffff:10.0.0.1``) are checked as IPv4.
+"""
+import ipaddress
+from bisect import bisect_right
+
+# Not addresses, but they appear in allowlists for local development
+ALIASES = {
+    'localhost': ('127.0.0.1', '::1'),
+}
+
+
+def parse_ip(value):
+    """Return an `ip_address` for `value`, or None if it isn't one."""
+    try:
+        address = ipaddress.ip_address(value.strip())
+    except (AttributeError, ValueError):
+        return None
+    if address.version == 6 and address.ipv4_mapped:
+        return address.ipv4_mapped
+    return address
+
+
+class IPAllowlist:
+    def __init__(self, entries):
+        ranges = {4: [], 6: []}
+        for entry in entries:
+            for value in ALIASES.get(entry.strip().lower(), (entry,)):
+                # strict=False accepts host bits, e.g. "10.1.2.3/8"
+                network = ipaddress.ip_network(value.strip(), strict=False)
+                ranges[network.version].append((int(network.network_address), int(network.broadcast_address)))
+        self._starts, self._ends = {}, {}
+        for version, intervals in ranges.items():
+            merged = []
+            for start, end in sorted(intervals):
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._starts[version] = [start for start, _end in merged]
+            self._ends[version] = [end for _start, end in merged]
+
+    def __len__(self):
+        return sum(len(starts) for starts in self._starts.values())
+
+    def __contains__(self, address):
+        """`address` is a string or an `ip_address`."""
+        if isinstance(address, str):
+            address = parse_ip(address)
+        elif address is not None and address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if address is None:
+            return False
+        value = int(address)
+        starts = self._starts[address.version]
+        index = bisect_right(starts, value) - 1
+        return index >= 0 and value <= self._ends[address.version][index]
+
+
+def client_ip(meta, trusted_proxies=0):
+    """The client's `ip_address` from request META, or None.
+
+    With `trusted_proxies` = 0, X-Forwarded-For is ignored and REMOTE_ADDR
+    is the client. Behind N proxies that each append the address they
+    received the request from, the client is the N-th entry from the right;
+    anything further left was supplied by the client and can't be trusted.
+    """
+    if not trusted_proxies:
+        return parse_ip(meta.get('REMOTE_ADDR'))
+    hops = [hop for hop in meta.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    if len(hops) < trusted_proxies:
+        # Not (or not fully) proxied as configured: don't guess
+        return None
+    return parse_ip(hops[-trusted_proxies])
+
+
+def visitor_ip(meta, trusted_proxies=0):
+    """The client address as a string, for keying per-visitor counters.
+
+    Same as `client_ip`, but a request that didn't come through the proxies
+    (e.g. one served by runserver) falls back to REMOTE_ADDR instead of
+    None. Use `client_ip` for access control.
+    """
+    address = client_ip(meta, trusted_proxies)
+    return str(address) if address is not None else meta.get('REMOTE_ADDR') or None
@@ -0,0 +1,141 @@
+"""Primary/replica routing for the read-heavy public pages.
+
+Everything goes to ``default`` (the primary) unless three things hold:
+- replicas are configured (`settings.DATABASE_REPLICAS`);
+- the code runs inside `replica_reads()`, which the listing, detail and
+  sitemap views use;
+- the request has neither written anything itself nor carries the sticky
+  cookie that `ReplicaRoutingMiddleware` sets after a write.
+
+Any write moves the rest of its request to the primary. The sticky
+cookie then keeps the visitor on the primary for `REPLICA_STICKY_SECONDS`
+after a POST (or other unsafe method) that wrote, e.g. a comment or a
+like. Replica lag therefore never hides the visitor's own changes.
+Other visitors may see them a little late. GETs never set the cookie: a
+write there is housekeeping (a session touch, a buffered view-count
+flush), and the cookie would keep the response out of the page cache.
+Housekeeping that runs inside a request should also use `unrouted()` so
+it doesn't pin that request either.
+
+Outside a request, e.g. in management commands, signal handlers run from
+the shell, or streamed response bodies, reads use the primary.
+
+Caveat: with PAGE_CACHE_ENABLED, a page rendered from a lagging replica
+right after an invalidation is cached as is. Keep replica lag well
+below the time readers would notice.
+"""
+import random
+import time
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PRIMARY = 'default'
+STICKY_COOKIE = 'db_primary_until'
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """Per-request routing decisions."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica_depth = 0
+        self._replica = None
+
+    def replica(self):
+        if self.pinned or self.wrote or not self.replica_depth:
+            return None
+        if self._replica is None:
+            # One replica per request, so its reads see a single snapshot
+            self._replica = random.choice(settings.DATABASE_REPLICAS)
+        return self._replica
+
+
+class replica_reads(ContextDecorator):
+    """Allow the reads in this block (or view) to go to a replica."""
+
+    def __enter__(self):
+        state = _routing.get()
+        if state is not None:
+            state.replica_depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        state = _routing.get()
+        if state is not None:
+            state.replica_depth -= 1
+        return False
+
+
+class unrouted(ContextDecorator):
+    """Run this block as if outside any request.
+
+    Its writes don't count as the visitor's, so they neither move the
+    request to the primary nor set the sticky cookie.
+    """
+
+    def __enter__(self):
+        self._token = _routing.set(None)
+        return self
+
+    def __exit__(self, *exc):
+        _routing.reset(self._token)
+        return False
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not getattr(settings, 'DATABASE_REPLICAS', None):
+            return None
+        return state.replica()
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # Later reads in this request, and the visitor's next requests,
+            # must see this write
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema by copying the primary
+        return db not in getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+class ReplicaRoutingMiddleware:
+    """Track writes per request and pin writers to the primary for a while."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+    def __call__(self, request):
+        now = time.time()
+        try:
+            pinned_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        state = RoutingState(pinned=pinned_until > now)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if state.wrote and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                STICKY_COOKIE, str(int(now + self.sticky_seconds) + 1),
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
@@ -1,32 +1,194 @@
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
 from django.http import HttpResponseForbidden
 
+from .allowlist import IPAllowlist, client_ip
+
+timing_logger = logging.getLogger('core.request_timing')
+
+# Metrics of the request being handled in this thread/task, if any
+_current_metrics = ContextVar('request_metrics', default=None)
+_MISSING = object()
+
 
 class AdminIPRestrictionMiddleware:
     """Reject requests to the admin URL that don't originate from allowed IPs.
 
-    Reads `settings.ADMIN_ALLOWED_IPS` and `settings.ADMIN_URL`. Checks the
-    request's IP using X-Forwarded-For (if present) falling back to REMOTE_ADDR.
+    Reads `settings.ADMIN_ALLOWED_IPS` (addresses or CIDR blocks, IPv4 or
+    IPv6) and `settings.ADMIN_URL`. The allowlist is compiled once here;
+    see core/allowlist.py. X-Forwarded-For is only consulted when
+    `settings.TRUSTED_PROXY_COUNT` says how many proxies append to it.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
         self.admin_url = '/' + settings.ADMIN_URL.strip('/') + '/' if settings.ADMIN_URL else '/admin/'
-        # Normalize allowed IPs
-        self.allowed = set(settings.ADMIN_ALLOWED_IPS or [])
+        try:
+            self.allowed = IPAllowlist(settings.ADMIN_ALLOWED_IPS or [])
+        except ValueError as exc:
+            raise ImproperlyConfigured(f'ADMIN_ALLOWED_IPS: {exc}')
+        self.trusted_proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 1)
 
     def __call__(self, request):
-        path = request.path
-        if path.startswith(self.admin_url):
-            # Determine client IP
-            xff = request.META.get('HTTP_X_FORWARDED_FOR')
-            if xff:
-                # X-Forwarded-For may contain multiple IPs
-                client_ip = xff.split(',')[0].strip()
-            else:
-                client_ip = request.META.get('REMOTE_ADDR')
-
-            if client_ip not in self.allowed:
+        if request.path.startswith(self.admin_url):
+            if client_ip(request.META, self.trusted_proxies) not in self.allowed:
                 return HttpResponseForbidden('Access to admin is restricted')
 
         return self.get_response(request)
+
+
+class RequestMetrics:
+    def __init__(self, keep_queries=False):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.queries = [] if keep_queries else None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_count += 1
+            self.sql_time += elapsed
+            if self.queries is not None:
+                self.queries.append((elapsed, sql))
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;desc="SQL ({self.sql_count} queries)";dur={self.sql_time * 1000:.1f}',
+            f'tpl;desc="Templates";dur={self.template_time * 1000:.1f}',
+            f'cache;desc="Cache {self.cache_hits} hits / {self.cache_misses} misses"',
+            f'total;desc="View";dur={total * 1000:.1f}',
+        ])
+
+
+def _install_hooks():
+    """Wrap template rendering and cache reads once per process.
+
+    The wrappers only do work while a request is being instrumented, so
+    requests outside the middleware (management commands, tests) pay a
+    single ContextVar lookup.
+    """
+    from django.core.cache import caches
+    from django.template.base import Template
+
+    for backend in {type(caches[alias]) for alias in settings.CACHES}:
+        _count_cache_reads(backend)
+
+    if getattr(Template.render, '_timed', False):
+        return
+    render = Template.render
+
+    def timed_render(template, context):
+        metrics = _current_metrics.get()
+        # Included templates render inside their parent; time the outermost only
+        if metrics is None or metrics.template_depth:
+            return render(template, context)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(template, context)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.template_depth -= 1
+
+    timed_render._timed = True
+    Template.render = timed_render
+
+
+def _count_cache_reads(backend):
+    if getattr(backend.get, '_counted', False):
+        return
+    get, get_many = backend.get, backend.get_many
+
+    def counted_get(self, key, default=None, version=None):
+        metrics = _current_metrics.get()
+        # BaseCache.get_many() calls get() per key; those are counted there
+        if metrics is None or metrics.cache_depth:
+            return get(self, key, default, version)
+        value = get(self, key, _MISSING, version)
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+
+    def counted_get_many(self, keys, version=None):
+        metrics = _current_metrics.get()
+        if metrics is None or metrics.cache_depth:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        metrics.cache_depth += 1
+        try:
+            values = get_many(self, keys, version)
+        finally:
+            metrics.cache_depth -= 1
+        metrics.cache_hits += len(values)
+        metrics.cache_misses += len(keys) - len(values)
+        return values
+
+    counted_get._counted = True
+    backend.get, backend.get_many = counted_get, counted_get_many
+
+
+class RequestTimingMiddleware:
+    """Measure where each request spends its time.
+
+    Counts SQL queries and their time (via `connection.execute_wrapper` on
+    every database), top-level template render time and cache hits/misses,
+    and reports them in a `Server-Timing` header that browser dev tools
+    show under the request's timing tab. Requests slower than
+    `REQUEST_TIMING_SLOW_MS` are logged to `core.request_timing` with their
+    queries.
+
+    With `REQUEST_TIMING_ENABLED` off the middleware removes itself from
+    the stack at startup, so it costs nothing.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', 0)
+        self.send_header = getattr(settings, 'REQUEST_TIMING_HEADER', True)
+        _install_hooks()
+
+    def __call__(self, request):
+        from django.db import connections
+
+        metrics = RequestMetrics(keep_queries=bool(self.slow_ms))
+        token = _current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        total = time.perf_counter() - started
+
+        if self.send_header:
+            response['Server-Timing'] = metrics.server_timing(total)
+        if self.slow_ms and total * 1000 >= self.slow_ms:
+            self.log_slow(request, metrics, total)
+        return response
+
+    def log_slow(self, request, metrics, total):
+        queries = '\n'.join(f'  {elapsed * 1000:7.1f}ms  {sql}' for elapsed, sql in metrics.queries[:100])
+        timing_logger.warning(
+            'Slow request: %s %s took %.0fms (%d queries, %.0fms SQL, %.0fms templates)\n%s',
+            request.method, request.get_full_path(), total * 1000,
+            metrics.sql_count, metrics.sql_time * 1000, metrics.template_time * 1000, queries,
+        )
@@ -64,8 +64,18 @@ SECURE_HSTS_PRELOAD = False if DEBUG else True
 SESSION_COOKIE_SECURE = False if DEBUG else True
 CSRF_COOKIE_SECURE = False if DEBUG else True
 
+# Reverse proxies in front of Django that append to X-Forwarded-For (nginx in
+# production); 0 ignores the header. Decides the client address for the admin
+# allowlist, rate limits, anonymous likes and view de-duplication.
+# ADMIN_TRUSTED_PROXIES is the variable's former name.
+TRUSTED_PROXY_COUNT = env.int('TRUSTED_PROXY_COUNT', default=env.int('ADMIN_TRUSTED_PROXIES', default=1))
+
 # Admin Security Settings
-ADMIN_ALLOWED_IPS = env.list('ADMIN_ALLOWED_IPS', default=['127.0.0.1', 'localhost', '84.74.115.21'])  # Add local IPs for testing
+# Addresses or CIDR blocks such as 10.8.0.0/16 or 2001:db8::/32. Loopback is
+# left out on purpose: behind nginx every request arrives from 127.0.0.1, so
+# allowing it would let anyone in if the proxy count above were wrong. For
+# runserver, set ADMIN_ALLOWED_IPS=127.0.0.1 and TRUSTED_PROXY_COUNT=0.
+ADMIN_ALLOWED_IPS = env.list('ADMIN_ALLOWED_IPS', default=['84.74.115.21'])
 ADMIN_URL = 'control-panel-72d3/'
 ADMIN_HONEYPOT = False  # Enable admin honeypot protection
 
@@ -234,6 +244,30 @@ CACHES = {
         'LOCATION': BASE_DIR / 'django_cache',
     }
 }
+# Rate limit counters go to Redis when it is available, where incr is atomic
+# and shared by all gunicorn workers (see RATE_LIMIT_CACHE_ALIAS below)
+REDIS_URL = env('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES['ratelimit'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+
+# Tests swap the file cache for an in-memory one (see core.test_runner)
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Anonymous full-page cache (see website.page_cache). Off by default in
+# development so template edits show up immediately.
+PAGE_CACHE_ENABLED = env.bool('PAGE_CACHE_ENABLED', default=not DEBUG)
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=600)  # seconds
+PAGE_CACHE_ALIAS = 'default'
+
+# Buffered Article.view_count updates (see website.view_counter)
+# 'local' buffers per worker process and flushes from inside it; 'cache' is
+# shared, and only then can the flush_view_counts command flush it
+VIEW_COUNT_BUFFER = env('VIEW_COUNT_BUFFER', default='local')
+VIEW_COUNT_FLUSH_INTERVAL = 30  # seconds between batched UPDATEs
+VIEW_COUNT_DEDUPE_WINDOW = 1800  # ignore repeat views per session/IP; 0 disables
 
 # Session settings
 # Session settings
@@ -262,6 +296,40 @@ LOGIN_URL = 'admin:login'
 
 # Custom settings
 ARTICLES_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20  # approved comments per page on article pages and /comments/
+SITEMAP_SHARD_SIZE = 10000  # article ids per sitemap shard (the protocol allows 50,000 URLs)
+IMAGE_DERIVATIVE_WIDTHS = (480, 800, 1200)  # featured image widths generated as WebP and JPEG
+BENCHMARK_REGRESSION_THRESHOLD = 0.25  # `manage.py benchmark` fails when a view's p95 grows by more than this
+POPULAR_TAGS_LIMIT = 10  # tags exposed to templates as POPULAR_TAGS
+POPULAR_TAGS_HALF_LIFE_DAYS = env.int('POPULAR_TAGS_HALF_LIFE_DAYS', default=0)  # 0 ranks by plain usage count
+POPULAR_TAGS_TIMEOUT = 3600  # seconds; also how stale recency-decayed scores can get
+NEWSLETTER_CONNECTIONS = 2  # parallel SMTP connections used by `manage.py send_newsletter`
+NEWSLETTER_BATCH_SIZE = 100  # deliveries sent and recorded per batch
+NEWSLETTER_RATE_LIMIT = env.float('NEWSLETTER_RATE_LIMIT', default=10)  # messages/second across connections, 0 = unthrottled
+NEWSLETTER_MAX_ATTEMPTS = 3  # tries per recipient before a delivery stays failed
+# Mailbox behind the List-Unsubscribe header and the footer link of every issue
+NEWSLETTER_UNSUBSCRIBE_EMAIL = env('NEWSLETTER_UNSUBSCRIBE_EMAIL', default='unsubscribe@fintechrp.com')
+
+# Per-visitor limits on the write endpoints (see website.ratelimit): "N/period"
+# allows bursts of N and N per period sustained. Keyed by user, else by IP.
+# Counters need an atomic, shared cache (Redis/Memcached) to be exact; the
+# file cache can lose increments under concurrent workers, so without
+# REDIS_URL the check website.W001 warns whenever DEBUG is off.
+RATE_LIMIT_CACHE_ALIAS = 'ratelimit' if REDIS_URL else 'default'
+RATE_LIMIT_ENABLED = env.bool('RATE_LIMIT_ENABLED', default=True)
+RATE_LIMITS = {
+    'like': '30/m',
+    'comment': '5/m',
+    'contact': '5/h',
+    'newsletter': '10/h',
+}
+
+# Per-request instrumentation (core.middleware.RequestTimingMiddleware)
+REQUEST_TIMING_ENABLED = env.bool('REQUEST_TIMING_ENABLED', default=True)
+REQUEST_TIMING_HEADER = env.bool('REQUEST_TIMING_HEADER', default=True)  # send Server-Timing
+REQUEST_TIMING_SLOW_MS = env.int('REQUEST_TIMING_SLOW_MS', default=500)  # log slower requests with their queries; 0 disables
+SEARCH_RESULTS_LIMIT = 100  # max ranked hits returned for ?q= searches
+# SEARCH_BACKEND = 'website.search.DatabaseSearchBackend'  # default is chosen by database vendor
 PREMIUM_SUBSCRIPTION_PRICE = 9.99  # monthly subscription price
 
 # ... you should already have BASE_DIR defined near the top like:
@@ -306,6 +374,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so its total covers the whole stack; removes itself when disabled
+    'core.middleware.RequestTimingMiddleware',
+    # Before sessions so session saves count as writes; removes itself without replicas
+    'core.db_routing.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -337,12 +409,49 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# SQLite tuned for several gunicorn workers sharing one file; compare the
+# profiles with utils/bench_sqlite_concurrency.py. WAL lets readers run while
+# one connection writes; IMMEDIATE transactions take the write lock when they
+# begin, so concurrent writers wait out busy_timeout instead of failing on a
+# read-to-write lock upgrade; connections persist for DB_CONN_MAX_AGE seconds
+# so the pragmas run once per connection, not once per request.
+SQLITE_TUNING = env.bool('SQLITE_TUNING', default=True)
+SQLITE_BUSY_TIMEOUT = env.int('SQLITE_BUSY_TIMEOUT', default=5000)  # milliseconds
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # durable in WAL mode except for the last commits on power loss
+    'busy_timeout': SQLITE_BUSY_TIMEOUT,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative = KiB, i.e. 64 MiB per connection
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': env('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
     }
 }
+if SQLITE_TUNING:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT / 1000,
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+    })
+
+# Read replicas (see core/db_routing.py): comma-separated SQLite paths, each
+# registered as replica_1, replica_2, ... Locally, `manage.py sync_sqlite_replicas`
+# copies the primary into them.
+DATABASE_REPLICAS = []
+for _index, _path in enumerate(env.list('DATABASE_REPLICAS', default=[]), start=1):
+    DATABASES[f'replica_{_index}'] = {**DATABASES['default'], 'NAME': _path, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{_index}')
+DATABASE_ROUTERS = ['core.db_routing.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=10)  # reads stay on the primary this long after a write
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
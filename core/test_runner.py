@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Run the suite against an in-memory cache.
+
+    The file cache in BASE_DIR/django_cache would otherwise collect page
+    cache generations, sitemap and view counter keys, leaving files in the
+    working tree and sharing state between runs. The rate limit cache check
+    (website.W001) is silenced since the suite deliberately runs without Redis.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+        }, SILENCED_SYSTEM_CHECKS=[*settings.SILENCED_SYSTEM_CHECKS, 'website.W001'])
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -2,14 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 # from django.conf import settings
 # from django.conf.urls.static import static
-# from django.contrib.sitemaps.views import sitemap
 # from django.views.generic import TemplateView
-# from website.sitemaps import ArticleSitemap, StaticSitemap
-
-# sitemaps = {
-#    'articles': ArticleSitemap,
-#    'static': StaticSitemap,
-#}
+from website import sitemaps
 
 urlpatterns = [
 # Use a custom admin URL for security in development to mirror production
@@ -19,7 +13,9 @@ urlpatterns = [
     path('ckeditor/', include('ckeditor_uploader.urls')),
     
     # SEO
- #   path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='sitemap'),
+    path('sitemap.xml', sitemaps.index, name='sitemap'),
+    path('sitemap-static.xml', sitemaps.static_pages, name='sitemap_static'),
+    path('sitemap-articles-<int:shard>.xml', sitemaps.articles, name='sitemap_articles'),
  #   path('robots.txt', TemplateView.as_view(template_name="robots.txt", content_type="text/plain")),
     
     # Main app
@@ -0,0 +1,88 @@
+"""Microbenchmark for the admin IP allowlist (core/allowlist.py).
+
+Times a lookup against N random IPv4/IPv6 CIDR blocks for the compiled
+`IPAllowlist` and for the naive ``any(ip in network for network in ...)``
+scan, including parsing the client address as the middleware does.
+
+    python utils/bench_admin_allowlist.py
+    python utils/bench_admin_allowlist.py --sizes 10,1000,10000 --lookups 20000
+"""
+import argparse
+import ipaddress
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.allowlist import IPAllowlist, parse_ip  # noqa: E402
+
+
+def random_networks(rng, count):
+    networks = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            prefix = rng.randint(16, 32)
+            address = ipaddress.IPv4Address(rng.getrandbits(32))
+        else:
+            prefix = rng.randint(32, 64)
+            address = ipaddress.IPv6Address(rng.getrandbits(128))
+        networks.append(str(ipaddress.ip_network(f'{address}/{prefix}', strict=False)))
+    return networks
+
+
+def random_addresses(rng, networks, count):
+    """Half inside a configured block, half random."""
+    addresses = []
+    for i in range(count):
+        if i % 2:
+            network = ipaddress.ip_network(rng.choice(networks))
+            offset = rng.randrange(network.num_addresses)
+            addresses.append(str(network.network_address + offset))
+        elif rng.random() < 0.7:
+            addresses.append(str(ipaddress.IPv4Address(rng.getrandbits(32))))
+        else:
+            addresses.append(str(ipaddress.IPv6Address(rng.getrandbits(128))))
+    return addresses
+
+
+def per_lookup(func, addresses):
+    started = time.perf_counter()
+    for address in addresses:
+        func(address)
+    return (time.perf_counter() - started) / len(addresses)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='Comma-separated allowlist sizes')
+    parser.add_argument('--lookups', type=int, default=5000, help='Lookups timed per size (default: 5000)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    print(f"{'ranges':>8}{'compile':>12}{'compiled':>12}{'linear scan':>14}{'speedup':>10}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        networks = random_networks(rng, size)
+        addresses = random_addresses(rng, networks, args.lookups)
+
+        started = time.perf_counter()
+        allowlist = IPAllowlist(networks)
+        compile_time = time.perf_counter() - started
+        parsed = [ipaddress.ip_network(n) for n in networks]
+
+        def linear(address):
+            ip = parse_ip(address)
+            return any(ip in network for network in parsed)
+
+        compiled = per_lookup(allowlist.__contains__, addresses)
+        # The scan is O(ranges); time fewer lookups at large sizes
+        scan = per_lookup(linear, addresses[:max(100, args.lookups * 100 // size)])
+        assert [a in allowlist for a in addresses[:200]] == [linear(a) for a in addresses[:200]]
+        print(f'{size:>8}{compile_time * 1000:>10.1f}ms{compiled * 1e6:>10.2f}us'
+              f'{scan * 1e6:>12.1f}us{scan / compiled:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Concurrency benchmark for the SQLite profiles in core/settings.py.
+
+Seeds a throwaway database with `generate_corpus`, then for each profile
+runs ``--workers`` processes against its own copy for ``--duration``
+seconds. Each worker mixes article reads with like toggles and comment
+inserts, as gunicorn workers would, and the script reports throughput,
+p95 latency and "database is locked" errors per profile.
+
+    python utils/bench_sqlite_concurrency.py
+    python utils/bench_sqlite_concurrency.py --workers 8 --duration 20 --write-ratio 0.5
+
+Profiles: ``default`` is Django's stock SQLite setup (SQLITE_TUNING=0),
+``tuned`` the WAL/IMMEDIATE/pragmas profile used in production.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROFILES = {'default': '0', 'tuned': '1'}
+
+
+def django_env(db_path, tuning):
+    return {**os.environ, 'DJANGO_SETTINGS_MODULE': 'core.settings', 'SQLITE_PATH': str(db_path),
+            'SQLITE_TUNING': tuning}
+
+
+def _seed(db_path, articles):
+    os.environ.update(django_env(db_path, '0'))
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.test.utils import override_settings
+
+    # generate_corpus invalidates sitemaps, tags and pages; keep that out of
+    # the configured (shared, on-disk) cache
+    with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+        call_command('migrate', verbosity=0)
+        call_command('generate_corpus', articles=articles, seed=1, comments_per_article=3,
+                     skip_search_index=True, stdout=io.StringIO())
+
+
+def seed(db_path, articles):
+    process = multiprocessing.get_context('spawn').Process(target=_seed, args=(db_path, articles))
+    process.start()
+    process.join()
+    if process.exitcode:
+        raise SystemExit(f'Seeding failed (exit code {process.exitcode})')
+
+
+def worker(db_path, tuning, duration, write_ratio, seed_value, start_at):
+    os.environ.update(django_env(db_path, tuning))
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+    from django.db import OperationalError, close_old_connections
+    from django.test.utils import override_settings
+
+    from website.models import Article, Comment, Like
+
+    # Keep signal receivers' cache writes out of the shared file cache
+    override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}).enable()
+
+    rng = random.Random(seed_value)
+    articles = list(Article.objects.published().values_list('pk', 'slug'))
+    result = {'reads': 0, 'writes': 0, 'locked': 0, 'errors': 0, 'latencies': []}
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        pk, slug = rng.choice(articles)
+        started = time.perf_counter()
+        try:
+            roll = rng.random()
+            if roll >= write_ratio:
+                article = Article.objects.published().only('pk', 'title', 'body').get(slug=slug)
+                list(article.comments.filter(is_approved=True).values_list('name', 'body')[:20])
+                result['reads'] += 1
+            elif roll < write_ratio * 0.7:
+                Like.objects.set_liked(pk, None, ip_address=f'10.{rng.randrange(256)}.{rng.randrange(256)}.1')
+                result['writes'] += 1
+            else:
+                Comment.objects.create(article_id=pk, name='Bench', email='bench@example.com',
+                                       body='Load test comment', is_approved=rng.random() < 0.5)
+                result['writes'] += 1
+        except OperationalError as exc:
+            result['locked' if 'locked' in str(exc) else 'errors'] += 1
+            close_old_connections()
+            continue
+        result['latencies'].append(time.perf_counter() - started)
+    return result
+
+
+def run_profile(db_path, tuning, args):
+    start_at = time.time() + 2  # let every process finish django.setup() first
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(args.workers) as pool:
+        results = pool.starmap(worker, [
+            (db_path, tuning, args.duration, args.write_ratio, args.seed + i, start_at)
+            for i in range(args.workers)
+        ])
+    latencies = sorted(lat for r in results for lat in r['latencies'])
+    totals = {key: sum(r[key] for r in results) for key in ('reads', 'writes', 'locked', 'errors')}
+    totals['ops_per_s'] = (totals['reads'] + totals['writes']) / args.duration
+    totals['p50_ms'] = statistics.median(latencies) * 1000 if latencies else 0.0
+    totals['p95_ms'] = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mixed read/write SQLite benchmark across processes.')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes (default: 4)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per profile (default: 10)')
+    parser.add_argument('--write-ratio', type=float, default=0.3, help='Share of writes (default: 0.3)')
+    parser.add_argument('--articles', type=int, default=300, help='Seeded articles (default: 300)')
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='Comma-separated subset of default,tuned')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix='sqlite-bench-'))
+    try:
+        base = workdir / 'seed.sqlite3'
+        print(f'Seeding {args.articles} articles into {base} ...')
+        seed(base, args.articles)
+
+        print(f"{'profile':<10}{'ops/s':>10}{'reads':>9}{'writes':>9}{'locked':>9}{'errors':>8}"
+              f"{'p50':>10}{'p95':>10}")
+        for name in args.profiles.split(','):
+            db_path = workdir / f'{name}.sqlite3'
+            shutil.copy(base, db_path)
+            row = run_profile(db_path, PROFILES[name], args)
+            print(f"{name:<10}{row['ops_per_s']:>10.0f}{row['reads']:>9}{row['writes']:>9}{row['locked']:>9}"
+                  f"{row['errors']:>8}{row['p50_ms']:>8.2f}ms{row['p95_ms']:>8.2f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
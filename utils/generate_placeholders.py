@@ -1,103 +1,221 @@
-from PIL import Image, ImageDraw, ImageFont
+"""Generate the placeholder images in static/img.
+
+Every category in Article.CATEGORY_CHOICES gets a banner and numbered card
+thumbnails in each requested format, e.g. ``real-estate-2.webp``. Images
+are rendered in parallel processes; backgrounds, patterns and shapes are
+computed as NumPy arrays rather than drawn pixel row by pixel row. Output
+is deterministic for a given ``--seed``.
+
+    python utils/generate_placeholders.py
+    python utils/generate_placeholders.py --formats webp --sizes card --workers 4
+
+NumPy is a development dependency: pip install -r requirements-dev.txt
+"""
+import argparse
 import os
-from random import randint, choice
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# name: (width, height, variants); variants=None means a single unnumbered image
+SIZES = {
+    'banner': (1200, 400, None),
+    'card': (800, 600, 3),
+}
+
+# extension: (Pillow format, save options)
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+}
+
+# Gradient end colours per category code
+COLORS = {
+    'finance': ((0, 87, 63), (0, 166, 120)),  # Green gradient
+    'technology': ((25, 25, 112), (65, 105, 225)),  # Blue gradient
+    'real_estate': ((139, 0, 0), (205, 92, 92)),  # Red gradient
+    'trade': ((120, 72, 0), (218, 145, 30)),  # Amber gradient
+}
+DEFAULT_COLORS = ((50, 50, 50), (100, 100, 100))
+
+
+def article_categories():
+    """Return Article.CATEGORY_CHOICES, so new categories get images too."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+    from website.models import Article
+    return list(Article.CATEGORY_CHOICES)
+
 
 def create_gradient_background(width, height, color1, color2):
-    """Create a gradient background"""
-    image = Image.new('RGB', (width, height))
-    draw = ImageDraw.Draw(image)
-    for y in range(height):
-        r = int(color1[0] + (color2[0] - color1[0]) * y / height)
-        g = int(color1[1] + (color2[1] - color1[1]) * y / height)
-        b = int(color1[2] + (color2[2] - color1[2]) * y / height)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
-    return image
-
-def add_overlay_pattern(image):
-    """Add a semi-transparent pattern overlay"""
-    draw = ImageDraw.Draw(image)
-    width, height = image.size
-    for i in range(0, width, 20):
-        for j in range(0, height, 20):
-            if (i + j) % 40 == 0:
-                draw.rectangle([i, j, i+10, j+10], fill=(255, 255, 255, 20))
-    return image
-
-def create_placeholder_image(filename, width, height, category, number=None):
-    """Create a placeholder image with text and styling"""
-    # Color schemes for different categories
-    colors = {
-        'finance': ((0, 87, 63), (0, 166, 120)),  # Green gradient
-        'technology': ((25, 25, 112), (65, 105, 225)),  # Blue gradient
-        'real-estate': ((139, 0, 0), (205, 92, 92)),  # Red gradient
-    }
-    
-    # Create base image with gradient
-    color1, color2 = colors.get(category, ((50, 50, 50), (100, 100, 100)))
-    image = create_gradient_background(width, height, color1, color2)
-    
-    # Add pattern overlay
-    add_overlay_pattern(image)
-    
-    # Add text
-    draw = ImageDraw.Draw(image)
-    
-    # Draw category name
-    text = f"{category.replace('-', ' ').title()}"
-    if number:
-        text += f" {number}"
-    
-    # Calculate text size and position
-    font_size = min(width, height) // 10
+    """Vertical gradient from color1 (top) to color2 as a float (h, w, 3) array."""
+    t = (np.arange(height, dtype=np.float32) / height)[:, None, None]
+    start = np.asarray(color1, dtype=np.float32)
+    end = np.asarray(color2, dtype=np.float32)
+    row = start + (end - start) * t
+    return np.broadcast_to(row, (height, width, 3)).copy()
+
+
+def blend(pixels, mask, color, alpha):
+    """Alpha-blend `color` over `pixels` where `mask` (float 0..1) is set, in place."""
+    weight = (mask * alpha)[..., None]
+    pixels *= 1 - weight
+    pixels += weight * np.asarray(color, dtype=np.float32)
+
+
+def add_overlay_pattern(pixels, cell=20, square=10, alpha=20 / 255):
+    """Checker of small translucent squares: every other 20px cell on the diagonal grid."""
+    height, width, _ = pixels.shape
+    y, x = np.ogrid[:height, :width]
+    on_cell = ((x // cell + y // cell) % 2) == 0
+    in_square = ((x % cell) <= square) & ((y % cell) <= square)
+    blend(pixels, (on_cell & in_square).astype(np.float32), (255, 255, 255), alpha)
+
+
+def add_circles(pixels, rng, count=5):
+    """Scatter translucent white discs."""
+    height, width, _ = pixels.shape
+    y, x = np.ogrid[:height, :width]
+    scale = min(width, height) / 600
+    for _ in range(count):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        radius = rng.integers(10, 50) * scale
+        opacity = rng.integers(30, 100) / 255
+        mask = ((x - cx) ** 2 + (y - cy) ** 2 <= radius ** 2).astype(np.float32)
+        blend(pixels, mask, (255, 255, 255), opacity)
+
+
+def load_font(size):
+    for name in ('arial.ttf', 'DejaVuSans-Bold.ttf', 'DejaVuSans.ttf'):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
     try:
-        font = ImageFont.truetype("arial.ttf", font_size)
-    except:
-        font = ImageFont.load_default()
-    
-    # Add multiple design elements
-    for i in range(5):
-        x = randint(0, width)
-        y = randint(0, height)
-        size = randint(20, 100)
-        opacity = randint(30, 100)
-        draw.ellipse([x, y, x+size, y+size], 
-                    fill=(255, 255, 255, opacity))
-    
-    # Draw text with shadow
-    text_bbox = draw.textbbox((0, 0), text, font=font)
-    text_width = text_bbox[2] - text_bbox[0]
-    text_height = text_bbox[3] - text_bbox[1]
-    x = (width - text_width) // 2
-    y = (height - text_height) // 2
-    
-    # Draw shadow
-    draw.text((x+2, y+2), text, fill=(0, 0, 0, 128), font=font)
-    # Draw main text
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def render(spec):
+    """Render one placeholder and write it in every requested format.
+
+    `spec` is a plain dict so it can be sent to worker processes. Returns
+    `(stem, render_seconds, [(path, bytes, encode_seconds)])`.
+    """
+    started = time.perf_counter()
+    width, height = spec['width'], spec['height']
+    rng = np.random.default_rng(spec['seed'])
+
+    color1, color2 = COLORS.get(spec['category'], DEFAULT_COLORS)
+    pixels = create_gradient_background(width, height, color1, color2)
+    add_overlay_pattern(pixels)
+    add_circles(pixels, rng)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+    draw = ImageDraw.Draw(image)
+    text = spec['label'] if spec['number'] is None else f"{spec['label']} {spec['number']}"
+    font = load_font(min(width, height) // 10)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    x = (width - (right - left)) // 2 - left
+    y = (height - (bottom - top)) // 2 - top
+    draw.text((x + 2, y + 2), text, fill=(0, 0, 0), font=font)
     draw.text((x, y), text, fill=(255, 255, 255), font=font)
-    
-    # Save image
-    image.save(filename, quality=95)
-
-def main():
-    # Ensure the static/img directory exists
-    img_dir = os.path.join('static', 'img')
-    os.makedirs(img_dir, exist_ok=True)
-    
-    # Create banner image
-    create_placeholder_image(
-        os.path.join(img_dir, 'finance-banner.jpg'),
-        1200, 400, 'finance'
-    )
-    
-    # Create category thumbnails
-    categories = ['finance', 'technology', 'real-estate']
-    for category in categories:
-        for i in range(1, 4):
-            create_placeholder_image(
-                os.path.join(img_dir, f'{category}-{i}.jpg'),
-                800, 600, category, i
-            )
+    rendered = time.perf_counter() - started
+
+    outputs = []
+    for ext in spec['formats']:
+        started = time.perf_counter()
+        fmt, options = FORMATS[ext]
+        path = Path(spec['output']) / f"{spec['stem']}.{ext}"
+        image.save(path, fmt, **options)
+        outputs.append((str(path), path.stat().st_size, time.perf_counter() - started))
+    return spec['stem'], rendered, outputs
+
+
+def build_matrix(categories, sizes, formats, output, seed):
+    """One spec per category x size (x variant); each spec writes every format."""
+    specs = []
+    for code, label in categories:
+        slug = code.replace('_', '-')
+        for size in sizes:
+            width, height, variants = SIZES[size]
+            numbers = [None] if variants is None else range(1, variants + 1)
+            for number in numbers:
+                stem = f'{slug}-{size}' if number is None else f'{slug}-{number}'
+                specs.append({
+                    'stem': stem,
+                    'category': code,
+                    'label': label,
+                    'number': number,
+                    'width': width,
+                    'height': height,
+                    'formats': formats,
+                    'output': str(output),
+                    # Stable per image, independent of scheduling order
+                    'seed': zlib.crc32(f'{seed}:{stem}'.encode()),
+                })
+    return specs
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate placeholder images for static/img.')
+    parser.add_argument('--output', type=Path, default=BASE_DIR / 'static' / 'img',
+                        help='Directory to write images to (default: static/img)')
+    parser.add_argument('--categories', help='Comma-separated category codes (default: all of Article.CATEGORY_CHOICES)')
+    parser.add_argument('--sizes', default=','.join(SIZES), help=f'Comma-separated subset of {", ".join(SIZES)}')
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f'Comma-separated subset of {", ".join(FORMATS)}')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the random shapes (default: 0)')
+    args = parser.parse_args(argv)
+
+    args.sizes = [s for s in args.sizes.split(',') if s]
+    args.formats = [f for f in args.formats.split(',') if f]
+    for value, known, option in ((args.sizes, SIZES, '--sizes'), (args.formats, FORMATS, '--formats')):
+        unknown = set(value) - set(known)
+        if unknown:
+            parser.error(f'{option}: unknown {", ".join(sorted(unknown))}')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    categories = article_categories()
+    if args.categories:
+        wanted = args.categories.split(',')
+        categories = [(code, label) for code, label in categories if code in wanted]
+    args.output.mkdir(parents=True, exist_ok=True)
+
+    specs = build_matrix(categories, args.sizes, args.formats, args.output, args.seed)
+    started = time.perf_counter()
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(render, specs))
+    else:
+        results = [render(spec) for spec in specs]
+    elapsed = time.perf_counter() - started
+
+    total_bytes = 0
+    print(f"{'image':<24}{'render':>9}  {'format':<6}{'encode':>9}{'size':>10}")
+    for stem, rendered, outputs in results:
+        for index, (path, size, encoded) in enumerate(outputs):
+            total_bytes += size
+            render_col = f'{rendered * 1000:7.1f}ms' if index == 0 else ''
+            print(f'{stem if index == 0 else "":<24}{render_col:>9}  {Path(path).suffix[1:]:<6}'
+                  f'{encoded * 1000:7.1f}ms{size / 1024:8.1f}KB')
+    files = sum(len(outputs) for _stem, _rendered, outputs in results)
+    print(f'{files} files ({total_bytes / 1024:.0f} KB) in {elapsed:.2f}s '
+          f'with {args.workers} workers -> {args.output}')
+
 
 if __name__ == '__main__':
     main()
-    print("Sample images have been created successfully in the static/img directory!")
\ No newline at end of file
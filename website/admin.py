@@ -1,14 +1,54 @@
 from django.contrib import admin
-from .models import ContactMessage, Article, Newsletter
-import csv
-from django.http import HttpResponse
+from .models import ContactMessage, Article, Comment, Newsletter, NewsletterDelivery, NewsletterIssue
+from .exports import streaming_csv_response
+from .newsletter import segment, segment_counts
+
+
+class CSVExportMixin:
+    """Adds an `export_as_csv` action streaming the selected rows (see exports.py)."""
+    export_filename = "export"
+
+    def export_as_csv(self, request, queryset):
+        return streaming_csv_response(queryset, f"{self.export_filename}_{request.user.username}.csv")
+
+    export_as_csv.short_description = "Export selected as CSV"
+
+
+class InterestFilter(admin.SimpleListFilter):
+    """Filter subscribers by interest, labelled with each segment's active
+    size; both come from the NewsletterInterest index."""
+    title = "interest"
+    parameter_name = "interest"
+
+    def lookups(self, request, model_admin):
+        labels = dict(Article.CATEGORY_CHOICES)
+        return [(code, f"{labels[code]} ({count})") for code, count in segment_counts().items()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(pk__in=segment([self.value()], active=False).values("pk"))
+        return queryset
 
 
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
+class ContactMessageAdmin(CSVExportMixin, admin.ModelAdmin):
     list_display = ("name", "email", "created_at")
     search_fields = ("name", "email", "message")
     readonly_fields = ("created_at",)
+    actions = ["export_as_csv"]
+    export_filename = "contact_messages"
+
+
+@admin.register(Comment)
+class CommentAdmin(CSVExportMixin, admin.ModelAdmin):
+    list_display = ("name", "article", "created_at", "is_approved")
+    list_filter = ("is_approved", "created_at")
+    search_fields = ("name", "email", "body")
+    list_select_related = ("article",)
+    raw_id_fields = ("article", "user")
+    readonly_fields = ("created_at",)
+    actions = ["export_as_csv"]
+    export_filename = "comments"
 
 
 @admin.register(Article)
@@ -21,26 +61,18 @@ class ArticleAdmin(admin.ModelAdmin):
 
 
 @admin.register(Newsletter)
-class NewsletterAdmin(admin.ModelAdmin):
+class NewsletterAdmin(CSVExportMixin, admin.ModelAdmin):
     list_display = ("email", "name", "subscribed_at", "is_active")
-    list_filter = ("is_active", "subscribed_at")
+    list_filter = ("is_active", InterestFilter, "subscribed_at")
     search_fields = ("email", "name")
     readonly_fields = ("subscribed_at",)
     actions = ["export_as_csv", "mark_active", "mark_inactive"]
 
+    export_filename = "subscribers"
+
     def export_as_csv(self, request, queryset):
         """Export selected newsletter subscribers as CSV."""
-        meta = self.model._meta
-        field_names = ["email", "name", "subscribed_at", "is_active"]
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = f"attachment; filename=subscribers_{request.user.username}.csv"
-
-        writer = csv.writer(response)
-        writer.writerow(field_names)
-        for obj in queryset:
-            writer.writerow([getattr(obj, f) for f in field_names])
-        return response
+        return super().export_as_csv(request, queryset)
 
     export_as_csv.short_description = "Export selected subscribers as CSV"
 
@@ -55,3 +87,19 @@ class NewsletterAdmin(admin.ModelAdmin):
         self.message_user(request, "Selected subscribers marked inactive.")
 
     mark_inactive.short_description = "Mark selected as inactive"
+
+
+@admin.register(NewsletterIssue)
+class NewsletterIssueAdmin(admin.ModelAdmin):
+    list_display = ("subject", "created_at", "planned_at", "sent_at")
+    readonly_fields = ("created_at", "planned_at", "sent_at")
+
+
+@admin.register(NewsletterDelivery)
+class NewsletterDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("issue", "subscriber", "status", "attempts", "sent_at")
+    list_filter = ("status", "issue")
+    search_fields = ("subscriber__email",)
+    list_select_related = ("issue", "subscriber")
+    raw_id_fields = ("issue", "subscriber")
+    readonly_fields = ("segment", "attempts", "last_error", "sent_at")
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class WebsiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website'
+
+    def ready(self):
+        # Register signal receivers
+        from . import signals  # noqa: F401
+        # Register the rate limit cache check
+        from . import ratelimit  # noqa: F401
@@ -0,0 +1,141 @@
+"""Benchmarks for the hot views, driven through the Django test client.
+
+Each scenario is requested `iterations` times after a warm-up; we record
+p50/p95 wall time, the number of SQL queries and the time spent rendering
+templates. `compare()` checks a run against a saved JSON baseline. See the
+`benchmark` management command.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import Count
+from django.template.base import Template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Article
+
+
+class TemplateTimer:
+    """Accumulate time spent in top-level `Template.render` calls.
+
+    Included templates render inside their parent, so only the outermost
+    call is timed.
+    """
+
+    def __init__(self):
+        self.total = 0.0
+        self._depth = 0
+
+    @contextmanager
+    def installed(self):
+        original = Template.render
+        timer = self
+
+        def render(template, context):
+            if timer._depth:
+                return original(template, context)
+            timer._depth += 1
+            started = time.perf_counter()
+            try:
+                return original(template, context)
+            finally:
+                timer.total += time.perf_counter() - started
+                timer._depth -= 1
+
+        Template.render = render
+        try:
+            yield self
+        finally:
+            Template.render = original
+
+
+def scenarios():
+    """`{name: (method, url, data)}` for the views under test, picked from
+    whatever corpus is in the database."""
+    article = (
+        Article.objects.published()
+        .annotate(n=Count('comments')).order_by('-n', 'pk')
+        .only('slug', 'title', 'category').first()
+    )
+    if article is None:
+        raise ValueError('The database has no published articles to benchmark')
+    query = article.title.split()[0]
+    return {
+        'home': ('get', reverse('home'), None),
+        'article_list': ('get', reverse('article_list'), None),
+        'article_list_category': (
+            'get', reverse('article_list_by_category', args=[article.category.replace('_', '-')]), None,
+        ),
+        'article_list_search': ('get', reverse('article_list'), {'q': query}),
+        'article_detail': ('get', reverse('article_detail', args=[article.slug]), None),
+        'toggle_like': ('post', reverse('toggle_like', args=[article.slug]), None),
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_scenario(client, method, url, data, iterations, warmup):
+    request = getattr(client, method)
+    for _ in range(warmup):
+        request(url, data)
+
+    timings, renders, queries = [], [], []
+    timer = TemplateTimer()
+    with timer.installed():
+        for _ in range(iterations):
+            rendered_before = timer.total
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = request(url, data)
+                timings.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise AssertionError(f'{method.upper()} {url} returned {response.status_code}')
+            renders.append(timer.total - rendered_before)
+            queries.append(len(ctx.captured_queries))
+    return {
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'render_p50_ms': round(percentile(renders, 50) * 1000, 3),
+        'queries': max(queries),
+    }
+
+
+def run(iterations=50, warmup=5, only=None):
+    client = Client()
+    results = {}
+    for name, (method, url, data) in scenarios().items():
+        if only and name not in only:
+            continue
+        results[name] = run_scenario(client, method, url, data, iterations, warmup)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regressions of `results` against `baseline`.
+
+    p95 latency may grow by at most `threshold` (0.25 = 25%); query counts
+    must not grow at all since they don't depend on the machine.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: {current['queries']} queries, baseline {previous['queries']}")
+        limit = previous['p95_ms'] * (1 + threshold)
+        if current['p95_ms'] > limit:
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.1f}ms, baseline {previous['p95_ms']:.1f}ms "
+                f"(+{current['p95_ms'] / previous['p95_ms'] - 1:.0%}, limit +{threshold:.0%})"
+            )
+    return regressions
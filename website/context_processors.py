@@ -1,6 +1,8 @@
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from core.db_routing import replica_reads
 from .models import Article
-from taggit.models import Tag
+from . import tags
 
 def site_settings(request):
     """Global values to pass to templates"""
@@ -18,9 +20,9 @@ def categories(request):
     }
 
 def popular_tags(request):
-    """Most used tags"""
+    """Most used tags, only looked up if a template renders them"""
     return {
-        'POPULAR_TAGS': Tag.objects.all()[:10]
+        'POPULAR_TAGS': SimpleLazyObject(replica_reads()(tags.popular_tags))
     }
 
 def analytics(request):
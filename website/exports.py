@@ -0,0 +1,81 @@
+"""CSV exports that never hold the whole table in memory.
+
+Rows are read with `values_list().iterator(chunk_size=...)` (a server-side
+cursor where the database supports one) and written one line at a time,
+either into a `StreamingHttpResponse` for the admin actions or into a
+gzipped file by the `export_csv` management command.
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+
+from .models import Comment, ContactMessage, Newsletter
+
+CHUNK_SIZE = 2000
+
+# name: (model, columns); columns are `values_list()` lookups
+EXPORTS = {
+    'newsletter': (Newsletter, ('email', 'name', 'subscribed_at', 'is_active')),
+    'contact': (ContactMessage, ('name', 'email', 'subject', 'message', 'created_at', 'is_read', 'ip_address')),
+    'comment': (Comment, ('article__slug', 'name', 'email', 'body', 'created_at', 'is_approved')),
+}
+
+
+class Echo:
+    """File-like object whose `write` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def columns_for(model):
+    for exported, columns in EXPORTS.values():
+        if exported is model:
+            return columns
+    raise KeyError(f'No CSV export is defined for {model.__name__}')
+
+
+# Spreadsheets evaluate a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def safe_cell(value):
+    """Quote text that Excel or LibreOffice would run as a formula.
+
+    Names, messages and comments are public input; the leading ``'`` makes
+    the spreadsheet show the text as typed.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    # order_by('pk') keeps the output stable and lets the database walk the
+    # primary key instead of sorting the whole selection by Meta.ordering
+    rows = queryset.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+    return ([safe_cell(value) for value in row] for row in rows)
+
+
+def write_csv(fh, queryset, columns, chunk_size=CHUNK_SIZE):
+    """Write the header and every row to `fh`; return the number of rows."""
+    writer = csv.writer(fh)
+    writer.writerow(columns)
+    count = 0
+    for count, row in enumerate(iter_rows(queryset, columns, chunk_size), start=1):
+        writer.writerow(row)
+    return count
+
+
+def iter_csv(queryset, columns, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in iter_rows(queryset, columns, chunk_size):
+        yield writer.writerow(row)
+
+
+def streaming_csv_response(queryset, filename, columns=None):
+    columns = columns or columns_for(queryset.model)
+    response = StreamingHttpResponse(iter_csv(queryset, columns), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
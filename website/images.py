@@ -0,0 +1,166 @@
+"""Responsive derivatives of uploaded article images.
+
+For an original stored as ``articles/2025/01/chart.png`` every width in
+`IMAGE_DERIVATIVE_WIDTHS` narrower than the original is written next to
+it as ``chart.w800.webp`` and ``chart.w800.jpg``. Names are derived from
+the original's name alone. Whether they all exist, and the original's
+dimensions after EXIF rotation, are cached per image by `sources()`, so
+templates only build a `srcset` from files that are really there.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# (extension, Pillow format, save options)
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def derivative_widths():
+    return tuple(sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (480, 800, 1200))))
+
+
+def derivative_name(name, width, ext):
+    root, _ext = os.path.splitext(name)
+    return f'{root}.w{width}.{ext}'
+
+
+def scaled_size(width, height, target_width):
+    return target_width, max(1, round(height * target_width / width))
+
+
+def plan(name, width, height):
+    """Return `[(target_width, target_height, {ext: name})]` for the
+    derivatives of an original of `width` x `height` (never upscaled)."""
+    if not (name and width and height):
+        return []
+    return [
+        (*scaled_size(width, height, target), {ext: derivative_name(name, target, ext) for ext, _f, _o in FORMATS})
+        for target in derivative_widths()
+        if target < width
+    ]
+
+
+# EXIF orientations that swap width and height (see ImageOps.exif_transpose)
+EXIF_ORIENTATION = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+# How long to remember that derivatives are missing before looking again
+MISSING_RECHECK = 300
+
+
+def _sources_key(name):
+    return 'images:sources:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def upright_size(storage, name):
+    """`(width, height)` of the image at `name` as displayed, i.e. after
+    applying its EXIF orientation. Only the header is read."""
+    from PIL import Image
+
+    with storage.open(name, 'rb') as fh:
+        image = Image.open(fh)
+        width, height = image.size
+        if image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+    return width, height
+
+
+def sources(name, storage=None):
+    """Return `(width, height, derivatives)` for the image stored at `name`.
+
+    `width` and `height` are the upright dimensions (None if the original
+    can't be read); `derivatives` is the `plan()`, or `[]` unless every
+    derivative file exists. Cached; `generate_derivatives()` and
+    `delete_derivatives()` keep the entry current.
+    """
+    key = _sources_key(name)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    storage = storage or default_storage
+    try:
+        width, height = upright_size(storage, name)
+    except (OSError, ValueError):  # missing or not an image
+        width = height = None
+    derivatives = plan(name, width, height)
+    if not all(storage.exists(derivative) for _w, _h, names in derivatives for derivative in names.values()):
+        derivatives = []
+    result = (width, height, derivatives)
+    cache.set(key, result, None if derivatives or not width else MISSING_RECHECK)
+    return result
+
+
+def _is_current(storage, derivative, source_mtime):
+    if not storage.exists(derivative):
+        return False
+    if source_mtime is None:
+        return True
+    try:
+        return storage.get_modified_time(derivative) >= source_mtime
+    except NotImplementedError:
+        return True
+
+
+def generate_derivatives(name, force=False, storage=None):
+    """Write the missing or stale derivatives of the image stored at `name`.
+
+    Returns `(width, height, written)`: the original's dimensions and how
+    many files were (re)written.
+    """
+    from PIL import Image, ImageOps
+
+    storage = storage or default_storage
+    try:
+        source_mtime = storage.get_modified_time(name)
+    except NotImplementedError:
+        source_mtime = None
+
+    with storage.open(name, 'rb') as fh:
+        image = Image.open(fh)
+        image.load()
+    # Phone photos often carry their rotation in EXIF only
+    image = ImageOps.exif_transpose(image)
+    width, height = image.size
+
+    written = 0
+    for target_width, target_height, names in plan(name, width, height):
+        pending = [
+            (ext, fmt, options) for ext, fmt, options in FORMATS
+            if force or not _is_current(storage, names[ext], source_mtime)
+        ]
+        if not pending:
+            continue
+        resized = image.resize((target_width, target_height), Image.LANCZOS)
+        for ext, fmt, options in pending:
+            out = resized
+            if fmt == 'JPEG' and out.mode not in ('RGB', 'L'):
+                out = out.convert('RGB')
+            buffer = BytesIO()
+            out.save(buffer, fmt, **options)
+            if storage.exists(names[ext]):
+                storage.delete(names[ext])
+            storage.save(names[ext], ContentFile(buffer.getvalue()))
+            written += 1
+    cache.set(_sources_key(name), (width, height, plan(name, width, height)), None)
+    return width, height, written
+
+
+def delete_derivatives(name, storage=None):
+    """Remove every derivative of `name` (e.g. after the image was replaced)."""
+    storage = storage or default_storage
+    cache.delete(_sources_key(name))
+    for target in derivative_widths():
+        for ext, _fmt, _options in FORMATS:
+            derivative = derivative_name(name, target, ext)
+            if storage.exists(derivative):
+                storage.delete(derivative)
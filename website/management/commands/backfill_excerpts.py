@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.models import Article
+
+
+class Command(BaseCommand):
+    help = 'Builds the stored plain-text excerpt for existing articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Articles loaded and updated per batch (default: 500)')
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild every excerpt, not only the empty ones')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        articles = Article.objects.only('pk', 'summary', 'body', 'excerpt').order_by('pk')
+        if not options['all']:
+            articles = articles.filter(excerpt='')
+
+        started = time.monotonic()
+        last_pk, seen, updated = 0, 0, 0
+        while True:
+            # Seek on pk instead of OFFSET so every batch is an index range scan
+            batch = list(articles.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            seen += len(batch)
+            changed = []
+            for article in batch:
+                excerpt = article.build_excerpt()
+                if excerpt != article.excerpt:
+                    article.excerpt = excerpt
+                    changed.append(article)
+            with transaction.atomic():
+                Article.objects.bulk_update(changed, ['excerpt'])
+            updated += len(changed)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated} of {seen} excerpts in {elapsed:.2f}s'
+        ))
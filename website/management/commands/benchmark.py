@@ -0,0 +1,114 @@
+import json
+import platform
+from io import StringIO
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from website import benchmarks
+from website.view_counter import view_counter
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the hot views against a seeded database and checks for regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per view (default: 50)')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per view first (default: 5)')
+        parser.add_argument('--articles', type=int, default=2000,
+                            help='Size of the generated corpus (default: 2000)')
+        parser.add_argument('--seed', type=int, default=42, help='Corpus seed (default: 42)')
+        parser.add_argument('--use-current-db', action='store_true',
+                            help='Benchmark the configured database as is instead of a seeded throwaway one')
+        parser.add_argument('--only', nargs='+', metavar='VIEW', help='Only run these scenarios')
+        parser.add_argument('--page-cache', action='store_true',
+                            help='Keep the anonymous page cache on (measures cache hits)')
+        parser.add_argument('--baseline', type=Path,
+                            default=Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json',
+                            help='Baseline JSON to compare against (default: benchmarks/baseline.json)')
+        parser.add_argument('--save-baseline', action='store_true', help='Write this run as the new baseline')
+        parser.add_argument('--threshold', type=float,
+                            default=getattr(settings, 'BENCHMARK_REGRESSION_THRESHOLD', 0.25),
+                            help='Allowed p95 slowdown before failing, as a fraction (default: 0.25)')
+        parser.add_argument('--output', type=Path, help='Also write this run to a JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            setup_test_environment()
+            own_environment = True
+        except RuntimeError:  # already set up, e.g. when called from a test
+            own_environment = False
+        test_db = None
+        try:
+            # Entered before seeding too: the signal receivers generate_corpus
+            # triggers would otherwise write into the configured cache
+            with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                PAGE_CACHE_ENABLED=options['page_cache'],
+                # Measure the views, not the limiter rejecting repeated POSTs
+                RATE_LIMIT_ENABLED=False,
+            ):
+                if not options['use_current_db']:
+                    test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                    call_command('generate_corpus', articles=options['articles'], seed=options['seed'],
+                                 stdout=StringIO())
+                try:
+                    results = benchmarks.run(options['iterations'], options['warmup'], options['only'])
+                except (ValueError, AssertionError) as exc:
+                    raise CommandError(exc)
+                finally:
+                    # Buffered views belong to the throwaway database
+                    view_counter.discard()
+        finally:
+            if test_db is not None:
+                connection.creation.destroy_test_db(test_db, verbosity=0)
+            if own_environment:
+                teardown_test_environment()
+
+        self.report(results)
+        run = {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'articles': None if options['use_current_db'] else options['articles'],
+                'iterations': options['iterations'],
+                'page_cache': options['page_cache'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'machine': platform.machine(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            self.write_json(options['output'], run)
+
+        baseline = options['baseline']
+        if options['save_baseline']:
+            self.write_json(baseline, run)
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {baseline}'))
+            return
+        if not baseline.exists():
+            self.stdout.write(f'No baseline at {baseline}; run with --save-baseline to create one')
+            return
+        regressions = benchmarks.compare(results, json.loads(baseline.read_text())['results'], options['threshold'])
+        if regressions:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline}'))
+
+    def report(self, results):
+        self.stdout.write(f"{'view':<24}{'p50':>10}{'p95':>10}{'render':>10}{'queries':>9}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<24}{row['p50_ms']:>8.2f}ms{row['p95_ms']:>8.2f}ms"
+                f"{row['render_p50_ms']:>8.2f}ms{row['queries']:>9}"
+            )
+
+    def write_json(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, indent=2) + '\n')
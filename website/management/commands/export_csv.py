@@ -0,0 +1,40 @@
+import gzip
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website import exports
+
+
+class Command(BaseCommand):
+    help = 'Exports newsletter subscribers, contact messages or comments to a gzipped CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(exports.EXPORTS), help='What to export')
+        parser.add_argument('output', type=Path, help='File to write, e.g. subscribers.csv.gz')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE,
+                            help=f'Rows fetched per database round trip (default: {exports.CHUNK_SIZE})')
+        parser.add_argument('--active-only', action='store_true',
+                            help='Newsletter only: skip unsubscribed addresses')
+        parser.add_argument('--no-gzip', action='store_true', help='Write plain CSV')
+
+    def handle(self, *args, **options):
+        model, columns = exports.EXPORTS[options['model']]
+        queryset = model.objects.all()
+        if options['active_only']:
+            if options['model'] != 'newsletter':
+                raise CommandError('--active-only only applies to the newsletter export')
+            queryset = queryset.filter(is_active=True)
+
+        output = options['output']
+        output.parent.mkdir(parents=True, exist_ok=True)
+        opener = open if options['no_gzip'] else gzip.open
+        started = time.monotonic()
+        with opener(output, 'wt', encoding='utf-8', newline='') as fh:
+            count = exports.write_csv(fh, queryset, columns, options['chunk_size'])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {count} rows to {output} in {elapsed:.2f}s'
+        ))
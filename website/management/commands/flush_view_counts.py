@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from website.view_counter import view_counter
+
+
+class Command(BaseCommand):
+    help = 'Writes buffered article views to Article.view_count'
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'VIEW_COUNT_BUFFER', 'local') != 'cache':
+            # The local buffers live inside the web workers, not this process
+            raise CommandError("flush_view_counts needs VIEW_COUNT_BUFFER = 'cache'")
+        written = view_counter.flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {written} views'))
@@ -0,0 +1,287 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from taggit.models import Tag
+
+from website import page_cache, sitemaps, tags
+from website.models import Article, Author, Comment, Like, Newsletter
+from website.newsletter import sync_interests
+from website.search import get_search_backend
+from website.text import estimate_read_time
+
+# Share of articles per category; categories missing here get a weight of 0.1
+CATEGORY_WEIGHTS = {'finance': 0.35, 'technology': 0.30, 'real_estate': 0.20, 'trade': 0.15}
+
+TOPIC_WORDS = {
+    'finance': ['rates', 'bonds', 'inflation', 'banking', 'credit', 'dividends', 'liquidity', 'yields',
+                'portfolio', 'equities', 'central', 'bank', 'earnings', 'fintech', 'payments'],
+    'technology': ['cloud', 'AI', 'chips', 'software', 'security', 'data', 'platform', 'startup',
+                   'automation', 'blockchain', 'devices', 'networks', 'models', 'APIs', 'open-source'],
+    'real_estate': ['housing', 'mortgage', 'rents', 'commercial', 'office', 'vacancy', 'zoning',
+                    'construction', 'REITs', 'suburbs', 'landlords', 'appraisal', 'inventory', 'lease'],
+    'trade': ['tariffs', 'exports', 'imports', 'shipping', 'freight', 'supply', 'chains', 'customs',
+              'currency', 'logistics', 'ports', 'sanctions', 'commodities', 'agreements', 'routes'],
+}
+COMMON_WORDS = (
+    'the of and to in a is that for on with as by at from this it be are was were will market '
+    'growth investors analysts quarter year report data policy risk demand prices outlook '
+    'companies consumers global local new higher lower expected could should while'
+).split()
+TITLE_PATTERNS = [
+    '{Topic} outlook for {year}',
+    'What {topic} means for {other}',
+    'How {topic} is reshaping {other}',
+    'The {topic} question nobody is asking',
+    '{Topic} and {other}: a closer look',
+    'Five things to know about {topic}',
+]
+# Tags shared by every category, on top of one tag per topic word
+SHARED_TAGS = ['analysis', 'markets', 'opinion', 'weekly', 'explainer', 'data']
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the generated dates instead of auto_now(_add)."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    try:
+        for field, _now, _add in saved:
+            field.auto_now = field.auto_now_add = False
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generates a large, reproducible synthetic corpus for load and benchmark testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=1000, help='Articles to create (default: 1000)')
+        parser.add_argument('--comments-per-article', type=float, default=5,
+                            help='Mean comments per article; popular articles get more (default: 5)')
+        parser.add_argument('--likes', type=float, default=20,
+                            help='Mean likes per article; popular articles get more (default: 20)')
+        parser.add_argument('--subscribers', type=int, default=0, help='Newsletter subscribers to create (default: 0)')
+        parser.add_argument('--authors', type=int, default=20, help='Author profiles to spread articles over (default: 20)')
+        parser.add_argument('--days', type=int, default=730, help='Publication dates span this many days back (default: 730)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same corpus (default: 42)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk INSERT (default: 1000)')
+        parser.add_argument('--prefix', default='synthetic', help='Prefix for generated slugs, usernames and emails')
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help="Don't rebuild the full-text index afterwards")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.now = timezone.now()
+        self.counts = {}
+        started = time.monotonic()
+
+        categories = [code for code, _label in Article.CATEGORY_CHOICES]
+        self.categories = categories
+        self.category_weights = [CATEGORY_WEIGHTS.get(code, 0.1) for code in categories]
+        self.tag_ids = self.create_tags(categories)
+        authors = self.create_authors(options['authors'])
+
+        timestamps = [
+            Article._meta.get_field('created_at'), Article._meta.get_field('updated_at'),
+            Comment._meta.get_field('created_at'), Like._meta.get_field('created_at'),
+            Newsletter._meta.get_field('subscribed_at'),
+        ]
+        first = Article.objects.filter(slug__startswith=f'{self.prefix}-').count()
+        with explicit_timestamps(*timestamps):
+            for start in range(0, options['articles'], self.batch_size):
+                size = min(self.batch_size, options['articles'] - start)
+                with transaction.atomic():
+                    self.create_articles(
+                        first + start, size, authors, options['days'],
+                        options['comments_per_article'], options['likes'],
+                    )
+            if options['subscribers']:
+                self.create_subscribers(options['subscribers'])
+
+        generated = time.monotonic() - started
+        self.refresh_derived(options['skip_search_index'])
+        elapsed = time.monotonic() - started
+
+        total = sum(self.counts.values())
+        for table, count in self.counts.items():
+            self.stdout.write(f'  {table:<12}{count:>10}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {total} rows in {generated:.2f}s ({total / max(generated, 1e-9):,.0f} rows/s); '
+            f'{elapsed:.2f}s including index rebuild'
+        ))
+
+    def count(self, table, n):
+        self.counts[table] = self.counts.get(table, 0) + n
+
+    def create_tags(self, categories):
+        names = {
+            code: [f'{code.replace("_", "-")}-{word.lower()}' for word in TOPIC_WORDS.get(code, [code])]
+            for code in categories
+        }
+        every = sorted({name for pool in names.values() for name in pool} | set(SHARED_TAGS))
+        Tag.objects.bulk_create([Tag(name=name, slug=name) for name in every], ignore_conflicts=True)
+        ids = dict(Tag.objects.filter(name__in=every).values_list('name', 'id'))
+        return {code: [ids[name] for name in pool] for code, pool in names.items()} | {
+            None: [ids[name] for name in SHARED_TAGS],
+        }
+
+    def create_authors(self, count):
+        usernames = [f'{self.prefix}-author-{i}' for i in range(count)]
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=name, password=password, first_name=f'Author {i}') for i, name in enumerate(usernames)],
+            ignore_conflicts=True,
+        )
+        users = User.objects.filter(username__in=usernames)
+        Author.objects.bulk_create(
+            [Author(user=user, bio='Synthetic author for load testing.') for user in users],
+            ignore_conflicts=True,
+        )
+        return list(Author.objects.filter(user__username__in=usernames).order_by('pk'))
+
+    def zipf_choice(self, pool, exponent=1.1):
+        # Rank-weighted choice: a few tags are far more popular than the rest
+        weights = [1 / (rank + 1) ** exponent for rank in range(len(pool))]
+        return self.rng.choices(pool, weights=weights)[0]
+
+    def paragraph(self, category, words):
+        pool = TOPIC_WORDS.get(category, []) * 2 + COMMON_WORDS
+        text = ' '.join(self.rng.choices(pool, k=words))
+        return text[0].upper() + text[1:] + '.'
+
+    def body(self, category):
+        # Log-normal length: most articles 500-1500 words, a long tail of deep dives
+        total = int(min(self.rng.lognormvariate(6.7, 0.45), 6000))
+        parts = []
+        while total > 0:
+            words = min(total, self.rng.randint(40, 120))
+            total -= words
+            roll = self.rng.random()
+            if roll < 0.08:
+                parts.append(f'<h2>{self.paragraph(category, 5)}</h2>')
+            elif roll < 0.12:
+                parts.append(f'<p><img src="/media/synthetic/{category}.jpg" alt=""></p>')
+            parts.append(f'<p>{self.paragraph(category, words)}</p>')
+        return '\n'.join(parts)
+
+    def not_after_now(self, when):
+        # Offsets from recent articles must not land in the future
+        return min(when, self.now)
+
+    def create_articles(self, first, size, authors, days, comments_mean, likes_mean):
+        articles, plans = [], []
+        for i in range(first, first + size):
+            category = self.rng.choices(self.categories, weights=self.category_weights)[0]
+            topics = TOPIC_WORDS.get(category, [category])
+            topic, other = self.rng.sample(topics, 2) if len(topics) > 1 else (topics[0], topics[0])
+            created = self.now - timedelta(
+                # Publishing volume grows over time, so recent dates are denser
+                seconds=days * 86400 * (1 - self.rng.random() ** 0.5),
+            )
+            # Heavy-tailed popularity drives views, likes and comments together
+            popularity = self.rng.paretovariate(1.5)
+            comments = int(self.rng.expovariate(1 / comments_mean) * popularity / 3) if comments_mean else 0
+            likes = int(self.rng.expovariate(1 / likes_mean) * popularity / 3) if likes_mean else 0
+            approved = sum(self.rng.random() < 0.9 for _ in range(comments))
+            title = self.rng.choice(TITLE_PATTERNS).format(
+                topic=topic, Topic=topic[:1].upper() + topic[1:], other=other, year=created.year,
+            )
+            body = self.body(category)
+            article = Article(
+                title=title,
+                slug=f'{self.prefix}-{i}',
+                author=self.rng.choice(authors) if authors else None,
+                category=category,
+                summary='' if self.rng.random() < 0.3 else self.paragraph(category, self.rng.randint(15, 35)),
+                body=body,
+                status='published',
+                is_published=self.rng.random() > 0.03,
+                is_featured=self.rng.random() < 0.02,
+                created_at=created,
+                updated_at=self.not_after_now(created + timedelta(hours=self.rng.random() * 48)),
+                read_time=estimate_read_time(body),
+                view_count=int(popularity * self.rng.randint(50, 500)),
+                like_count=likes,
+                approved_comment_count=approved,
+            )
+            # bulk_create skips save(), which normally derives these
+            article.excerpt = article.build_excerpt()
+            articles.append(article)
+            plans.append((comments, approved, likes))
+
+        Article.objects.bulk_create(articles, batch_size=self.batch_size)
+        self.count('articles', len(articles))
+
+        content_type = ContentType.objects.get_for_model(Article)
+        through = Article.tags.through
+        tagged, comments, likes = [], [], []
+        for article, (comment_count, approved, like_count) in zip(articles, plans):
+            tag_ids = {self.zipf_choice(self.tag_ids[article.category]) for _ in range(self.rng.randint(1, 4))}
+            if self.rng.random() < 0.4:
+                tag_ids.add(self.zipf_choice(self.tag_ids[None]))
+            tagged += [through(content_type=content_type, object_id=article.pk, tag_id=tag_id) for tag_id in tag_ids]
+
+            approvals = [True] * approved + [False] * (comment_count - approved)
+            self.rng.shuffle(approvals)
+            for n, is_approved in enumerate(approvals):
+                comments.append(Comment(
+                    article=article, name=f'Reader {self.rng.randint(1, 50000)}',
+                    email=f'reader{n}@example.com', body=self.paragraph(article.category, self.rng.randint(8, 60)),
+                    is_approved=is_approved,
+                    created_at=self.not_after_now(article.created_at + timedelta(minutes=self.rng.expovariate(1 / 600))),
+                ))
+            for n in range(like_count):
+                likes.append(Like(
+                    article=article, ip_address=f'10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}',
+                    created_at=self.not_after_now(article.created_at + timedelta(minutes=self.rng.expovariate(1 / 1440))),
+                ))
+
+        through.objects.bulk_create(tagged, batch_size=self.batch_size)
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        Like.objects.bulk_create(likes, batch_size=self.batch_size)
+        self.count('tagged items', len(tagged))
+        self.count('comments', len(comments))
+        self.count('likes', len(likes))
+
+    def create_subscribers(self, count):
+        first = Newsletter.objects.filter(email__startswith=f'{self.prefix}-reader-').count()
+        for start in range(first, first + count, self.batch_size):
+            rows = []
+            for i in range(start, min(start + self.batch_size, first + count)):
+                interests = sorted(set(self.rng.choices(
+                    self.categories, weights=self.category_weights, k=self.rng.randint(1, 3),
+                )))
+                rows.append(Newsletter(
+                    email=f'{self.prefix}-reader-{i}@example.com',
+                    name=f'Reader {i}',
+                    is_active=self.rng.random() > 0.1,
+                    interests={'categories': interests},
+                    subscribed_at=self.now - timedelta(seconds=self.rng.random() * 730 * 86400),
+                ))
+            with transaction.atomic():
+                Newsletter.objects.bulk_create(rows)
+                sync_interests(rows)
+            self.count('subscribers', len(rows))
+
+    def refresh_derived(self, skip_search_index):
+        # bulk_create sends no signals, so do what the receivers would have done
+        if not skip_search_index:
+            get_search_backend().rebuild()
+        last_pk = Article.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for pk in range(1, last_pk + 1, sitemaps.shard_size()):
+            sitemaps.invalidate_article(pk)
+        tags.invalidate()
+        page_cache.invalidate_paths({
+            path for code in self.categories for path in page_cache.article_paths(Article(category=code))
+        })
@@ -0,0 +1,77 @@
+import multiprocessing
+import time
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.images import generate_derivatives
+from website.models import Article
+
+
+def _generate(args):
+    name, force = args
+    try:
+        return name, generate_derivatives(name, force=force), None
+    except Exception as exc:  # one broken upload must not stop the run
+        return name, None, f'{type(exc).__name__}: {exc}'
+
+
+class Command(BaseCommand):
+    help = 'Builds missing or stale responsive derivatives of article featured images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Processes resizing images in parallel (default: CPU count)')
+        parser.add_argument('--force', action='store_true',
+                            help='Rewrite derivatives even when they are current')
+
+    def handle(self, *args, **options):
+        rows = list(
+            Article.objects.exclude(featured_image='')
+            .values_list('pk', 'featured_image', 'featured_image_width', 'featured_image_height')
+        )
+        by_name = {}
+        for pk, name, width, height in rows:
+            by_name.setdefault(name, []).append((pk, width, height))
+        tasks = [(name, options['force']) for name in by_name]
+
+        started = time.monotonic()
+        workers = max(1, min(options['workers'], len(tasks)))
+        if workers == 1:
+            results = map(_generate, tasks)
+        else:
+            # Workers only touch storage; the database is updated here
+            pool = multiprocessing.Pool(workers, initializer=django.setup)
+            results = pool.imap_unordered(_generate, tasks)
+
+        written = failed = 0
+        stale_dimensions = []
+        try:
+            for name, result, error in results:
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                width, height, count = result
+                written += count
+                # Rows saved before the dimension fields existed
+                stale_dimensions += [
+                    Article(pk=pk, featured_image_width=width, featured_image_height=height)
+                    for pk, old_width, old_height in by_name[name]
+                    if (old_width, old_height) != (width, height)
+                ]
+        finally:
+            if workers > 1:
+                pool.close()
+                pool.join()
+
+        with transaction.atomic():
+            Article.objects.bulk_update(
+                stale_dimensions, ['featured_image_width', 'featured_image_height'], batch_size=500,
+            )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} derivatives for {len(tasks) - failed} images '
+            f'({failed} failed) in {elapsed:.2f}s with {workers} workers'
+        ))
@@ -0,0 +1,161 @@
+import csv
+import gzip
+import json
+import time
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from website.models import Newsletter
+from website.newsletter import merge_interests, normalize_email, normalize_interests, sync_interests
+
+
+class Command(BaseCommand):
+    help = 'Imports newsletter subscribers from a CSV or JSONL file (optionally gzipped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path,
+                            help='CSV with an "email" column (and optional "name", "interests") or JSONL')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: guessed from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows validated and written per batch (default: 1000)')
+        parser.add_argument('--rejects', type=Path,
+                            help='Write rejected lines to this file as "line<TAB>reason<TAB>raw"')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.exists():
+            raise CommandError(f'{path} does not exist')
+        fmt = options['format'] or self.guess_format(path)
+        self.dry_run = options['dry_run']
+        self.stats = {'read': 0, 'created': 0, 'merged': 0, 'unchanged': 0, 'duplicates': 0, 'rejected': 0}
+
+        self.rejects_file = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+        opener = gzip.open if path.suffix == '.gz' else open
+        started = time.monotonic()
+        try:
+            with opener(path, 'rt', encoding='utf-8-sig', newline='') as fh:
+                batch = {}
+                for line_no, raw, record in self.iter_records(fh, fmt):
+                    self.stats['read'] += 1
+                    try:
+                        email = normalize_email(record.get('email'))
+                        name = (record.get('name') or '').strip()[:100]
+                        interests = normalize_interests(record.get('interests'))
+                    except (ValidationError, AttributeError) as exc:
+                        self.reject(line_no, exc, raw)
+                        continue
+                    if email in batch:
+                        # Repeated within the file: fold into the earlier row
+                        self.stats['duplicates'] += 1
+                        previous = batch[email]
+                        batch[email] = (previous[0] or name, merge_interests(previous[1], interests))
+                        continue
+                    batch[email] = (name, interests)
+                    if len(batch) >= options['batch_size']:
+                        self.write_batch(batch)
+                        batch = {}
+                if batch:
+                    self.write_batch(batch)
+        finally:
+            if self.rejects_file:
+                self.rejects_file.close()
+
+        elapsed = time.monotonic() - started
+        stats = self.stats
+        rate = stats['read'] / elapsed if elapsed else stats['read']
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Checked' if self.dry_run else 'Imported'} {stats['read']} rows in {elapsed:.2f}s "
+            f"({rate:.0f} rows/s): {stats['created']} new, {stats['merged']} merged, "
+            f"{stats['unchanged']} unchanged, {stats['duplicates']} repeated, {stats['rejected']} rejected"
+        ))
+
+    def guess_format(self, path):
+        suffixes = [s.lower() for s in path.suffixes if s.lower() != '.gz']
+        if suffixes and suffixes[-1] in ('.jsonl', '.ndjson'):
+            return 'jsonl'
+        if suffixes and suffixes[-1] == '.csv':
+            return 'csv'
+        raise CommandError(f'Cannot tell the format of {path}; pass --format')
+
+    def iter_records(self, fh, fmt):
+        """Yield `(line_no, raw, record)` one line at a time; unparsable lines
+        are rejected here and skipped."""
+        if fmt == 'jsonl':
+            for line_no, line in enumerate(fh, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    self.stats['read'] += 1
+                    self.reject(line_no, f'invalid JSON: {exc}', line)
+                    continue
+                yield line_no, line, record if isinstance(record, dict) else {'email': record}
+            return
+
+        reader = csv.DictReader(fh)
+        if not reader.fieldnames or 'email' not in reader.fieldnames:
+            raise CommandError('The CSV needs a header row with an "email" column')
+        for record in reader:
+            raw = ','.join(v or '' for v in record.values() if isinstance(v, str))
+            interests = (record.get('interests') or '').strip()
+            if interests[:1] in ('{', '['):
+                try:
+                    record['interests'] = json.loads(interests)
+                except ValueError as exc:
+                    self.stats['read'] += 1
+                    self.reject(reader.line_num, f'invalid interests JSON: {exc}', raw)
+                    continue
+            yield reader.line_num, raw, record
+
+    def reject(self, line_no, reason, raw):
+        if isinstance(reason, ValidationError):
+            reason = '; '.join(reason.messages)
+        self.stats['rejected'] += 1
+        if self.rejects_file:
+            self.rejects_file.write(f"{line_no}\t{reason}\t{raw.rstrip()}\n")
+        elif self.stats['rejected'] <= 20:
+            self.stderr.write(f'line {line_no}: {reason}')
+
+    def write_batch(self, batch):
+        # Batch keys are lower-cased; stored addresses may not be
+        existing = {}
+        for sub in (
+            Newsletter.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=list(batch))
+            .order_by('-pk').only('pk', 'email', 'name', 'interests')
+        ):
+            existing[sub.email_lower] = sub
+        new, changed = [], []
+        for email, (name, interests) in batch.items():
+            sub = existing.get(email)
+            if sub is None:
+                new.append(Newsletter(email=email, name=name, interests=interests))
+                continue
+            merged = merge_interests(sub.interests, interests)
+            if merged != sub.interests or (name and not sub.name):
+                sub.interests = merged
+                sub.name = sub.name or name
+                changed.append(sub)
+            else:
+                self.stats['unchanged'] += 1
+
+        self.stats['created'] += len(new)
+        self.stats['merged'] += len(changed)
+        if self.dry_run:
+            return
+        with transaction.atomic():
+            # ignore_conflicts covers addresses another process inserted since
+            # the lookup above; those rows keep their own interests
+            Newsletter.objects.bulk_create(new, ignore_conflicts=True)
+            Newsletter.objects.bulk_update(changed, ['name', 'interests'])
+            # Bulk writes skip the post_save receiver that maintains the
+            # interest index; ignore_conflicts also leaves new pks unset
+            created = Newsletter.objects.filter(email__in=[sub.email for sub in new]).only('pk', 'interests')
+            sync_interests([*created, *changed])
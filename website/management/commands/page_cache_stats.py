@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from website import page_cache
+
+
+class Command(BaseCommand):
+    help = 'Shows hit/miss counters of the anonymous page cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        counts = page_cache.stats()
+        total = counts['hits'] + counts['misses']
+        ratio = counts['hits'] / total * 100 if total else 0.0
+        self.stdout.write(f"hits={counts['hits']} misses={counts['misses']} hit_ratio={ratio:.1f}%")
+        if options['reset']:
+            page_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
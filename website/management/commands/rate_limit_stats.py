@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from website import ratelimit
+
+
+class Command(BaseCommand):
+    help = 'Shows allowed/limited counters of the write endpoint rate limits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        for policy, counts in ratelimit.stats().items():
+            total = counts['allowed'] + counts['limited']
+            ratio = counts['limited'] / total * 100 if total else 0.0
+            self.stdout.write(
+                f"{policy}: allowed={counts['allowed']} limited={counts['limited']} limited_ratio={ratio:.1f}%"
+            )
+        if options['reset']:
+            ratelimit.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the article full-text search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Articles loaded and inserted per batch (default: 500)')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.monotonic()
+        count = backend.rebuild(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} articles with {type(backend).__name__} in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,65 @@
+import multiprocessing
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.models import Article
+from website.text import estimate_read_times
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Article.read_time from the article bodies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Articles loaded and updated per batch (default: 500)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes estimating read times in parallel (default: 1)')
+
+    def handle(self, *args, **options):
+        batch_size, workers = options['batch_size'], options['workers']
+        started = time.monotonic()
+        self.seen = self.updated = 0
+
+        if workers <= 1:
+            for rows in self.batches(batch_size):
+                self.write(estimate_read_times(rows))
+        else:
+            # The database is only read and written here; workers get plain
+            # tuples. At most two batches per worker are in flight so memory
+            # stays bounded on large archives.
+            with multiprocessing.Pool(workers) as pool:
+                pending = deque()
+                for rows in self.batches(batch_size):
+                    pending.append(pool.apply_async(estimate_read_times, (rows,)))
+                    if len(pending) >= workers * 2:
+                        self.write(pending.popleft().get())
+                while pending:
+                    self.write(pending.popleft().get())
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {self.updated} of {self.seen} read times in {elapsed:.2f}s'
+        ))
+
+    def batches(self, batch_size):
+        rows = Article.objects.order_by('pk').values_list('pk', 'body', 'read_time')
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1][0]
+            self.seen += len(batch)
+            yield batch
+
+    def write(self, changes):
+        if not changes:
+            return
+        with transaction.atomic():
+            Article.objects.bulk_update(
+                [Article(pk=pk, read_time=minutes) for pk, minutes in changes], ['read_time'],
+            )
+        self.updated += len(changes)
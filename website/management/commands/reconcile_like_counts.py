@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from website.models import Article, Like
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Article.like_count from the Like table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Articles updated per transaction, by id range (default: 5000)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many counters have drifted')
+
+    def handle(self, *args, **options):
+        actual = Coalesce(Subquery(
+            Like.objects.filter(article=OuterRef('pk'))
+            .values('article').annotate(total=Count('pk')).values('total')
+        ), 0)
+        drifted = Article.objects.annotate(actual=actual).filter(~Q(like_count=actual)).count()
+        if options['dry_run']:
+            self.stdout.write(f'{drifted} articles have a stale like_count')
+            return
+
+        batch_size = options['batch_size']
+        last_id = Article.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        # One UPDATE ... SET like_count = (SELECT COUNT(*) ...) per id range
+        # keeps each write transaction short.
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                Article.objects.filter(pk__gte=start, pk__lt=start + batch_size).update(like_count=actual)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled like counts ({drifted} corrected)'))
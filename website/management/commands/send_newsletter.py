@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from website.models import NewsletterDelivery, NewsletterIssue
+from website.newsletter import Dispatcher, plan_deliveries
+
+
+class Command(BaseCommand):
+    help = 'Sends a newsletter issue, resuming from the recorded delivery state'
+
+    def add_arguments(self, parser):
+        parser.add_argument('issue', type=int, help='NewsletterIssue id')
+        parser.add_argument('--connections', type=int,
+                            help='Parallel SMTP connections (default: NEWSLETTER_CONNECTIONS)')
+        parser.add_argument('--batch-size', type=int,
+                            help='Deliveries loaded and recorded per batch (default: NEWSLETTER_BATCH_SIZE)')
+        parser.add_argument('--rate', type=float,
+                            help='Max messages per second over all connections, 0 for none '
+                                 '(default: NEWSLETTER_RATE_LIMIT)')
+        parser.add_argument('--max-attempts', type=int,
+                            help='Attempts per recipient before giving up (default: NEWSLETTER_MAX_ATTEMPTS)')
+        parser.add_argument('--retry-delay', type=float, default=5.0,
+                            help='Seconds before the first retry pass, growing linearly (default: 5)')
+        parser.add_argument('--plan-only', action='store_true',
+                            help='Only record the audience; send nothing')
+
+    def handle(self, *args, **options):
+        try:
+            issue = NewsletterIssue.objects.get(pk=options['issue'])
+        except NewsletterIssue.DoesNotExist:
+            raise CommandError(f"Newsletter issue {options['issue']} does not exist")
+
+        if options['plan_only']:
+            planned = plan_deliveries(issue)
+            self.stdout.write(self.style.SUCCESS(f'Planned {planned} deliveries for "{issue}"'))
+            return
+
+        started = time.monotonic()
+        stats = Dispatcher(
+            issue,
+            connections=options['connections'],
+            batch_size=options['batch_size'],
+            rate=options['rate'],
+            max_attempts=options['max_attempts'],
+            retry_delay=options['retry_delay'],
+        ).run()
+        elapsed = time.monotonic() - started
+
+        counts = dict.fromkeys(dict(NewsletterDelivery.STATUS_CHOICES), 0)
+        for row in issue.deliveries.order_by().values('status').annotate(n=Count('pk')):
+            counts[row['status']] = row['n']
+        rate = stats['sent'] / elapsed if elapsed else stats['sent']
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {stats['sent']} messages in {elapsed:.2f}s ({rate:.1f}/s), {stats['failed']} failed attempts. "
+            f"Issue totals: {counts['sent']} sent, {counts['failed']} failed, {counts['pending']} pending, "
+            f"{counts['skipped']} skipped"
+        ))
@@ -0,0 +1,47 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database into the configured replicas (local replica setups)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep syncing every INTERVAL seconds, to simulate replication lag')
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            raise CommandError('No replicas configured; set DATABASE_REPLICAS to one or more SQLite paths')
+        for alias in [settings.DATABASES['default'], *(settings.DATABASES[a] for a in replicas)]:
+            if alias['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('sync_sqlite_replicas only copies SQLite databases')
+
+        while True:
+            started = time.monotonic()
+            self.sync(replicas)
+            self.stdout.write(self.style.SUCCESS(
+                f'Synced {len(replicas)} replica(s) in {time.monotonic() - started:.2f}s'
+            ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self, replicas):
+        # The backup API copies a consistent snapshot while the primary
+        # stays writable
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        try:
+            for alias in replicas:
+                connections[alias].close()
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
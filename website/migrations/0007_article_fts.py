@@ -0,0 +1,59 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+FTS_TABLE = 'website_article_fts'
+
+
+def _text(value):
+    return ' '.join(html.unescape(strip_tags(value or '')).split())
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        'title, summary, body, tags, category UNINDEXED, '
+        "tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+    # Index the articles that already exist
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT a.id, a.title, a.summary, a.body, a.category, '
+            "       group_concat(t.name, ' ') "
+            'FROM website_article a '
+            'LEFT JOIN taggit_taggeditem ti ON ti.object_id = a.id AND ti.content_type_id = ('
+            "    SELECT id FROM django_content_type WHERE app_label = 'website' AND model = 'article') "
+            'LEFT JOIN taggit_tag t ON t.id = ti.tag_id '
+            'WHERE a.is_published '
+            'GROUP BY a.id'
+        )
+        rows = [
+            (pk, title, _text(summary), _text(body), tags or '', category)
+            for pk, title, summary, body, category, tags in cursor.fetchall()
+        ]
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, summary, body, tags, category) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            rows,
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0006_like'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        ('website', '0007_article_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['is_published', '-created_at', '-id'], name='article_pub_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['is_published', 'category', '-created_at', '-id'], name='article_pub_cat_created_idx'),
+        ),
+    ]
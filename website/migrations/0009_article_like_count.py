@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_counts(apps, schema_editor):
+    Article = apps.get_model('website', 'Article')
+    Like = apps.get_model('website', 'Like')
+    counts = (
+        Like.objects.filter(article=OuterRef('pk'))
+        .values('article').annotate(total=Count('pk')).values('total')
+    )
+    Article.objects.update(like_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0008_article_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Denormalized number of likes'),
+        ),
+        migrations.RunPython(backfill_like_counts, migrations.RunPython.noop),
+    ]
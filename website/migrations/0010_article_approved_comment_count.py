@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_counts(apps, schema_editor):
+    Article = apps.get_model('website', 'Article')
+    Comment = apps.get_model('website', 'Comment')
+    counts = (
+        Comment.objects.filter(article=OuterRef('pk'), is_approved=True)
+        .values('article').annotate(total=Count('pk')).values('total')
+    )
+    Article.objects.update(approved_comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0009_article_like_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='approved_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Denormalized number of approved comments'),
+        ),
+        migrations.RunPython(backfill_comment_counts, migrations.RunPython.noop),
+    ]
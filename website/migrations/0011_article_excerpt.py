@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:03
+
+from django.db import migrations, models
+
+from website.text import make_excerpt
+
+
+def backfill_excerpts(apps, schema_editor):
+    # Same rule as Article.build_excerpt(); the backfill_excerpts command
+    # rebuilds them later if the rule changes
+    Article = apps.get_model('website', 'Article')
+    articles = Article.objects.only('pk', 'summary', 'body').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(articles.filter(pk__gt=last_pk)[:500])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for article in batch:
+            article.excerpt = make_excerpt(article.summary or article.body)
+        Article.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0010_article_approved_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Plain-text teaser built from the summary (or body) on save'),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+from website.text import estimate_read_times
+
+
+def backfill_read_times(apps, schema_editor):
+    # read_time used to be entered by hand (and mostly left at 0); derive it
+    # from the body as Article.save() now does
+    Article = apps.get_model('website', 'Article')
+    rows = Article.objects.order_by('pk').values_list('pk', 'body', 'read_time')
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:500])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        changes = estimate_read_times(batch)
+        Article.objects.bulk_update(
+            [Article(pk=pk, read_time=minutes) for pk, minutes in changes], ['read_time'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0011_article_excerpt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='read_time',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Estimated reading time in minutes, computed from the body on save'),
+        ),
+        migrations.RunPython(backfill_read_times, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0012_article_read_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='featured_image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='featured_image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='featured_image',
+            field=models.ImageField(blank=True, height_field='featured_image_height', upload_to='articles/%Y/%m/', width_field='featured_image_width'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0013_article_featured_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterIssue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('intro', models.TextField(blank=True)),
+                ('categories', models.JSONField(blank=True, default=list, help_text='Category codes this issue covers; subscribers interested in any of them receive it. Leave empty to send to every active subscriber.')),
+                ('template_name', models.CharField(default='website/emails/newsletter_issue.html', max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('planned_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, editable=False, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsletterDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.CharField(blank=True, max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='website.newsletter')),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='website.newsletterissue')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['issue', 'status', 'id'], name='delivery_issue_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('issue', 'subscriber'), name='delivery_issue_subscriber_uniq')],
+            },
+        ),
+    ]
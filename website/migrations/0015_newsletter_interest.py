@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CATEGORIES = {'finance', 'technology', 'real_estate', 'trade'}
+
+
+def backfill_interests(apps, schema_editor):
+    Newsletter = apps.get_model('website', 'Newsletter')
+    NewsletterInterest = apps.get_model('website', 'NewsletterInterest')
+    rows = []
+    for pk, interests in Newsletter.objects.values_list('pk', 'interests').iterator(chunk_size=2000):
+        categories = interests.get('categories') if isinstance(interests, dict) else None
+        for category in set(categories or ()) & CATEGORIES:
+            rows.append(NewsletterInterest(subscriber_id=pk, category=category))
+        if len(rows) >= 2000:
+            NewsletterInterest.objects.bulk_create(rows)
+            rows = []
+    NewsletterInterest.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0014_newsletter_dispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterInterest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('finance', 'Finance'), ('technology', 'Technology'), ('real_estate', 'Real Estate'), ('trade', 'Trade')], max_length=20)),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interest_rows', to='website.newsletter')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'subscriber'), name='newsletter_interest_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_interests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:40
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0015_newsletter_interest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newsletter',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='newsletter_email_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0016_newsletter_email_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='newsletterdelivery',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=10),
+        ),
+    ]
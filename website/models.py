@@ -1,10 +1,25 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import F, Window
+from django.db.models.functions import Lower, RowNumber
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.urls import reverse
 from taggit.managers import TaggableManager
 from ckeditor_uploader.fields import RichTextUploadingField
 
+from .text import estimate_read_time, make_excerpt
+
+
+class LoadedValuesMixin:
+    """Remember the values a row had when it was loaded from the database,
+    so signal receivers can tell what an edit changed (`_loaded_values`)."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
 
 class Author(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -22,7 +37,39 @@ class Author(models.Model):
         return reverse('author_detail', kwargs={'pk': self.pk})
 
 
-class Article(models.Model):
+class ArticleQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(is_published=True)
+
+    def for_cards(self):
+        """Batch-load what listing cards render, so a page costs a fixed
+        number of queries no matter how many articles it shows. The body is
+        deferred; cards show the stored `excerpt` instead."""
+        return self.select_related('author__user').prefetch_related('tags').defer('body')
+
+    def latest_per_category(self, per_category=3):
+        """Return `{category: [articles]}` with the newest `per_category`
+        articles of every category, newest first.
+
+        Uses a single ROW_NUMBER() window query; databases without window
+        functions fall back to one query per entry in CATEGORY_CHOICES.
+        """
+        ordering = [F('created_at').desc(), F('id').desc()]
+        if connections[self.db].features.supports_over_clause:
+            rows = self.annotate(
+                category_rank=Window(RowNumber(), partition_by=F('category'), order_by=ordering),
+            ).filter(category_rank__lte=per_category).order_by('category', *ordering)
+        else:
+            rows = []
+            for code, _label in Article.CATEGORY_CHOICES:
+                rows.extend(self.filter(category=code).order_by(*ordering)[:per_category])
+        grouped = {}
+        for article in rows:
+            grouped.setdefault(article.category, []).append(article)
+        return grouped
+
+
+class Article(LoadedValuesMixin, models.Model):
     CATEGORY_CHOICES = [
         ("finance", "Finance"),
         ("technology", "Technology"),
@@ -43,7 +90,13 @@ class Article(models.Model):
     tags = TaggableManager()
     summary = models.TextField(help_text="Short teaser or preview paragraph", blank=True)
     body = RichTextUploadingField(help_text="Full article content")
-    featured_image = models.ImageField(upload_to='articles/%Y/%m/', blank=True)
+    excerpt = models.TextField(blank=True, editable=False, help_text="Plain-text teaser built from the summary (or body) on save")
+    featured_image = models.ImageField(
+        upload_to='articles/%Y/%m/', blank=True,
+        width_field='featured_image_width', height_field='featured_image_height',
+    )
+    featured_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    featured_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     meta_description = models.CharField(max_length=160, blank=True, help_text="SEO meta description")
     meta_keywords = models.CharField(max_length=255, blank=True, help_text="SEO keywords (comma-separated)")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
@@ -51,15 +104,40 @@ class Article(models.Model):
     is_published = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    read_time = models.PositiveIntegerField(default=0, help_text="Estimated reading time in minutes")
+    read_time = models.PositiveIntegerField(default=0, editable=False, help_text="Estimated reading time in minutes, computed from the body on save")
     view_count = models.PositiveIntegerField(default=0)
+    like_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of likes")
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False, help_text="Denormalized number of approved comments")
+
+    objects = ArticleQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination scans (see website.pagination)
+            models.Index(fields=['is_published', '-created_at', '-id'], name='article_pub_created_idx'),
+            models.Index(fields=['is_published', 'category', '-created_at', '-id'], name='article_pub_cat_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        derived = set()
+        if update_fields is None or {'summary', 'body'} & set(update_fields):
+            self.excerpt = self.build_excerpt()
+            derived.add('excerpt')
+        if update_fields is None or 'body' in update_fields:
+            self.read_time = estimate_read_time(self.body)
+            derived.add('read_time')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
+    def build_excerpt(self):
+        return make_excerpt(self.summary or self.body)
 
     def likes_count(self):
-        # returns number of likes related to this article
-        return getattr(self, 'likes', None) and self.likes.count() or 0
+        # kept in step with the Like table by Like.objects.set_liked()
+        return self.like_count
 
     def get_absolute_url(self):
         return reverse('article_detail', kwargs={'slug': self.slug})
@@ -68,7 +146,7 @@ class Article(models.Model):
 
 
 
-class Comment(models.Model):
+class Comment(LoadedValuesMixin, models.Model):
     article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     name = models.CharField(max_length=100)
@@ -87,6 +165,37 @@ class Comment(models.Model):
         return f'Comment by {self.name} on {self.article}'
 
 
+class LikeManager(models.Manager):
+    def set_liked(self, article_id, liked=None, user=None, ip_address=None):
+        """Like, unlike or (with `liked=None`) toggle an article for a visitor.
+
+        The Like row and `Article.like_count` change in one transaction.
+        Explicit `liked=True/False` is idempotent; duplicate inserts from
+        concurrent requests hit the unique constraint and are ignored
+        instead of racing a SELECT-then-INSERT. Returns `(liked, like_count)`.
+        """
+        owner = {'user': user} if user is not None else {'ip_address': ip_address}
+        with transaction.atomic():
+            delta = 0
+            if liked is not True:
+                deleted, _ = self.filter(article_id=article_id, **owner).delete()
+                if deleted:
+                    delta, liked = -deleted, False
+            if liked is not False and not delta:
+                try:
+                    with transaction.atomic():
+                        self.create(article_id=article_id, **owner)
+                    delta = 1
+                except IntegrityError:
+                    pass  # already liked, possibly by a concurrent request
+                liked = True
+            articles = Article.objects.filter(pk=article_id)
+            if delta:
+                articles.update(like_count=F('like_count') + delta)
+            like_count = articles.values_list('like_count', flat=True).get()
+        return liked, like_count
+
+
 class Like(models.Model):
     """
     Lightweight Like model to track article likes. Allows anonymous likes (by IP)
@@ -97,6 +206,8 @@ class Like(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LikeManager()
+
     class Meta:
         unique_together = (('article', 'user'), ('article', 'ip_address'))
 
@@ -111,10 +222,87 @@ class Newsletter(models.Model):
     is_active = models.BooleanField(default=True)
     interests = models.JSONField(default=dict, help_text="Subscriber's topic interests")
 
+    class Meta:
+        indexes = [
+            # Case-insensitive lookups by address (see import_subscribers)
+            models.Index(Lower('email'), name='newsletter_email_lower_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
 
+class NewsletterInterest(models.Model):
+    """Index of the categories in `Newsletter.interests`, one row per
+    subscriber and category, so segments can be counted and selected
+    without decoding JSON. Kept in sync by `newsletter.sync_interests`."""
+    subscriber = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='interest_rows')
+    category = models.CharField(max_length=20, choices=Article.CATEGORY_CHOICES)
+
+    class Meta:
+        constraints = [
+            # Leads with category: segment counts and selections are range scans
+            models.UniqueConstraint(fields=['category', 'subscriber'], name='newsletter_interest_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.subscriber} likes {self.category}'
+
+
+class NewsletterIssue(models.Model):
+    """One newsletter mailing; see website/newsletter.py for dispatch."""
+    subject = models.CharField(max_length=200)
+    intro = models.TextField(blank=True)
+    categories = models.JSONField(
+        default=list, blank=True,
+        help_text="Category codes this issue covers; subscribers interested in any of them receive it. "
+                  "Leave empty to send to every active subscriber.",
+    )
+    template_name = models.CharField(max_length=200, default='website/emails/newsletter_issue.html')
+    created_at = models.DateTimeField(auto_now_add=True)
+    planned_at = models.DateTimeField(null=True, blank=True, editable=False)
+    sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.subject
+
+
+class NewsletterDelivery(models.Model):
+    """Delivery state of one issue to one subscriber, so a dispatch can resume."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'  # the subscriber deactivated before it was sent
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+        (SKIPPED, 'Skipped'),
+    ]
+
+    issue = models.ForeignKey(NewsletterIssue, on_delete=models.CASCADE, related_name='deliveries')
+    subscriber = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='deliveries')
+    segment = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['issue', 'subscriber'], name='delivery_issue_subscriber_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['issue', 'status', 'id'], name='delivery_issue_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.issue} to {self.subscriber} ({self.status})'
+
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=200)
     email = models.EmailField()
@@ -0,0 +1,344 @@
+"""Newsletter subscribers: import helpers and the issue dispatcher."""
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Article, Newsletter, NewsletterDelivery, NewsletterInterest
+from .text import html_to_text
+
+
+def normalize_email(value):
+    """Return the stripped, lower-cased address or raise ValidationError."""
+    email = (value or '').strip().lower()
+    if not email:
+        raise ValidationError('missing email')
+    validate_email(email)
+    return email
+
+
+def normalize_interests(value):
+    """Coerce imported interests to the stored shape, `{'categories': [...]}`.
+
+    Accepts a dict (stored as is), a list of categories or a string of
+    comma/semicolon separated categories.
+    """
+    if value in (None, ''):
+        return {}
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        value = value.replace(';', ',').split(',')
+    if isinstance(value, (list, tuple)):
+        categories = sorted({str(item).strip() for item in value if str(item).strip()})
+        return {'categories': categories} if categories else {}
+    raise ValidationError(f'unsupported interests value {value!r}')
+
+
+def merge_interests(current, incoming):
+    """Merge two interests dicts: list values are unioned, others overwritten."""
+    merged = dict(current or {})
+    for key, value in (incoming or {}).items():
+        existing = merged.get(key)
+        if isinstance(existing, list) and isinstance(value, list):
+            merged[key] = sorted(set(existing) | set(value), key=str)
+        else:
+            merged[key] = value
+    return merged
+
+
+# Interest index
+#
+# NewsletterInterest mirrors the known categories of every subscriber's
+# `interests` so segments are answered from the (category, subscriber)
+# index. Saves go through the post_save receiver; bulk writers (imports,
+# the corpus generator) call `sync_interests` themselves.
+
+
+def subscriber_categories(interests):
+    if not isinstance(interests, dict):
+        return set()
+    return set(interests.get('categories') or ())
+
+
+def interest_categories(interests):
+    """The known category codes in an `interests` value."""
+    known = {code for code, _label in Article.CATEGORY_CHOICES}
+    return subscriber_categories(interests) & known
+
+
+def sync_interests(subscribers):
+    """Bring the index rows of `subscribers` (with pk and interests loaded)
+    in line with their `interests`."""
+    wanted = {(sub.pk, category) for sub in subscribers for category in interest_categories(sub.interests)}
+    pks = [sub.pk for sub in subscribers]
+    existing = set(
+        NewsletterInterest.objects.filter(subscriber_id__in=pks).values_list('subscriber_id', 'category')
+    )
+    stale = existing - wanted
+    with transaction.atomic():
+        for category in {category for _pk, category in stale}:
+            NewsletterInterest.objects.filter(
+                category=category, subscriber_id__in=[pk for pk, cat in stale if cat == category],
+            ).delete()
+        NewsletterInterest.objects.bulk_create(
+            [NewsletterInterest(subscriber_id=pk, category=category) for pk, category in wanted - existing],
+            ignore_conflicts=True,
+        )
+
+
+def segment(categories, match_all=False, active=True):
+    """Subscribers interested in any (or, with `match_all`, every) category."""
+    categories = set(categories)
+    members = NewsletterInterest.objects.filter(category__in=categories).order_by()
+    if match_all:
+        members = members.values('subscriber').annotate(n=Count('category')).filter(n=len(categories))
+    subscribers = Newsletter.objects.filter(pk__in=members.values('subscriber'))
+    return subscribers.filter(is_active=True) if active else subscribers
+
+
+def segment_counts(active=True):
+    """`{category: subscribers}` for every category, from the index alone."""
+    rows = NewsletterInterest.objects.order_by()
+    if active:
+        rows = rows.filter(subscriber__is_active=True)
+    counts = dict(rows.values_list('category').annotate(n=Count('pk')))
+    return {code: counts.get(code, 0) for code, _label in Article.CATEGORY_CHOICES}
+
+
+# Dispatch
+#
+# An issue is sent in three steps. `plan_deliveries` snapshots the audience
+# once as NewsletterDelivery rows, each tagged with its segment: the issue
+# categories the subscriber is interested in (all of them for subscribers
+# without known interests). `Dispatcher` then walks the pending rows in
+# primary-key batches, renders the issue once per segment and sends over a
+# few persistent SMTP connections in parallel, recording every
+# recipient's outcome after each batch. Re-running picks up whatever
+# is still pending, or failed with attempts left; at most the batch in
+# flight when a run died is sent twice. Subscribers who deactivated since
+# the plan was made are never sent to; their rows are marked skipped.
+
+
+def plan_deliveries(issue, batch_size=1000):
+    """Create the delivery rows for `issue` once; return how many exist.
+
+    The audience comes from the interest index: subscribers with a
+    matching category, plus those with no known interests at all.
+    """
+    if issue.planned_at is None:
+        categories = set(issue.categories or ())
+        active = Newsletter.objects.filter(is_active=True).order_by('pk')
+        if categories:
+            matched = NewsletterInterest.objects.filter(subscriber__is_active=True, category__in=categories)
+            unknown = ~Exists(NewsletterInterest.objects.filter(subscriber=OuterRef('pk')))
+            audience = active.filter(Q(pk__in=matched.values('subscriber')) | unknown)
+        else:
+            audience = active
+        pks = audience.values_list('pk', flat=True).iterator(chunk_size=batch_size)
+        with transaction.atomic():
+            for chunk in _chunks(pks, batch_size):
+                segments = {pk: set() for pk in chunk}
+                if categories:
+                    rows = NewsletterInterest.objects.filter(subscriber_id__in=chunk, category__in=categories)
+                    for pk, category in rows.values_list('subscriber_id', 'category'):
+                        segments[pk].add(category)
+                NewsletterDelivery.objects.bulk_create([
+                    NewsletterDelivery(issue=issue, subscriber_id=pk, segment=','.join(sorted(matched or categories)))
+                    for pk, matched in segments.items()
+                ], ignore_conflicts=True)
+            issue.planned_at = timezone.now()
+            issue.save(update_fields=['planned_at'])
+    return issue.deliveries.count()
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def unsubscribe_address():
+    return getattr(settings, 'NEWSLETTER_UNSUBSCRIBE_EMAIL', settings.DEFAULT_FROM_EMAIL)
+
+
+def unsubscribe_url(email=None):
+    """`mailto:` URL that asks to unsubscribe `email` (or the sender)."""
+    subject = f'Unsubscribe {email}' if email else 'Unsubscribe'
+    return f'mailto:{unsubscribe_address()}?subject={quote(subject)}'
+
+
+def render_segment(issue, segment, site_url):
+    """Render `issue` for one segment; returns `(subject, text, html)`."""
+    labels = dict(Article.CATEGORY_CHOICES)
+    articles = Article.objects.published().only('slug', 'title', 'excerpt', 'category', 'created_at')
+    if segment:
+        articles = articles.filter(category__in=segment)
+    html = render_to_string(issue.template_name, {
+        'issue': issue,
+        'categories': [labels.get(code, code) for code in segment],
+        'articles': articles[:5],
+        'site_url': site_url,
+        'unsubscribe_email': unsubscribe_address(),
+        'unsubscribe_url': unsubscribe_url(),
+    })
+    return issue.subject, html_to_text(html), html
+
+
+class Throttle:
+    """Space calls at least `1 / rate` seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Dispatcher:
+    """Send the outstanding deliveries of one issue; see the notes above.
+
+    Rendering and all database work happen on the calling thread; the
+    worker threads only talk SMTP, one connection each.
+    """
+
+    def __init__(self, issue, connections=None, batch_size=None, rate=None, max_attempts=None,
+                 retry_delay=1.0, from_email=None, site_url=None):
+        self.issue = issue
+        self.connections = connections or getattr(settings, 'NEWSLETTER_CONNECTIONS', 2)
+        self.batch_size = batch_size or getattr(settings, 'NEWSLETTER_BATCH_SIZE', 100)
+        self.throttle = Throttle(getattr(settings, 'NEWSLETTER_RATE_LIMIT', 0) if rate is None else rate)
+        self.max_attempts = max_attempts or getattr(settings, 'NEWSLETTER_MAX_ATTEMPTS', 3)
+        self.retry_delay = retry_delay
+        self.from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        self.site_url = site_url or f'https://{Site.objects.get_current().domain}'
+        self.rendered = {}
+        self.stats = {'sent': 0, 'failed': 0, 'skipped': 0}
+        self._stats_lock = threading.Lock()
+
+    def outstanding(self):
+        return self._unsent().filter(subscriber__is_active=True)
+
+    def _unsent(self):
+        return self.issue.deliveries.filter(
+            Q(status=NewsletterDelivery.PENDING)
+            | Q(status=NewsletterDelivery.FAILED, attempts__lt=self.max_attempts)
+        )
+
+    def skip_inactive(self):
+        """Close the rows of subscribers who deactivated after planning."""
+        skipped = self._unsent().filter(subscriber__is_active=False).update(
+            status=NewsletterDelivery.SKIPPED, last_error='Subscriber inactive',
+        )
+        self.stats['skipped'] += skipped
+        return skipped
+
+    def run(self):
+        plan_deliveries(self.issue)
+        pool = [get_connection(fail_silently=False) for _ in range(self.connections)]
+        try:
+            for connection in pool:
+                # Opened here so send_messages() reuses it instead of
+                # connecting and quitting around every call
+                connection.open()
+            with ThreadPoolExecutor(max_workers=len(pool)) as executor:
+                for attempt in range(self.max_attempts):
+                    if attempt:
+                        if not self.outstanding().exists():
+                            break
+                        time.sleep(self.retry_delay * attempt)
+                    self.send_pass(executor, pool)
+        finally:
+            for connection in pool:
+                try:
+                    connection.close()
+                except (smtplib.SMTPException, OSError):
+                    pass
+
+        if self.issue.sent_at is None and not self.outstanding().exists():
+            self.issue.sent_at = timezone.now()
+            self.issue.save(update_fields=['sent_at'])
+        return self.stats
+
+    def send_pass(self, executor, pool):
+        """One keyset walk over everything still outstanding."""
+        self.skip_inactive()
+        last_pk = 0
+        while True:
+            batch = list(
+                self.outstanding().filter(pk__gt=last_pk)
+                .select_related('subscriber')
+                .only('segment', 'status', 'attempts', 'last_error', 'sent_at', 'subscriber__email')
+                .order_by('pk')[:self.batch_size]
+            )
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+            messages = [(delivery, self.message_for(delivery)) for delivery in batch]
+            # Deal each connection an interleaved share of the batch
+            shares = [messages[i::len(pool)] for i in range(len(pool))]
+            list(executor.map(self.send_share, pool, shares))
+            NewsletterDelivery.objects.bulk_update(batch, ['status', 'attempts', 'last_error', 'sent_at'])
+
+    def message_for(self, delivery):
+        segment = tuple(filter(None, delivery.segment.split(',')))
+        if segment not in self.rendered:
+            self.rendered[segment] = render_segment(self.issue, segment, self.site_url)
+        subject, text, html = self.rendered[segment]
+        email = delivery.subscriber.email
+        message = EmailMultiAlternatives(subject, text, self.from_email, [email], headers={
+            # Mail clients show an unsubscribe button for bulk mail with this
+            'List-Unsubscribe': f'<{unsubscribe_url(email)}>',
+        })
+        message.attach_alternative(html, 'text/html')
+        return message
+
+    def send_share(self, connection, messages):
+        """Send over one connection, recording each outcome on its delivery."""
+        for delivery, message in messages:
+            delivery.attempts += 1
+            self.throttle.wait()
+            try:
+                try:
+                    connection.send_messages([message])
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # The server dropped the connection; reconnect once
+                    connection.close()
+                    connection.open()
+                    connection.send_messages([message])
+            except (smtplib.SMTPException, OSError) as exc:
+                delivery.status = NewsletterDelivery.FAILED
+                delivery.last_error = str(exc)[:1000]
+                outcome = 'failed'
+            else:
+                delivery.status = NewsletterDelivery.SENT
+                delivery.last_error = ''
+                delivery.sent_at = timezone.now()
+                outcome = 'sent'
+            with self._stats_lock:
+                self.stats[outcome] += 1
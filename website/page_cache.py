@@ -0,0 +1,152 @@
+"""Full-page cache for anonymous readers.
+
+`anonymous_page_cache` stores the rendered response of a GET view, keyed
+by path and query string, for visitors who are not logged in. Every path
+has a generation token stored next to its pages; `invalidate_paths()`
+replaces the token, which drops every query-string variant of that path at
+once (e.g. all `?cursor=` pages of a category list).
+
+Responses are never stored when rendering used a CSRF token, consumed
+flash messages or set a cookie, because those are per-visitor.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.urls import reverse
+
+HITS_KEY = 'pagecache:hits'
+MISSES_KEY = 'pagecache:misses'
+
+# Set by django.contrib.messages' cookie storage when messages are pending
+MESSAGES_COOKIE = 'messages'
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(path):
+    return 'pagecache:gen:' + hashlib.md5(path.encode()).hexdigest()
+
+
+def _page_key(path, query_string, generation):
+    digest = hashlib.md5(f'{path}?{query_string}'.encode()).hexdigest()
+    return f'pagecache:page:{generation}:{digest}'
+
+
+def _count(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    """Return `{'hits': int, 'misses': int}` counted across all workers."""
+    values = _cache().get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': values.get(HITS_KEY, 0), 'misses': values.get(MISSES_KEY, 0)}
+
+
+def reset_stats():
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+def invalidate_paths(paths):
+    """Drop every cached variant of each path in `paths`."""
+    if not getattr(settings, 'PAGE_CACHE_ENABLED', False):
+        return
+    _cache().set_many({_generation_key(path): uuid.uuid4().hex for path in paths}, None)
+
+
+def _cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pending flash messages must be rendered for this visitor only
+    return not request.COOKIES.get(MESSAGES_COOKIE)
+
+
+def _cacheable_response(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    messages = getattr(request, '_messages', None)
+    if messages is not None and messages.used:
+        return False
+    cache_control = response.get('Cache-Control', '')
+    return 'private' not in cache_control and 'no-store' not in cache_control
+
+
+def anonymous_page_cache(view):
+    """Serve `view` from the page cache for anonymous GET/HEAD requests."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not getattr(settings, 'PAGE_CACHE_ENABLED', False) or not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        cache = _cache()
+        path = request.path
+        generation = cache.get(_generation_key(path))
+        if generation is None:
+            generation = uuid.uuid4().hex
+            if not cache.add(_generation_key(path), generation, None):
+                generation = cache.get(_generation_key(path))
+        key = _page_key(path, request.META.get('QUERY_STRING', ''), generation)
+
+        cached = cache.get(key)
+        if cached is not None:
+            _count(HITS_KEY)
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'HIT'
+            return response
+
+        _count(MISSES_KEY)
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        if _cacheable_response(request, response):
+            cache.set(
+                key,
+                (response.content, response['Content-Type']),
+                getattr(settings, 'PAGE_CACHE_TIMEOUT', 600),
+            )
+        response['X-Page-Cache'] = 'MISS'
+        return response
+
+    return wrapper
+
+
+def article_paths(article, categories=(), slugs=()):
+    """Paths whose rendering depends on `article`.
+
+    `categories` and `slugs` add extra values (e.g. the ones the article
+    had before an edit) so the pages it used to appear on are dropped too.
+    """
+    paths = {reverse('home'), reverse('article_list')}
+    for slug in {article.slug, *slugs}:
+        if slug:
+            paths.update(comment_paths(slug))
+    for category in {article.category, *categories}:
+        if category:
+            # Both spellings route to the same list (see views.article_list)
+            for category_slug in {category, category.replace('_', '-')}:
+                paths.add(reverse('article_list_by_category', kwargs={'category_slug': category_slug}))
+    return paths
+
+
+def comment_paths(slug):
+    """Paths that render the approved comments of the article with `slug`."""
+    return {
+        reverse('article_detail', kwargs={'slug': slug}),
+        reverse('article_comments', kwargs={'slug': slug}),
+    }
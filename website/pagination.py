@@ -0,0 +1,137 @@
+"""Keyset (cursor) pagination.
+
+Pages are addressed by an opaque `?cursor=` token that encodes the sort
+key of the row at the page boundary, so fetching any page is a single
+indexed range scan: no OFFSET, no COUNT(*), and links stay valid while new
+articles are published at the head of the list.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(position, direction):
+    payload = json.dumps({'p': list(position), 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return `(position, direction)` for a token built by `encode_cursor`."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position, direction = data['p'], data['d']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(position, list):
+        raise InvalidCursor(cursor)
+    return position, direction
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_paginate(fetch, key, cursor, per_page):
+    """Build one page from a keyset-capable `fetch` callable.
+
+    `fetch(limit=..., after=..., before=...)` must return rows in display
+    order when paging forward (`after`), and nearest-first (i.e. reversed)
+    when paging backward (`before`). `key(row)` returns the JSON-able
+    position of a row. Raises `InvalidCursor` for a malformed token.
+    """
+    position, direction = decode_cursor(cursor) if cursor else (None, 'next')
+
+    if direction == 'prev':
+        rows = list(fetch(limit=per_page + 1, before=position))
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_previous, has_next = has_more, True
+    else:
+        rows = list(fetch(limit=per_page + 1, after=position))
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = position is not None
+
+    if not rows:
+        return KeysetPage([])
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(key(rows[-1]), 'next') if has_next else None,
+        previous_cursor=encode_cursor(key(rows[0]), 'prev') if has_previous else None,
+    )
+
+
+def paginate_articles(queryset, cursor, per_page):
+    """Newest-first keyset pagination of an Article queryset on (created_at, id)."""
+    return paginate_by_created(queryset, cursor, per_page)
+
+
+def paginate_by_created(queryset, cursor, per_page, newest_first=True):
+    """Keyset pagination of any queryset with a `created_at` column.
+
+    Rows are ordered on (created_at, id), newest first by default; pass
+    `newest_first=False` for chronological order (e.g. comment threads).
+    """
+
+    def fetch(limit, after=None, before=None):
+        qs = queryset
+        # Paging forward moves to older rows when newest_first, newer otherwise
+        if after is not None:
+            qs = qs.filter(_beyond(after, older=newest_first))
+        if before is not None:
+            qs = qs.filter(_beyond(before, older=not newest_first))
+            return qs.order_by(*_ordering(not newest_first))[:limit]
+        return qs.order_by(*_ordering(newest_first))[:limit]
+
+    return keyset_paginate(fetch, _created_position, cursor, per_page)
+
+
+def _beyond(position, older):
+    created_at, pk = _parse_position(position)
+    if older:
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+
+
+def _ordering(descending):
+    return ('-created_at', '-pk') if descending else ('created_at', 'pk')
+
+
+def _created_position(obj):
+    return [obj.created_at.isoformat(), obj.pk]
+
+
+def _parse_position(position):
+    try:
+        created_at, pk = position
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        raise InvalidCursor(position)
+    if created_at is None:
+        raise InvalidCursor(position)
+    return created_at, pk
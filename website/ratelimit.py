@@ -0,0 +1,176 @@
+"""Rate limiting for the write endpoints, kept entirely in the cache.
+
+Each policy in `settings.RATE_LIMITS` is a bucket of ``N`` requests that
+refills at ``N`` per period, e.g. ``'10/m'``. Visitors are keyed by user
+id when logged in and otherwise by client IP, taken from X-Forwarded-For
+as far as `TRUSTED_PROXY_COUNT` allows.
+
+A true token bucket needs a read-modify-write of (tokens, timestamp) in
+one step, which the cache API doesn't offer. Instead every request does
+one `incr` on a counter for the current period and reads the previous
+period's counter; the previous count is weighted by how much of it still
+overlaps the sliding window. That allows the same bursts and the same
+sustained rate as the bucket and never touches the database, so rejected
+requests are shed before any ORM work.
+
+The limits are only exact if `incr` is atomic and shared by all workers,
+as with Redis or Memcached. FileBasedCache (the default CACHES) implements
+`incr` as get-then-set, so concurrent workers can lose increments and let
+some extra requests through; LocMemCache is atomic but per process, so
+each worker gets its own bucket. Settings put the counters in a Redis
+cache when REDIS_URL is set; otherwise `check_cache` (website.W001) warns
+at `manage.py check`/`migrate` time whenever DEBUG is off.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+from core.allowlist import visitor_ip
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _cache():
+    return caches[getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')]
+
+
+# Backends whose incr is atomic and shared between processes
+ATOMIC_BACKENDS = {
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+}
+
+
+@checks.register(checks.Tags.caches)
+def check_cache(app_configs, **kwargs):
+    if settings.DEBUG or not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return []
+    alias = getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if backend in ATOMIC_BACKENDS:
+        return []
+    return [checks.Warning(
+        f"Rate limits are counted in the '{alias}' cache ({backend}), which "
+        "is not atomic across workers, so concurrent requests can exceed them.",
+        hint="Set REDIS_URL, or point RATE_LIMIT_CACHE_ALIAS at a Redis or Memcached cache.",
+        id='website.W001',
+    )]
+
+
+def parse_rate(rate):
+    """`'10/m'` -> `(10, 60)`; the period may carry a count, e.g. `'5/10m'`."""
+    count, _slash, period = rate.partition('/')
+    multiplier, unit = period[:-1] or '1', period[-1:]
+    if unit not in UNITS or not count.isdigit() or not multiplier.isdigit():
+        raise ValueError(f'Invalid rate {rate!r}; expected e.g. "10/m"')
+    return int(count), int(multiplier) * UNITS[unit]
+
+
+def visitor_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    # Behind nginx REMOTE_ADDR is the proxy, which every visitor shares
+    ip = visitor_ip(request.META, getattr(settings, 'TRUSTED_PROXY_COUNT', 1))
+    return f"ip:{ip or ''}"
+
+
+def _counter_key(policy, visitor, window):
+    return f'ratelimit:{policy}:{visitor}:{window}'
+
+
+def _stat_key(policy, outcome):
+    return f'ratelimit:stats:{policy}:{outcome}'
+
+
+def _incr(cache, key, timeout):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+def hit(policy, visitor, now=None):
+    """Count one request; return `(allowed, retry_after_seconds)`."""
+    limit, period = parse_rate(settings.RATE_LIMITS[policy])
+    now = time.time() if now is None else now
+    window, offset = divmod(now, period)
+    window = int(window)
+    cache = _cache()
+    # Kept for two periods: the current one, then as the previous one
+    current = _incr(cache, _counter_key(policy, visitor, window), period * 2)
+    previous = cache.get(_counter_key(policy, visitor, window - 1), 0)
+    overlap = 1 - offset / period
+    used = current + previous * overlap
+    allowed = used <= limit
+    _incr(cache, _stat_key(policy, 'allowed' if allowed else 'limited'), None)
+    if allowed:
+        return True, 0
+    # Wait until the previous period's weight has decayed enough (or, if
+    # this period alone is over, until it ends)
+    if previous and current <= limit:
+        wait = (used - limit) / previous * period
+    else:
+        wait = period - offset
+    return False, max(1, math.ceil(wait))
+
+
+def too_many_requests(request, retry_after, as_json):
+    if as_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        response = JsonResponse(
+            {'status': 'error', 'error': 'Too many requests, please try again later.', 'retry_after': retry_after},
+            status=429,
+        )
+    else:
+        response = HttpResponse('Too many requests, please try again later.', status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(policy, methods=('POST',), json=False):
+    """Apply the `policy` bucket to requests using one of `methods`.
+
+    Rejected requests get a 429 with Retry-After, as JSON when `json` is
+    set or the request came from XMLHttpRequest.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                getattr(settings, 'RATE_LIMIT_ENABLED', True)
+                and policy in getattr(settings, 'RATE_LIMITS', {})
+                and request.method in methods
+            ):
+                allowed, retry_after = hit(policy, visitor_key(request))
+                if not allowed:
+                    return too_many_requests(request, retry_after, json)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stats():
+    """Return `{policy: {'allowed': int, 'limited': int}}` across all workers."""
+    policies = list(getattr(settings, 'RATE_LIMITS', {}))
+    keys = [_stat_key(policy, outcome) for policy in policies for outcome in ('allowed', 'limited')]
+    values = _cache().get_many(keys)
+    return {
+        policy: {outcome: values.get(_stat_key(policy, outcome), 0) for outcome in ('allowed', 'limited')}
+        for policy in policies
+    }
+
+
+def reset_stats():
+    _cache().delete_many([
+        _stat_key(policy, outcome)
+        for policy in getattr(settings, 'RATE_LIMITS', {}) for outcome in ('allowed', 'limited')
+    ])
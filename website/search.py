@@ -0,0 +1,269 @@
+"""Full-text search for articles.
+
+The default backend on SQLite keeps an FTS5 virtual table
+(`website_article_fts`) in sync with published articles and ranks matches
+with BM25. Other databases fall back to a plain `icontains` scan. A custom
+backend can be selected with `settings.SEARCH_BACKEND` (dotted path).
+"""
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from .pagination import InvalidCursor
+from .text import html_to_text
+
+FTS_TABLE = 'website_article_fts'
+
+# bm25() column weights, in table column order: title, summary, body, tags
+BM25_WEIGHTS = (10.0, 4.0, 1.0, 6.0)
+
+# Sentinels used by snippet(); replaced with <mark> after escaping
+_HL_START = '\x02'
+_HL_END = '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SearchHit = namedtuple('SearchHit', ['pk', 'rank', 'snippet'])
+
+
+def highlight(snippet):
+    """Escape a raw snippet and turn the match sentinels into <mark> tags."""
+    if not snippet:
+        return ''
+    return mark_safe(
+        escape(snippet).replace(_HL_START, '<mark>').replace(_HL_END, '</mark>')
+    )
+
+
+class BaseSearchBackend:
+    """Interface every search backend implements."""
+
+    def index_article(self, article):
+        raise NotImplementedError
+
+    def remove_article(self, pk):
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=500):
+        """Re-index every published article. Returns the number indexed."""
+        raise NotImplementedError
+
+    def search(self, query, category=None, limit=None, after=None, before=None):
+        """Return a ranked list of `SearchHit` for `query`.
+
+        `after`/`before` take a `(rank, pk)` position from a previous hit and
+        return the hits that follow it (in rank order) or precede it
+        (nearest first), which is what keyset pagination needs.
+        """
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Portable fallback: substring match over the article columns.
+
+    Needs no index, so the sync hooks are no-ops.
+    """
+
+    def index_article(self, article):
+        pass
+
+    def remove_article(self, pk):
+        pass
+
+    def rebuild(self, batch_size=500):
+        return 0
+
+    def search(self, query, category=None, limit=None, after=None, before=None):
+        from django.db.models import Q
+        from django.utils.dateparse import parse_datetime
+        from .models import Article
+
+        query = (query or '').strip()
+        if not query:
+            return []
+        matches = Article.objects.filter(
+            Q(title__icontains=query)
+            | Q(summary__icontains=query)
+            | Q(body__icontains=query)
+            | Q(tags__name__icontains=query)
+        )
+        qs = Article.objects.filter(is_published=True, pk__in=matches.values('pk'))
+        if category:
+            qs = qs.filter(category=category)
+        # Newest first; the rank is the creation timestamp
+        ordering = ('-created_at', '-pk')
+        if after is not None:
+            created_at, pk = _parse_position(after, parse_datetime)
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        if before is not None:
+            created_at, pk = _parse_position(before, parse_datetime)
+            qs = qs.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            ordering = ('created_at', 'pk')
+        rows = qs.order_by(*ordering).values_list('pk', 'created_at')
+        if limit:
+            rows = rows[:limit]
+        return [SearchHit(pk, created_at.isoformat(), '') for pk, created_at in rows]
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """FTS5 index with BM25 ranking and highlighted snippets.
+
+    Only published articles are stored; the rowid is the article pk.
+    """
+
+    def _row(self, article, tag_names=None):
+        if tag_names is None:
+            tag_names = article.tags.names()
+        return (
+            article.pk,
+            article.title,
+            html_to_text(article.summary),
+            html_to_text(article.body),
+            ' '.join(tag_names),
+            article.category,
+        )
+
+    def index_article(self, article):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [article.pk])
+            if article.is_published:
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, summary, body, tags, category) '
+                    'VALUES (%s, %s, %s, %s, %s, %s)',
+                    self._row(article),
+                )
+
+    def remove_article(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+    def rebuild(self, batch_size=500):
+        from .models import Article
+
+        articles = (
+            Article.objects.filter(is_published=True)
+            .only('pk', 'title', 'summary', 'body', 'category')
+            .prefetch_related('tags')
+            .order_by('pk')
+        )
+        count = 0
+        batch = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for article in articles.iterator(chunk_size=batch_size):
+                batch.append(self._row(article, [t.name for t in article.tags.all()]))
+                if len(batch) >= batch_size:
+                    count += self._insert_many(cursor, batch)
+                    batch = []
+            if batch:
+                count += self._insert_many(cursor, batch)
+            # Merge the b-tree segments written by the bulk load
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return count
+
+    def _insert_many(self, cursor, rows):
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, summary, body, tags, category) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            rows,
+        )
+        return len(rows)
+
+    @staticmethod
+    def build_match(query):
+        """Turn free text into a safe FTS5 MATCH expression.
+
+        Every word becomes a quoted phrase (so operators and punctuation in
+        user input can't break the query) and the last one is a prefix
+        match, which keeps "as you type" searches useful.
+        """
+        tokens = _TOKEN_RE.findall(query or '')
+        if not tokens:
+            return ''
+        terms = [f'"{t}"' for t in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query, category=None, limit=None, after=None, before=None):
+        match = self.build_match(query)
+        if not match:
+            return []
+        limit = limit or getattr(settings, 'SEARCH_RESULTS_LIMIT', 100)
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        sql = (
+            f'SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score, '
+            f"snippet({FTS_TABLE}, -1, %s, %s, '…', 24) AS snip "
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [_HL_START, _HL_END, match]
+        if category:
+            sql += ' AND category = %s'
+            params.append(category)
+        # bm25() is lower-is-better, so rank order is ascending score
+        order = 'score, rowid'
+        if after is not None:
+            score, pk = _parse_position(after, float)
+            sql = f'SELECT rowid, score, snip FROM ({sql}) WHERE score > %s OR (score = %s AND rowid > %s)'
+            params += [score, score, pk]
+        elif before is not None:
+            score, pk = _parse_position(before, float)
+            sql = f'SELECT rowid, score, snip FROM ({sql}) WHERE score < %s OR (score = %s AND rowid < %s)'
+            params += [score, score, pk]
+            order = 'score DESC, rowid DESC'
+        sql += f' ORDER BY {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [SearchHit(pk, score, snippet) for pk, score, snippet in cursor.fetchall()]
+
+
+def _parse_position(position, parse_rank):
+    try:
+        rank, pk = position
+        rank, pk = parse_rank(rank), int(pk)
+    except (TypeError, ValueError):
+        rank = None
+    if rank is None:
+        raise InvalidCursor(position)
+    return rank, pk
+
+
+def get_search_backend():
+    """Return the configured backend, defaulting by database vendor."""
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTS5Backend()
+    return DatabaseSearchBackend()
+
+
+def search_articles(query, category=None, limit=None, after=None, before=None):
+    """Run a search and return published Article objects in rank order.
+
+    Each article gets a `search_snippet` attribute with the highlighted
+    match (empty for backends that don't produce snippets) and a
+    `search_position` to resume from with `after`/`before`.
+    """
+    from .models import Article
+
+    hits = get_search_backend().search(
+        query, category=category, limit=limit, after=after, before=before,
+    )
+    if not hits:
+        return []
+    by_pk = Article.objects.published().for_cards().in_bulk([h.pk for h in hits])
+    results = []
+    for hit in hits:
+        article = by_pk.get(hit.pk)
+        if article is None:
+            continue
+        article.search_snippet = highlight(hit.snippet)
+        article.search_position = [hit.rank, hit.pk]
+        results.append(article)
+    return results
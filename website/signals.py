@@ -0,0 +1,128 @@
+"""Signal receivers that keep derived data in sync with the content models."""
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from taggit.models import Tag
+
+from . import images, newsletter, page_cache, sitemaps, tags
+from .models import Article, Comment, Like, Newsletter
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Article)
+def article_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index_article(instance)
+    loaded = getattr(instance, '_loaded_values', {})
+    _featured_image_changed(instance.featured_image.name, loaded.get('featured_image'))
+    # A later save of the same instance must compare against the stored image
+    instance._loaded_values = {**loaded, 'featured_image': instance.featured_image.name}
+    _invalidate_on_commit(instance, page_cache.article_paths(
+        instance,
+        categories=[loaded.get('category')],
+        slugs=[loaded.get('slug')],
+    ))
+
+
+def _invalidate_on_commit(article, paths):
+    # Dropping caches before the commit would let a concurrent request
+    # re-cache the old row under the new generation
+    pk = article.pk
+
+    def invalidate():
+        sitemaps.invalidate_article(pk)
+        tags.invalidate()
+        page_cache.invalidate_paths(paths)
+
+    transaction.on_commit(invalidate)
+
+
+def _featured_image_changed(name, old_name):
+    if name == old_name:
+        return
+    if old_name:
+        images.delete_derivatives(old_name)
+    if name:
+        try:
+            images.generate_derivatives(name)
+        except Exception:
+            # The original still renders; generate_image_derivatives can retry
+            logger.exception('Could not build derivatives for %s', name)
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted(sender, instance, **kwargs):
+    get_search_backend().remove_article(instance.pk)
+    _invalidate_on_commit(instance, page_cache.article_paths(instance))
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def article_tags_changed(sender, instance, action, **kwargs):
+    # taggit sends m2m_changed from the tag manager with the article as instance
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Article):
+        get_search_backend().index_article(instance)
+        _invalidate_on_commit(instance, page_cache.article_paths(instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    # Renamed or deleted tags must not linger in the cached ranking
+    tags.invalidate()
+
+
+def _comment_changed(comment, was_approved=False, delta=0):
+    # Only approved comments are rendered, so pending ones never stale a page
+    if not (comment.is_approved or was_approved):
+        return
+    articles = Article.objects.filter(pk=comment.article_id)
+    if delta:
+        articles.update(approved_comment_count=F('approved_comment_count') + delta)
+    slug = articles.values_list('slug', flat=True).first()
+    if slug:
+        paths = page_cache.comment_paths(slug)
+        transaction.on_commit(lambda: page_cache.invalidate_paths(paths))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    was_approved = getattr(instance, '_loaded_values', {}).get('is_approved', False)
+    _comment_changed(instance, was_approved, delta=int(instance.is_approved) - int(was_approved))
+    # A later save of the same instance must compare against what is now stored
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), 'is_approved': instance.is_approved}
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    _comment_changed(instance, delta=-int(instance.is_approved))
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def like_changed(sender, instance, raw=False, **kwargs):
+    # The detail page renders like_count, which set_liked() updates in the
+    # same transaction; drop the page once that count is committed
+    if raw:
+        return
+    slug = Article.objects.filter(pk=instance.article_id).values_list('slug', flat=True).first()
+    if slug:
+        path = reverse('article_detail', kwargs={'slug': slug})
+        transaction.on_commit(lambda: page_cache.invalidate_paths([path]))
+
+
+@receiver(post_save, sender=Newsletter)
+def newsletter_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Always re-synced (one indexed read): interests is a mutable dict, so
+    # comparing with the loaded value would miss in-place edits
+    if raw or (update_fields is not None and 'interests' not in update_fields):
+        return
+    newsletter.sync_interests([instance])
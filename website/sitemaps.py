@@ -1,16 +1,35 @@
+"""Sharded sitemap index for published articles.
+
+Articles are split into shards by primary-key range (`SITEMAP_SHARD_SIZE`
+ids per shard), so an article always lives in the same shard and editing
+it only invalidates that one. Each shard is generated with a keyset scan
+over `(pk, slug, updated_at)` and streamed; the finished XML is cached
+until an article in its range changes.
+
+The index lists every non-empty shard with its lastmod, and both views
+answer `If-Modified-Since` with 304, so crawlers only re-fetch shards that
+actually changed.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.core.cache import cache
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Max, Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
-from .models import Article
+from django.utils.html import escape
+from django.views.decorators.http import condition, require_safe
 
-class ArticleSitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.8
+from core.db_routing import replica_reads
 
-    def items(self):
-        return Article.objects.filter(status='published')
+from .models import Article
+
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+INDEX_KEY = 'sitemap:index'
+FETCH_SIZE = 1000
 
-    def lastmod(self, obj):
-        return obj.updated_at
 
 class StaticSitemap(Sitemap):
     changefreq = "monthly"
@@ -20,4 +39,151 @@ class StaticSitemap(Sitemap):
         return ['home', 'about', 'contact', 'article_list']
 
     def location(self, item):
-        return reverse(item)
\ No newline at end of file
+        return reverse(item)
+
+
+def shard_size():
+    return getattr(settings, 'SITEMAP_SHARD_SIZE', 10000)
+
+
+def shard_for(pk):
+    return (pk - 1) // shard_size()
+
+
+def _shard_key(shard):
+    return f'sitemap:shard:{shard}'
+
+
+def _touched_key(shard):
+    return f'sitemap:touched:{shard}'
+
+
+def invalidate_article(pk):
+    """Drop the cached shard holding article `pk` and the index.
+
+    The time is remembered so the shard's lastmod moves forward even when
+    the change removed the article (deleted or unpublished).
+    """
+    shard = shard_for(pk)
+    cache.set(_touched_key(shard), time.time(), None)
+    cache.delete_many([_shard_key(shard), INDEX_KEY])
+
+
+def shard_index():
+    """Return `{shard: lastmod}` for every shard with published articles."""
+    index = cache.get(INDEX_KEY)
+    if index is not None:
+        return index
+    # Unpublished rows still count towards lastmod: unpublishing bumps
+    # updated_at and removes a URL from the shard.
+    rows = (
+        Article.objects.order_by()
+        .annotate(shard=ExpressionWrapper((F('pk') - 1) / shard_size(), output_field=IntegerField()))
+        .values('shard')
+        .annotate(published=Count('pk', filter=Q(is_published=True)), lastmod=Max('updated_at'))
+    )
+    shards = {row['shard']: row['lastmod'] for row in rows if row['published']}
+    touched = cache.get_many([_touched_key(shard) for shard in shards])
+    for shard in shards:
+        stamp = touched.get(_touched_key(shard))
+        if stamp is not None:
+            shards[shard] = max(shards[shard], datetime.fromtimestamp(stamp, tz=timezone.utc))
+    cache.set(INDEX_KEY, shards, None)
+    return shards
+
+
+def _index_lastmod(request):
+    return max(shard_index().values(), default=None)
+
+
+def _shard_lastmod(request, shard):
+    return shard_index().get(shard)
+
+
+@replica_reads()
+@require_safe
+@condition(last_modified_func=_index_lastmod)
+def index(request):
+    """`/sitemap.xml`: one <sitemap> entry per shard plus the static pages."""
+    entries = [(reverse('sitemap_static'), None)]
+    for shard, lastmod in sorted(shard_index().items()):
+        entries.append((reverse('sitemap_articles', kwargs={'shard': shard}), lastmod))
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{XMLNS}">\n']
+    for path, lastmod in entries:
+        parts.append(f'<sitemap><loc>{escape(request.build_absolute_uri(path))}</loc>')
+        if lastmod:
+            parts.append(f'<lastmod>{lastmod.isoformat()}</lastmod>')
+        parts.append('</sitemap>\n')
+    parts.append('</sitemapindex>\n')
+    return HttpResponse(''.join(parts), content_type='application/xml')
+
+
+@replica_reads()
+@require_safe
+def static_pages(request):
+    sitemap = StaticSitemap()
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n']
+    for item in sitemap.items():
+        loc = escape(request.build_absolute_uri(sitemap.location(item)))
+        parts.append(
+            f'<url><loc>{loc}</loc><changefreq>{sitemap.changefreq}</changefreq>'
+            f'<priority>{sitemap.priority}</priority></url>\n'
+        )
+    parts.append('</urlset>\n')
+    return HttpResponse(''.join(parts), content_type='application/xml')
+
+
+@replica_reads()
+@require_safe
+@condition(last_modified_func=_shard_lastmod)
+def articles(request, shard):
+    """One shard of article URLs, streamed on a cache miss."""
+    if shard not in shard_index():
+        raise Http404('No such sitemap shard')
+    # Cached shards store paths, so one copy serves every host name
+    cached = cache.get(_shard_key(shard))
+    if cached is not None:
+        content = cached.replace('{base}', _base_url(request))
+        return HttpResponse(content, content_type='application/xml')
+    return StreamingHttpResponse(_stream_shard(request, shard), content_type='application/xml')
+
+
+def _base_url(request):
+    return escape(request.build_absolute_uri('/')[:-1])
+
+
+def _stream_shard(request, shard):
+    base = _base_url(request)
+    template = []
+    touched = cache.get(_touched_key(shard))
+
+    def emit(chunk):
+        template.append(chunk)
+        return chunk.replace('{base}', base)
+
+    yield emit(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n')
+    size = shard_size()
+    rows = (
+        Article.objects.published()
+        .filter(pk__gt=shard * size, pk__lte=(shard + 1) * size)
+        .order_by('pk')
+        .values_list('pk', 'slug', 'updated_at')
+    )
+    last_pk = 0
+    while True:
+        # Keyset scan in bounded batches; nothing holds the whole shard
+        batch = list(rows.filter(pk__gt=last_pk)[:FETCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        yield emit(''.join(
+            f'<url><loc>{{base}}{escape(reverse("article_detail", kwargs={"slug": slug}))}</loc>'
+            f'<lastmod>{updated_at.isoformat()}</lastmod>'
+            f'<changefreq>weekly</changefreq><priority>0.8</priority></url>\n'
+            for _pk, slug, updated_at in batch
+        ))
+    yield emit('</urlset>\n')
+    # Only reached when the whole shard was sent; skip the store if an
+    # article in the shard changed while it was being generated
+    if cache.get(_touched_key(shard)) == touched:
+        cache.set(_shard_key(shard), ''.join(template), None)
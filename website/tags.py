@@ -0,0 +1,63 @@
+"""Tag popularity, ranked over published articles.
+
+A tag's score is the number of published articles carrying it. With
+`POPULAR_TAGS_HALF_LIFE_DAYS` set, each article instead counts
+``0.5 ** (age_in_days / half_life)``, so tags on recent articles rise above
+ones that were only popular years ago. The ranking is cached until a tag
+or an article changes (see `signals.py`); `POPULAR_TAGS_TIMEOUT` bounds
+how long the decay weights can drift.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from taggit.models import Tag
+
+CACHE_KEY = 'tags:popular'
+
+
+def half_life_days():
+    return getattr(settings, 'POPULAR_TAGS_HALF_LIFE_DAYS', None) or None
+
+
+def rank_tags(limit, half_life=None, today=None):
+    """Return up to `limit` Tag objects with a `score`, most popular first."""
+    published = Tag.objects.filter(article__is_published=True).order_by()
+    if not half_life:
+        tags = list(
+            published.annotate(score=Count('article', distinct=True))
+            .order_by('-score', 'name')[:limit]
+        )
+        for tag in tags:
+            tag.score = float(tag.score)
+        return tags
+
+    # One row per tag and publication day keeps the decay arithmetic out of
+    # SQL (portable) without pulling every tagged article into Python.
+    today = today or timezone.localdate()
+    scores = defaultdict(float)
+    rows = published.values_list('pk', TruncDate('article__created_at')).annotate(n=Count('article'))
+    for pk, day, count in rows:
+        age = max((today - day).days, 0)
+        scores[pk] += count * 0.5 ** (age / half_life)
+    tags = list(Tag.objects.filter(pk__in=scores))
+    for tag in tags:
+        tag.score = scores[tag.pk]
+    tags.sort(key=lambda tag: (-tag.score, tag.name))
+    return tags[:limit]
+
+
+def popular_tags():
+    """The cached top `POPULAR_TAGS_LIMIT` tags, ranked on first use."""
+    tags = cache.get(CACHE_KEY)
+    if tags is None:
+        tags = rank_tags(getattr(settings, 'POPULAR_TAGS_LIMIT', 10), half_life_days())
+        cache.set(CACHE_KEY, tags, getattr(settings, 'POPULAR_TAGS_TIMEOUT', 3600))
+    return tags
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,48 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from website.images import sources
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', **attrs):
+    """Render an ImageField value as a <picture> with WebP and JPEG srcsets.
+
+    Usage: {% responsive_image article.featured_image alt=article.title sizes="(min-width: 992px) 33vw, 100vw" class="card-img-top" %}
+    Extra keyword arguments become attributes of the <img>; images are
+    lazy-loaded unless `loading` is given. Falls back to a plain <img>
+    while any derivative is missing (e.g. generation failed).
+    """
+    if not image:
+        return ''
+    width, height, derivatives = sources(image.name, image.storage)
+    if not (width and height):
+        # Original unreadable here; the model's fields are the best guess
+        instance, field = image.instance, image.field
+        width = getattr(instance, field.width_field, None) if field.width_field else None
+        height = getattr(instance, field.height_field, None) if field.height_field else None
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    if width and height:
+        attrs.update(width=width, height=height)
+    img_attrs = format_html_join('', ' {}="{}"', attrs.items())
+
+    if not derivatives:
+        return format_html('<img src="{}" alt="{}"{}>', image.url, alt, img_attrs)
+
+    url = image.storage.url
+
+    def srcset(ext, original=None):
+        candidates = [f'{url(names[ext])} {target_width}w' for target_width, _h, names in derivatives]
+        if original:
+            candidates.append(f'{original} {width}w')
+        return ', '.join(candidates)
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        srcset('webp'), sizes,
+        image.url, srcset('jpg', image.url), sizes, alt, img_attrs,
+    )
@@ -1,5 +1,47 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from email import message_from_bytes
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, OperationalError, close_old_connections, connection
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import Count, Q
+from django.middleware.csrf import get_token
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core.allowlist import IPAllowlist
+from core.db_routing import STICKY_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, replica_reads
+from core.middleware import AdminIPRestrictionMiddleware, RequestTimingMiddleware
+
+from . import benchmarks, images, newsletter, page_cache, ratelimit, sitemaps, tags
+from .context_processors import popular_tags
+from .models import Article, Comment, Like, Newsletter, NewsletterDelivery, NewsletterIssue
+from .newsletter import Dispatcher
+from .pagination import InvalidCursor, decode_cursor, paginate_articles
+from .search import SQLiteFTS5Backend, search_articles
+from .text import estimate_read_time, html_to_text, make_excerpt, reading_stats
+from .view_counter import ViewCounter, view_counter
 
 
 class PolicyPagesTests(TestCase):
@@ -17,3 +59,1549 @@ class PolicyPagesTests(TestCase):
 		resp = self.client.get(reverse('cookie_policy'))
 		self.assertEqual(resp.status_code, 200)
 		self.assertContains(resp, 'Cookie Policy')
+
+
+def tearDownModule():
+	# Views recorded by detail-page requests must not be flushed at exit
+	view_counter.discard()
+
+
+def make_article(slug, **kwargs):
+	fields = {
+		'title': slug.replace('-', ' ').title(),
+		'category': 'finance',
+		'body': '<p>Body text.</p>',
+		'is_published': True,
+	}
+	fields.update(kwargs)
+	return Article.objects.create(slug=slug, **fields)
+
+
+class ArticleSearchTests(TestCase):
+	def test_title_match_ranks_above_body_match(self):
+		make_article('body-hit', title='Weekly notes', body='<p>Some words about inflation here.</p>')
+		make_article('title-hit', title='Inflation outlook', body='<p>Prices and more.</p>')
+		results = search_articles('inflation')
+		self.assertEqual([a.slug for a in results], ['title-hit', 'body-hit'])
+
+	def test_snippet_is_highlighted_and_escaped(self):
+		make_article('snippet', body='<p>Bonds &amp; <b>yields</b> rose while &lt;script&gt; stayed put.</p>')
+		article = search_articles('yields')[0]
+		self.assertIn('<mark>yields</mark>', article.search_snippet)
+		self.assertIn('&lt;script&gt;', article.search_snippet)
+
+	def test_index_follows_tags_publish_state_and_delete(self):
+		article = make_article('tagged')
+		self.assertEqual(search_articles('stablecoin'), [])
+		article.tags.add('stablecoin')
+		self.assertEqual([a.pk for a in search_articles('stablecoin')], [article.pk])
+		article.is_published = False
+		article.save()
+		self.assertEqual(search_articles('stablecoin'), [])
+		article.is_published = True
+		article.save()
+		article.delete()
+		self.assertEqual(search_articles('stablecoin'), [])
+
+	def test_category_filter_and_prefix_match(self):
+		make_article('fin', title='Mortgage rates', category='finance')
+		make_article('re', title='Mortgage demand', category='real_estate')
+		results = search_articles('mortg', category='real_estate')
+		self.assertEqual([a.slug for a in results], ['re'])
+
+	def test_build_match_neutralises_query_syntax(self):
+		self.assertEqual(SQLiteFTS5Backend.build_match('AI "OR" -crypto*'), '"AI" "OR" "crypto"*')
+		self.assertEqual(SQLiteFTS5Backend.build_match('!!!'), '')
+		self.assertEqual(search_articles('"unbalanced'), [])
+
+	def test_rebuild_command_reindexes_everything(self):
+		make_article('one', title='Liquidity crunch')
+		make_article('two', title='Liquidity returns')
+		with connection.cursor() as cursor:
+			cursor.execute('DELETE FROM website_article_fts')
+		self.assertEqual(search_articles('liquidity'), [])
+		out = StringIO()
+		call_command('rebuild_search_index', batch_size=1, stdout=out)
+		self.assertIn('Indexed 2 articles', out.getvalue())
+		self.assertEqual(len(search_articles('liquidity')), 2)
+
+	def test_article_list_uses_search(self):
+		make_article('match', title='Tokenized treasuries')
+		make_article('other', title='Office vacancies')
+		resp = self.client.get(reverse('article_list'), {'q': 'treasuries'})
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual([a.slug for a in resp.context['articles']], ['match'])
+
+	def test_database_backend_fallback(self):
+		make_article('fallback', title='Fallback search')
+		with self.settings(SEARCH_BACKEND='website.search.DatabaseSearchBackend'):
+			self.assertEqual([a.slug for a in search_articles('fallback')], ['fallback'])
+
+
+class KeysetPaginationTests(TestCase):
+	def setUp(self):
+		self.articles = [make_article(f'page-{i}') for i in range(5)]
+		# Two rows share a timestamp so the id tie-breaker is exercised
+		Article.objects.filter(pk=self.articles[2].pk).update(created_at=self.articles[1].created_at)
+		self.expected = list(
+			Article.objects.order_by('-created_at', '-id').values_list('slug', flat=True)
+		)
+
+	def walk(self, cursor=None, attr='next_cursor'):
+		seen = []
+		while True:
+			page = paginate_articles(Article.objects.filter(is_published=True), cursor, 2)
+			seen.append([a.slug for a in page])
+			cursor = getattr(page, attr)
+			if cursor is None:
+				return seen, page
+
+	def test_forward_and_backward_walks_cover_every_row_once(self):
+		pages, last = self.walk()
+		self.assertEqual(sum(pages, []), self.expected)
+		self.assertEqual([len(p) for p in pages], [2, 2, 1])
+		back, first = self.walk(last.previous_cursor, 'previous_cursor')
+		self.assertEqual(sum(reversed(back), []), self.expected[:4])
+		self.assertFalse(first.has_previous)
+		self.assertTrue(first.has_next)
+
+	def test_cursor_is_stable_when_new_articles_are_published(self):
+		first = paginate_articles(Article.objects.all(), None, 2)
+		make_article('breaking-news')
+		second = paginate_articles(Article.objects.all(), first.next_cursor, 2)
+		self.assertEqual([a.slug for a in second], self.expected[2:4])
+
+	def test_bad_cursor(self):
+		with self.assertRaises(InvalidCursor):
+			decode_cursor('not-a-cursor')
+		resp = self.client.get(reverse('article_list'), {'cursor': 'bogus'})
+		self.assertRedirects(resp, reverse('article_list'))
+
+	def test_article_list_pages_with_settings(self):
+		with self.settings(ARTICLES_PER_PAGE=3):
+			resp = self.client.get(reverse('article_list'))
+			page = resp.context['page_obj']
+			self.assertEqual(len(page), 3)
+			self.assertContains(resp, 'rel="next"')
+			resp = self.client.get(reverse('article_list'), {'cursor': page.next_cursor})
+			self.assertEqual([a.slug for a in resp.context['articles']], self.expected[3:])
+			self.assertFalse(resp.context['show_featured'])
+
+	def test_search_results_paginate_in_rank_order(self):
+		for article in Article.objects.all():
+			article.title = 'Yield curve'
+			article.save()
+		with self.settings(ARTICLES_PER_PAGE=2):
+			first = self.client.get(reverse('article_list'), {'q': 'yield'}).context['page_obj']
+			second = self.client.get(
+				reverse('article_list'), {'q': 'yield', 'cursor': first.next_cursor}
+			).context['page_obj']
+		ranked = [a.slug for a in search_articles('yield')]
+		self.assertEqual([a.slug for a in first] + [a.slug for a in second], ranked[:4])
+		self.assertEqual(decode_cursor(second.previous_cursor)[1], 'prev')
+
+
+class QueryBudgetMixin:
+	"""Fail a test when a view runs more SQL queries than its budget.
+
+	The failure message lists every query so the offending one is easy to
+	spot. Use `assertQueryBudget` around a request, or `get_within_budget`
+	for the common GET case.
+	"""
+
+	def assertQueryBudget(self, budget, func, *args, **kwargs):
+		with CaptureQueriesContext(connection) as ctx:
+			result = func(*args, **kwargs)
+		if len(ctx.captured_queries) > budget:
+			queries = '\n'.join(
+				f'{i}. {q["sql"]}' for i, q in enumerate(ctx.captured_queries, start=1)
+			)
+			self.fail(f'{len(ctx.captured_queries)} queries, budget is {budget}:\n{queries}')
+		return result
+
+	def get_within_budget(self, budget, url, data=None):
+		resp = self.assertQueryBudget(budget, self.client.get, url, data)
+		self.assertEqual(resp.status_code, 200)
+		return resp
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+	# POPULAR_TAGS is lazy, so pages that don't show it cost no tag query
+	HOME_BUDGET = 2
+	LIST_BUDGET = 3
+	DETAIL_BUDGET = 4
+
+	def populate(self, count):
+		for i in range(count):
+			article = make_article(f'budget-{count}-{i}', category=('finance', 'trade')[i % 2])
+			article.tags.add('markets', f'tag-{i}')
+
+	def test_home_budget_is_independent_of_article_count(self):
+		self.populate(2)
+		self.get_within_budget(self.HOME_BUDGET, reverse('home'))
+		self.populate(12)
+		self.get_within_budget(self.HOME_BUDGET, reverse('home'))
+
+	def test_article_list_budget_is_independent_of_article_count(self):
+		self.populate(2)
+		self.get_within_budget(self.LIST_BUDGET, reverse('article_list'))
+		self.populate(12)
+		resp = self.get_within_budget(self.LIST_BUDGET, reverse('article_list'))
+		self.assertContains(resp, 'tag-10')
+		self.get_within_budget(
+			self.LIST_BUDGET, reverse('article_list_by_category', args=['trade'])
+		)
+		self.get_within_budget(self.LIST_BUDGET, reverse('article_list'), {'q': 'budget'})
+
+	def test_article_detail_budget(self):
+		self.populate(1)
+		self.get_within_budget(
+			self.DETAIL_BUDGET, reverse('article_detail', args=['budget-1-0'])
+		)
+
+	def test_budget_failure_lists_queries(self):
+		with self.assertRaisesMessage(AssertionError, 'budget is 0'):
+			self.assertQueryBudget(0, Article.objects.count)
+
+
+class LatestPerCategoryTests(QueryBudgetMixin, TestCase):
+	def setUp(self):
+		for i in range(4):
+			make_article(f'fin-{i}', category='finance')
+		make_article('tech-0', category='technology')
+		make_article('draft', category='technology', is_published=False)
+
+	def expected(self):
+		return {
+			'finance': ['fin-3', 'fin-2', 'fin-1'],
+			'technology': ['tech-0'],
+		}
+
+	def slugs(self, grouped):
+		return {cat: [a.slug for a in arts] for cat, arts in grouped.items()}
+
+	def test_single_window_query(self):
+		grouped = self.assertQueryBudget(1, Article.objects.published().latest_per_category, 3)
+		self.assertEqual(self.slugs(grouped), self.expected())
+
+	def test_fallback_without_window_functions(self):
+		with mock.patch.object(connection.features, 'supports_over_clause', False):
+			grouped = Article.objects.published().latest_per_category(3)
+		self.assertEqual(self.slugs(grouped), self.expected())
+
+	def test_home_sections(self):
+		resp = self.client.get(reverse('home'))
+		self.assertEqual(
+			[a.slug for a in resp.context['latest_articles']],
+			['tech-0', 'fin-3', 'fin-2', 'fin-1', 'fin-0'],
+		)
+		self.assertEqual([a.slug for a in resp.context['finance_articles']], self.expected()['finance'])
+		self.assertEqual(resp.context['trade_articles'], [])
+
+
+class ExcerptTests(TestCase):
+	def test_extractor_keeps_words_and_drops_markup(self):
+		value = (
+			'<p>Fin<b>tech</b> &amp; banks</p><script>var x = 1;</script>'
+			'<ul><li>one</li><li>two</li></ul><!-- note -->end'
+		)
+		self.assertEqual(html_to_text(value), 'Fintech & banks one two end')
+		self.assertEqual(make_excerpt(value, words=3), 'Fintech & banks…')
+		self.assertEqual(make_excerpt('', words=3), '')
+
+	def test_excerpt_is_built_on_save(self):
+		article = make_article('teaser', body='<p>' + 'word ' * 100 + '</p>')
+		self.assertEqual(article.excerpt, ' '.join(['word'] * 40) + '…')
+		article.summary = '<p>Short <em>summary</em></p>'
+		article.save(update_fields=['summary'])
+		self.assertEqual(Article.objects.get(pk=article.pk).excerpt, 'Short summary')
+
+	def test_listing_queries_never_read_the_body(self):
+		make_article('listed', body='<p>unique-body-marker</p>')
+		for url in (reverse('home'), reverse('article_list')):
+			with CaptureQueriesContext(connection) as ctx:
+				resp = self.client.get(url)
+			self.assertContains(resp, 'unique-body-marker')  # via the excerpt
+			article_queries = [q['sql'] for q in ctx.captured_queries if 'FROM "website_article"' in q['sql']]
+			self.assertTrue(article_queries)
+			for sql in article_queries:
+				self.assertNotIn('"website_article"."body"', sql)
+
+	def test_backfill_command(self):
+		article = make_article('old', body='<p>Archived text</p>')
+		Article.objects.filter(pk=article.pk).update(excerpt='')
+		out = StringIO()
+		call_command('backfill_excerpts', batch_size=1, stdout=out)
+		self.assertIn('Updated 1 of 1', out.getvalue())
+		self.assertEqual(Article.objects.get(pk=article.pk).excerpt, 'Archived text')
+
+
+class ReadTimeTests(TestCase):
+	def test_stats_weight_code_and_images(self):
+		value = '<p>Fin<b>tech</b> is here</p><pre><code>x = 1</code></pre><img src="a.png"><p>end</p>'
+		self.assertEqual(reading_stats(value), (4, 3, 1))
+		self.assertEqual(estimate_read_time(''), 0)
+		self.assertEqual(estimate_read_time('<p>short</p>'), 1)
+		self.assertEqual(estimate_read_time('<p>' + 'word ' * 460 + '</p>'), 2)
+		# 115 code words read like 230 words of prose
+		self.assertEqual(estimate_read_time('<pre>' + 'x ' * 230 + '</pre>'), 2)
+		# Images add 12 + 11 + ... seconds on top of the text
+		self.assertEqual(estimate_read_time('<p>' + 'word ' * 230 + '</p>' + '<img>' * 6), 2)
+
+	def test_read_time_is_computed_on_save(self):
+		article = make_article('long-read', body='<p>' + 'word ' * 700 + '</p>')
+		self.assertEqual(article.read_time, 4)
+		article.body = '<p>tiny</p>'
+		article.save(update_fields=['body'])
+		self.assertEqual(Article.objects.get(pk=article.pk).read_time, 1)
+
+	def test_recompute_command(self):
+		for i in range(5):
+			make_article(f'archive-{i}', body='<p>' + 'word ' * 460 * (i + 1) + '</p>')
+		Article.objects.update(read_time=0)
+		for workers in (1, 2):
+			out = StringIO()
+			call_command('recompute_read_times', batch_size=2, workers=workers, stdout=out)
+			self.assertIn('of 5 read times', out.getvalue())
+			self.assertEqual(
+				list(Article.objects.order_by('pk').values_list('read_time', flat=True)),
+				[2, 4, 6, 8, 10],
+			)
+			Article.objects.update(read_time=0)
+
+
+@override_settings(
+	SITEMAP_SHARD_SIZE=2,
+	CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class SitemapTests(QueryBudgetMixin, TestCase):
+	def setUp(self):
+		cache.clear()
+		self.articles = [make_article(f'mapped-{i}') for i in range(5)]
+
+	def shard_url(self, article):
+		return reverse('sitemap_articles', args=[sitemaps.shard_for(article.pk)])
+
+	def test_index_lists_one_entry_per_shard(self):
+		resp = self.client.get(reverse('sitemap'))
+		self.assertEqual(resp.status_code, 200)
+		self.assertContains(resp, '/sitemap-static.xml')
+		shards = {sitemaps.shard_for(a.pk) for a in self.articles}
+		self.assertEqual(resp.content.decode().count('/sitemap-articles-'), len(shards))
+		self.assertIn('Last-Modified', resp)
+
+	def test_shard_is_streamed_then_served_from_cache(self):
+		url = self.shard_url(self.articles[0])
+		resp = self.client.get(url)
+		self.assertTrue(resp.streaming)
+		content = b''.join(resp.streaming_content).decode()
+		self.assertIn('http://testserver/article/mapped-0/', content)
+		cached = self.get_within_budget(0, url)
+		self.assertFalse(cached.streaming)
+		self.assertEqual(cached.content.decode(), content)
+
+	def test_article_change_regenerates_only_its_shard(self):
+		first, last = self.articles[0], self.articles[-1]
+		for article in (first, last):
+			b''.join(self.client.get(self.shard_url(article)).streaming_content)
+		first.is_published = False
+		with self.captureOnCommitCallbacks(execute=True):
+			first.save()
+		resp = self.client.get(self.shard_url(first))
+		self.assertNotIn(b'mapped-0/', b''.join(resp.streaming_content))
+		self.assertFalse(self.client.get(self.shard_url(last)).streaming)
+
+	def test_conditional_get_and_unknown_shard(self):
+		url = self.shard_url(self.articles[0])
+		last_modified = self.client.get(url)['Last-Modified']
+		resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+		self.assertEqual(resp.status_code, 304)
+		self.assertEqual(self.client.get(reverse('sitemap_articles', args=[99])).status_code, 404)
+
+
+class ImageDerivativeTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		media = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, media)
+		override = override_settings(MEDIA_ROOT=media, IMAGE_DERIVATIVE_WIDTHS=(100, 200, 800))
+		override.enable()
+		self.addCleanup(override.disable)
+
+	def upload(self, name='chart.png', size=(400, 300)):
+		buffer = BytesIO()
+		Image.new('RGBA', size, (20, 120, 200, 255)).save(buffer, 'PNG')
+		return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+	def test_upload_writes_derivatives_below_original_width(self):
+		article = make_article('pictured', featured_image=self.upload())
+		name = article.featured_image.name
+		self.assertEqual((article.featured_image_width, article.featured_image_height), (400, 300))
+		expected = [images.derivative_name(name, w, ext) for w in (100, 200) for ext in ('webp', 'jpg')]
+		for derivative in expected:
+			self.assertTrue(default_storage.exists(derivative), derivative)
+		self.assertFalse(default_storage.exists(images.derivative_name(name, 800, 'webp')))
+		with default_storage.open(images.derivative_name(name, 200, 'jpg')) as fh:
+			self.assertEqual(Image.open(fh).size, (200, 150))
+
+		article.featured_image = self.upload('replacement.png')
+		article.save()
+		self.assertFalse(default_storage.exists(expected[0]))
+
+	def test_tag_renders_srcset_with_dimensions(self):
+		article = make_article('pictured', featured_image=self.upload())
+		html = Template(
+			'{% load responsive_images %}{% responsive_image a.featured_image alt="Chart" sizes="50vw" class="card-img-top" %}'
+		).render(Context({'a': article}))
+		self.assertIn('type="image/webp"', html)
+		self.assertIn('.w100.webp 100w', html)
+		self.assertIn('.w200.jpg 200w', html)
+		self.assertIn(f'{article.featured_image.url} 400w', html)
+		self.assertIn('width="400" height="300"', html)
+		self.assertIn('class="card-img-top"', html)
+		self.assertIn('loading="lazy"', html)
+
+	def render(self, article):
+		return Template('{% load responsive_images %}{% responsive_image a.featured_image %}').render(
+			Context({'a': article}),
+		)
+
+	def test_tag_falls_back_to_img_without_derivatives(self):
+		with mock.patch('website.images.generate_derivatives', side_effect=OSError('disk full')), \
+				self.assertLogs('website.signals', 'ERROR'):
+			article = make_article('pictured', featured_image=self.upload())
+		html = self.render(article)
+		self.assertNotIn('<picture', html)
+		self.assertIn(f'src="{article.featured_image.url}"', html)
+		self.assertIn('width="400" height="300"', html)
+
+		call_command('generate_image_derivatives', workers=1, stdout=StringIO())
+		self.assertIn('.w200.webp 200w', self.render(article))
+
+	def test_exif_rotated_upload_uses_upright_dimensions(self):
+		exif = Image.Exif()
+		exif[images.EXIF_ORIENTATION] = 6  # rotated 90 degrees
+		buffer = BytesIO()
+		Image.new('RGB', (400, 300), (20, 120, 200)).save(buffer, 'JPEG', exif=exif)
+		upload = SimpleUploadedFile('phone.jpg', buffer.getvalue(), content_type='image/jpeg')
+		article = make_article('rotated', featured_image=upload)
+		with default_storage.open(images.derivative_name(article.featured_image.name, 200, 'jpg')) as fh:
+			self.assertEqual(Image.open(fh).size, (200, 267))
+		html = self.render(article)
+		self.assertIn('width="300" height="400"', html)
+		self.assertIn(f'{article.featured_image.url} 300w', html)
+
+	def test_backfill_skips_current_and_fills_dimensions(self):
+		article = make_article('pictured', featured_image=self.upload())
+		Article.objects.filter(pk=article.pk).update(featured_image_width=None, featured_image_height=None)
+		out = StringIO()
+		call_command('generate_image_derivatives', workers=1, stdout=out)
+		self.assertIn('Wrote 0 derivatives for 1 images', out.getvalue())
+		self.assertEqual(
+			Article.objects.values_list('featured_image_width', 'featured_image_height').get(pk=article.pk),
+			(400, 300),
+		)
+		make_article('pictured-2', featured_image=self.upload('second.png'))
+		out = StringIO()
+		call_command('generate_image_derivatives', workers=2, force=True, stdout=out)
+		self.assertIn('Wrote 8 derivatives for 2 images (0 failed)', out.getvalue())
+
+
+class CorpusGeneratorTests(TestCase):
+	def generate(self, prefix, **options):
+		options = {'articles': 30, 'comments_per_article': 3, 'likes': 4, 'subscribers': 10,
+			'authors': 3, 'batch_size': 7, 'prefix': prefix, **options}
+		call_command('generate_corpus', stdout=StringIO(), **options)
+		return Article.objects.filter(slug__startswith=f'{prefix}-').order_by('slug')
+
+	def test_generates_consistent_rows(self):
+		articles = self.generate('load')
+		self.assertEqual(articles.count(), 30)
+		self.assertEqual(Newsletter.objects.filter(email__startswith='load-reader-').count(), 10)
+		for article in articles.annotate(
+			likes_total=Count('likes', distinct=True),
+			approved=Count('comments', filter=Q(comments__is_approved=True), distinct=True),
+		):
+			self.assertEqual(article.like_count, article.likes_total)
+			self.assertEqual(article.approved_comment_count, article.approved)
+			self.assertTrue(article.excerpt)
+			self.assertGreater(article.read_time, 0)
+			self.assertLess(article.created_at, timezone.now() - timedelta(seconds=1))
+		self.assertTrue(Article.tags.through.objects.filter(object_id__in=articles.values('pk')).exists())
+		self.assertTrue(search_articles(articles.filter(is_published=True).first().title))
+		now = timezone.now()
+		self.assertFalse(articles.filter(updated_at__gt=now).exists())
+		self.assertFalse(Comment.objects.filter(created_at__gt=now).exists())
+		self.assertFalse(Like.objects.filter(created_at__gt=now).exists())
+
+	def test_refreshes_cached_popular_tags(self):
+		cache.clear()
+		self.assertEqual(tags.popular_tags(), [])
+		self.generate('tagged')
+		self.assertTrue(tags.popular_tags())
+
+	def test_same_seed_gives_same_corpus(self):
+		first = list(self.generate('one', seed=7).values_list('title', 'category', 'like_count'))
+		second = list(self.generate('two', seed=7).values_list('title', 'category', 'like_count'))
+		self.assertEqual(first, second)
+
+
+class BenchmarkTests(TestCase):
+	def test_baseline_round_trip_and_regression(self):
+		call_command('generate_corpus', articles=20, comments_per_article=2, likes=2, authors=2, stdout=StringIO())
+		baseline = Path(tempfile.mkdtemp()) / 'baseline.json'
+		self.addCleanup(shutil.rmtree, baseline.parent)
+		options = {'use_current_db': True, 'iterations': 3, 'warmup': 1, 'baseline': baseline, 'stdout': StringIO()}
+
+		call_command('benchmark', save_baseline=True, **options)
+		saved = json.loads(baseline.read_text())
+		self.assertEqual(set(saved['results']), set(benchmarks.scenarios()))
+		for row in saved['results'].values():
+			self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+
+		saved['results']['article_detail']['queries'] = 0
+		baseline.write_text(json.dumps(saved))
+		with self.assertRaisesMessage(CommandError, 'article_detail'):
+			call_command('benchmark', only=['article_detail'], **options)
+
+	def test_compare_uses_threshold(self):
+		baseline = {'home': {'p95_ms': 10.0, 'queries': 2}}
+		self.assertEqual(benchmarks.compare({'home': {'p95_ms': 12.0, 'queries': 2}}, baseline, 0.25), [])
+		self.assertEqual(len(benchmarks.compare({'home': {'p95_ms': 13.0, 'queries': 2}}, baseline, 0.25)), 1)
+
+
+class RequestTimingTests(TestCase):
+	def timing(self, resp):
+		return dict(
+			(part.split(';')[0], part) for part in resp['Server-Timing'].split(', ')
+		)
+
+	@override_settings(
+		PAGE_CACHE_ENABLED=True,
+		CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+	)
+	def test_server_timing_header(self):
+		cache.clear()
+		make_article('timed')
+		with CaptureQueriesContext(connection) as ctx:
+			resp = self.client.get(reverse('article_detail', args=['timed']))
+		timing = self.timing(resp)
+		self.assertIn(f'SQL ({len(ctx.captured_queries)} queries)', timing['db'])
+		self.assertRegex(timing['tpl'], r'dur=\d+\.\d')
+		self.assertRegex(timing['cache'], r'Cache \d+ hits / [1-9]\d* misses')
+		self.assertIn('total', timing)
+
+	def test_cache_reads_are_counted_once(self):
+		location = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, location)
+
+		def view(request):
+			for alias in ('default', 'files'):
+				backend = caches[alias]
+				backend.set('present', 1)
+				backend.get('present')
+				backend.get('absent')
+				# get_many() goes through get() on both backends
+				backend.get_many(['present', 'absent'])
+			return HttpResponse()
+
+		with self.settings(CACHES={
+			'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'timing'},
+			'files': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+		}):
+			resp = RequestTimingMiddleware(view)(RequestFactory().get('/'))
+		self.assertIn('Cache 4 hits / 4 misses', self.timing(resp)['cache'])
+
+	@override_settings(REQUEST_TIMING_SLOW_MS=0.001)
+	def test_slow_requests_are_logged_with_queries(self):
+		make_article('timed')
+		with self.assertLogs('core.request_timing', 'WARNING') as logs:
+			self.client.get(reverse('article_detail', args=['timed']))
+		self.assertIn('GET /article/timed/', logs.output[0])
+		self.assertIn('website_article', logs.output[0])
+
+	@override_settings(REQUEST_TIMING_ENABLED=False)
+	def test_disabled_middleware_is_not_installed(self):
+		resp = self.client.get(reverse('home'))
+		self.assertNotIn('Server-Timing', resp)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PopularTagsTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+
+	def tag(self, slug, names, days_old=0, **kwargs):
+		article = make_article(slug, **kwargs)
+		article.tags.add(*names)
+		if days_old:
+			Article.objects.filter(pk=article.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+		return article
+
+	def test_ranked_by_published_usage(self):
+		self.tag('t1', ['bonds', 'stocks'])
+		self.tag('t2', ['stocks'])
+		self.tag('t3', ['crypto', 'bonds', 'stocks'], is_published=False)
+		self.tag('t4', ['crypto'], is_published=False)
+		ranked = tags.popular_tags()
+		self.assertEqual([(t.name, t.score) for t in ranked], [('stocks', 2.0), ('bonds', 1.0)])
+
+	def test_half_life_favours_recent_tags(self):
+		self.tag('old1', ['legacy'], days_old=360)
+		self.tag('old2', ['legacy'], days_old=360)
+		self.tag('new', ['fresh'])
+		self.assertEqual([t.name for t in tags.rank_tags(10)], ['legacy', 'fresh'])
+		ranked = tags.rank_tags(10, half_life=30)
+		self.assertEqual([t.name for t in ranked], ['fresh', 'legacy'])
+		self.assertAlmostEqual(ranked[0].score, 1.0)
+		self.assertAlmostEqual(ranked[1].score, 2 * 0.5 ** 12)
+
+	def test_cached_until_tags_or_articles_change(self):
+		article = self.tag('c1', ['alpha'])
+		self.assertEqual([t.name for t in tags.popular_tags()], ['alpha'])
+		with self.assertNumQueries(0):
+			tags.popular_tags()
+
+		with self.captureOnCommitCallbacks(execute=True):
+			article.tags.add('beta')
+		self.assertEqual({t.name for t in tags.popular_tags()}, {'alpha', 'beta'})
+
+		tag = article.tags.get(name='beta')
+		tag.name = 'gamma'
+		tag.save()
+		self.assertEqual({t.name for t in tags.popular_tags()}, {'alpha', 'gamma'})
+
+		article.is_published = False
+		with self.captureOnCommitCallbacks(execute=True):
+			article.save()
+		self.assertEqual(tags.popular_tags(), [])
+
+	def test_context_value_is_lazy(self):
+		self.tag('lazy', ['alpha'])
+		with self.assertNumQueries(0):
+			context = popular_tags(RequestFactory().get('/'))
+		self.assertIsNone(cache.get(tags.CACHE_KEY))
+		self.assertEqual([t.name for t in context['POPULAR_TAGS']], ['alpha'])
+		self.assertEqual(len(cache.get(tags.CACHE_KEY)), 1)
+
+
+class CSVExportTests(TestCase):
+	def setUp(self):
+		self.admin_user = User.objects.create_superuser('exporter', 'exporter@example.com', 'pw')
+		Newsletter.objects.create(email='a@example.com', name='Ann, "A"')
+		Newsletter.objects.create(email='b@example.com', is_active=False)
+
+	def admin_request(self):
+		request = RequestFactory().post('/')
+		request.user = self.admin_user
+		return request
+
+	def test_admin_action_streams_rows(self):
+		from django.contrib.admin.sites import site
+		model_admin = site._registry[Newsletter]
+		resp = model_admin.export_as_csv(self.admin_request(), Newsletter.objects.all())
+		self.assertTrue(resp.streaming)
+		self.assertIn('subscribers_exporter.csv', resp['Content-Disposition'])
+		rows = list(csv.reader(b''.join(resp.streaming_content).decode().splitlines()))
+		self.assertEqual(rows[0], ['email', 'name', 'subscribed_at', 'is_active'])
+		self.assertEqual([r[:2] + r[3:] for r in rows[1:]], [
+			['a@example.com', 'Ann, "A"', 'True'],
+			['b@example.com', '', 'False'],
+		])
+
+	def test_comment_export(self):
+		from django.contrib.admin.sites import site
+		article = make_article('exported')
+		Comment.objects.create(article=article, name='Zed', email='z@example.com', body='Hi', is_approved=True)
+		resp = site._registry[Comment].export_as_csv(self.admin_request(), Comment.objects.all())
+		rows = list(csv.reader(b''.join(resp.streaming_content).decode().splitlines()))
+		self.assertEqual(rows[1][:4], ['exported', 'Zed', 'z@example.com', 'Hi'])
+
+	def test_formula_cells_are_quoted(self):
+		from django.contrib.admin.sites import site
+		article = make_article('exported')
+		Comment.objects.create(
+			article=article, name='=HYPERLINK("http://evil.example")', email='z@example.com',
+			body='-2+3', is_approved=True,
+		)
+		Comment.objects.create(article=article, name='Plain', email='p@example.com', body='a = b')
+		resp = site._registry[Comment].export_as_csv(self.admin_request(), Comment.objects.all())
+		rows = list(csv.reader(b''.join(resp.streaming_content).decode().splitlines()))
+		self.assertEqual(rows[1][1], '\'=HYPERLINK("http://evil.example")')
+		self.assertEqual(rows[1][3], "'-2+3")
+		self.assertEqual(rows[2][1:4], ['Plain', 'p@example.com', 'a = b'])
+
+	def test_command_writes_gzip(self):
+		tmp = Path(tempfile.mkdtemp())
+		self.addCleanup(shutil.rmtree, tmp)
+		out = StringIO()
+		call_command('export_csv', 'newsletter', str(tmp / 'subs.csv.gz'), '--active-only', '--chunk-size', '1', stdout=out)
+		self.assertIn('Exported 1 rows', out.getvalue())
+		with gzip.open(tmp / 'subs.csv.gz', 'rt', newline='') as fh:
+			rows = list(csv.reader(fh))
+		self.assertEqual([r[0] for r in rows], ['email', 'a@example.com'])
+
+		with self.assertRaises(CommandError):
+			call_command('export_csv', 'comment', str(tmp / 'c.csv.gz'), '--active-only', stdout=StringIO())
+
+
+class ImportSubscribersTests(TestCase):
+	def setUp(self):
+		self.tmp = Path(tempfile.mkdtemp())
+		self.addCleanup(shutil.rmtree, self.tmp)
+		Newsletter.objects.create(email='old@example.com', interests={'categories': ['finance']})
+
+	def run_import(self, name, content, *args):
+		path = self.tmp / name
+		if name.endswith('.gz'):
+			with gzip.open(path, 'wt') as fh:
+				fh.write(content)
+		else:
+			path.write_text(content)
+		out, err = StringIO(), StringIO()
+		call_command('import_subscribers', str(path), *args, stdout=out, stderr=err)
+		return out.getvalue(), err.getvalue()
+
+	def test_csv_import_merges_and_rejects(self):
+		out, err = self.run_import('subs.csv', '\n'.join([
+			'email,name,interests',
+			' New@Example.com ,Nina,technology;trade',
+			'OLD@example.com,Olly,technology',
+			'not-an-email,Bad,',
+			'new@example.com,,finance',
+			'',
+		]))
+		self.assertIn('4 rows', out)
+		self.assertIn('1 new, 1 merged, 0 unchanged, 1 repeated, 1 rejected', out)
+		self.assertIn('line 4', err)
+		new = Newsletter.objects.get(email='new@example.com')
+		self.assertEqual(new.name, 'Nina')
+		self.assertEqual(new.interests, {'categories': ['finance', 'technology', 'trade']})
+		old = Newsletter.objects.get(email='old@example.com')
+		self.assertEqual((old.name, old.interests), ('Olly', {'categories': ['finance', 'technology']}))
+
+	def test_gzipped_jsonl_and_rejects_file(self):
+		rejects = self.tmp / 'rejects.tsv'
+		lines = [json.dumps({'email': f'user{i}@example.com', 'interests': ['finance']}) for i in range(5)]
+		lines += ['{broken', json.dumps({'email': 'old@example.com', 'interests': {'categories': ['finance']}})]
+		out, _err = self.run_import('subs.jsonl.gz', '\n'.join(lines), '--rejects', str(rejects), '--batch-size', '2')
+		self.assertIn('5 new, 0 merged, 1 unchanged, 0 repeated, 1 rejected', out)
+		self.assertEqual(Newsletter.objects.count(), 6)
+		self.assertTrue(rejects.read_text().startswith('6\tinvalid JSON'))
+
+	def test_existing_mixed_case_address_is_merged(self):
+		Newsletter.objects.create(email='Foo@Example.com', interests={'categories': ['trade']})
+		out, _err = self.run_import('subs.csv', 'email,interests\nFoo@Example.com,finance\n')
+		self.assertIn('0 new, 1 merged', out)
+		self.assertEqual(Newsletter.objects.filter(email__iexact='foo@example.com').count(), 1)
+		sub = Newsletter.objects.get(email='Foo@Example.com')
+		self.assertEqual(sub.interests, {'categories': ['finance', 'trade']})
+
+	def test_dry_run_writes_nothing(self):
+		out, _err = self.run_import('subs.csv', 'email\nfresh@example.com\n', '--dry-run')
+		self.assertIn('1 new', out)
+		self.assertFalse(Newsletter.objects.filter(email='fresh@example.com').exists())
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+	def reply(self, line):
+		self.wfile.write(line.encode() + b'\r\n')
+
+	def handle(self):
+		server = self.server
+		server.connections += 1
+		self.reply('220 localhost ESMTP stand-in')
+		recipients = []
+		while True:
+			line = self.rfile.readline()
+			if not line:
+				return
+			command = line.decode().strip()
+			verb = command[:4].upper()
+			if verb in ('EHLO', 'HELO'):
+				self.reply('250 localhost')
+			elif verb == 'MAIL':
+				recipients = []
+				self.reply('250 OK')
+			elif verb == 'RCPT':
+				address = command.split(':', 1)[1].strip('<> ')
+				if server.refuse.get(address, 0) > 0:
+					server.refuse[address] -= 1
+					self.reply('550 mailbox unavailable')
+				else:
+					recipients.append(address)
+					self.reply('250 OK')
+			elif verb == 'DATA':
+				self.reply('354 go ahead')
+				data = []
+				while (chunk := self.rfile.readline()) not in (b'.\r\n', b''):
+					data.append(chunk)
+				server.messages.append((recipients, b''.join(data)))
+				self.reply('250 queued')
+			elif verb == 'QUIT':
+				self.reply('221 bye')
+				return
+			else:
+				self.reply('250 OK')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+	"""Just enough SMTP to count connections and collect messages."""
+	daemon_threads = True
+	allow_reuse_address = True
+
+	def __init__(self):
+		super().__init__(('127.0.0.1', 0), _SMTPHandler)
+		self.connections = 0
+		self.messages = []
+		self.refuse = {}
+		threading.Thread(target=self.serve_forever, daemon=True).start()
+
+	def settings(self):
+		return override_settings(
+			EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+			EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server_address[1],
+			EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_USE_TLS=False,
+		)
+
+	def stop(self):
+		self.shutdown()
+		self.server_close()
+
+
+class NewsletterDispatchTests(TestCase):
+	def setUp(self):
+		self.smtp = LocalSMTPServer()
+		self.addCleanup(self.smtp.stop)
+		smtp_settings = self.smtp.settings()
+		smtp_settings.enable()
+		self.addCleanup(smtp_settings.disable)
+		make_article('dispatch-finance', category='finance', title='Bond yields')
+		make_article('dispatch-trade', category='trade', title='Shipping rates')
+		for email, categories in [
+			('fin@example.com', ['finance']),
+			('trade@example.com', ['trade', 'technology']),
+			('both@example.com', ['finance', 'trade']),
+			('tech@example.com', ['technology']),
+		]:
+			Newsletter.objects.create(email=email, interests={'categories': categories})
+		Newsletter.objects.create(email='any@example.com')
+		Newsletter.objects.create(email='gone@example.com', is_active=False)
+		self.issue = NewsletterIssue.objects.create(subject='Weekly', categories=['finance', 'trade'])
+
+	def dispatch(self, **kwargs):
+		kwargs = {'connections': 2, 'rate': 0, 'retry_delay': 0, 'site_url': 'https://example.com', **kwargs}
+		return Dispatcher(self.issue, **kwargs).run()
+
+	def statuses(self):
+		return dict(self.issue.deliveries.values_list('subscriber__email', 'status'))
+
+	def test_segments_rendered_once_over_reused_connections(self):
+		with mock.patch('website.newsletter.render_segment', wraps=newsletter.render_segment) as render:
+			stats = self.dispatch(batch_size=2)
+		self.assertEqual(stats, {'sent': 4, 'failed': 0, 'skipped': 0})
+		self.assertEqual(self.smtp.connections, 2)
+		self.assertEqual(render.call_count, 3)  # finance, trade, finance+trade
+		self.assertEqual(set(self.statuses().values()), {NewsletterDelivery.SENT})
+		self.assertNotIn('tech@example.com', self.statuses())
+
+		bodies = {rcpts[0]: body for rcpts, body in self.smtp.messages}
+		self.assertIn(b'Shipping rates', bodies['trade@example.com'])
+		self.assertNotIn(b'Bond yields', bodies['trade@example.com'])
+		self.assertIn(b'Bond yields', bodies['any@example.com'])
+		message = message_from_bytes(bodies['any@example.com'])
+		self.assertEqual(
+			' '.join(message['List-Unsubscribe'].split()),
+			'<mailto:unsubscribe@fintechrp.com?subject=Unsubscribe%20any%40example.com>',
+		)
+		text = message.get_payload()[0].get_payload()
+		self.assertIn('To unsubscribe, email unsubscribe@fintechrp.com.', text)
+		self.assertIsNotNone(NewsletterIssue.objects.get(pk=self.issue.pk).sent_at)
+
+	def test_refused_recipient_is_retried(self):
+		self.smtp.refuse['fin@example.com'] = 1
+		stats = self.dispatch(max_attempts=2)
+		self.assertEqual(stats, {'sent': 4, 'failed': 1, 'skipped': 0})
+		delivery = self.issue.deliveries.get(subscriber__email='fin@example.com')
+		self.assertEqual((delivery.status, delivery.attempts), (NewsletterDelivery.SENT, 2))
+
+	def test_interrupted_run_resumes(self):
+		self.smtp.refuse['both@example.com'] = 5
+		self.dispatch(max_attempts=1)
+		self.assertEqual(self.statuses()['both@example.com'], NewsletterDelivery.FAILED)
+		# as if the run had died before recording this one
+		self.issue.deliveries.filter(subscriber__email='any@example.com').update(status=NewsletterDelivery.PENDING)
+		self.smtp.messages.clear()
+		self.smtp.refuse.clear()
+
+		out = StringIO()
+		call_command('send_newsletter', self.issue.pk, '--max-attempts', '2', '--retry-delay', '0', '--rate', '0', stdout=out)
+		self.assertEqual(sorted(r[0] for r, _body in self.smtp.messages), ['any@example.com', 'both@example.com'])
+		self.assertIn('Issue totals: 4 sent, 0 failed, 0 pending, 0 skipped', out.getvalue())
+
+	def test_resumed_run_skips_deactivated_subscribers(self):
+		self.smtp.refuse['both@example.com'] = 1
+		self.dispatch(max_attempts=1)
+		self.issue.deliveries.filter(subscriber__email='fin@example.com').update(status=NewsletterDelivery.PENDING)
+		Newsletter.objects.filter(email__in=['fin@example.com', 'both@example.com']).update(is_active=False)
+		self.smtp.messages.clear()
+
+		stats = self.dispatch(max_attempts=2)
+		self.assertEqual(stats, {'sent': 0, 'failed': 0, 'skipped': 2})
+		self.assertEqual(self.smtp.messages, [])
+		self.assertEqual(self.statuses()['fin@example.com'], NewsletterDelivery.SKIPPED)
+		self.assertEqual(self.statuses()['both@example.com'], NewsletterDelivery.SKIPPED)
+
+
+class SegmentIndexTests(TestCase):
+	def subscribe(self, email, *categories, **kwargs):
+		return Newsletter.objects.create(email=email, interests={'categories': list(categories)}, **kwargs)
+
+	def indexed(self, subscriber):
+		return set(subscriber.interest_rows.values_list('category', flat=True))
+
+	def test_index_follows_saves(self):
+		sub = self.subscribe('a@example.com', 'finance', 'astrology')
+		self.assertEqual(self.indexed(sub), {'finance'})
+		sub.interests['categories'].append('trade')
+		sub.save()
+		self.assertEqual(self.indexed(sub), {'finance', 'trade'})
+		sub.interests = {}
+		sub.save()
+		self.assertEqual(self.indexed(sub), set())
+
+	def test_segments_and_counts(self):
+		self.subscribe('a@example.com', 'real_estate', 'trade')
+		self.subscribe('b@example.com', 'trade')
+		self.subscribe('c@example.com', 'real_estate', 'trade', is_active=False)
+		self.subscribe('d@example.com', 'finance')
+		with self.assertNumQueries(1):
+			counts = newsletter.segment_counts()
+		self.assertEqual(counts, {'finance': 1, 'technology': 0, 'real_estate': 1, 'trade': 2})
+		both = newsletter.segment(['real_estate', 'trade'], match_all=True)
+		self.assertEqual(list(both.values_list('email', flat=True)), ['a@example.com'])
+		self.assertEqual(both.count(), 1)
+		self.assertEqual(newsletter.segment(['real_estate', 'finance']).count(), 2)
+		self.assertEqual(newsletter.segment(['trade'], active=False).count(), 3)
+
+	def test_bulk_import_is_indexed(self):
+		path = Path(tempfile.mkdtemp()) / 'subs.csv'
+		self.addCleanup(shutil.rmtree, path.parent)
+		path.write_text('email,interests\nx@example.com,finance;trade\n')
+		call_command('import_subscribers', str(path), stdout=StringIO())
+		self.assertEqual(self.indexed(Newsletter.objects.get(email='x@example.com')), {'finance', 'trade'})
+
+	def test_admin_shows_segment_sizes(self):
+		self.subscribe('a@example.com', 'trade')
+		admin_user = User.objects.create_superuser('segments', 'segments@example.com', 'pw')
+		self.client.force_login(admin_user)
+		resp = self.client.get(reverse('admin:website_newsletter_changelist'))
+		self.assertContains(resp, 'Trade (1)')
+		resp = self.client.get(reverse('admin:website_newsletter_changelist'), {'interest': 'finance'})
+		self.assertContains(resp, '0 newsletters')
+
+
+class AdminIPRestrictionTests(TestCase):
+	def middleware(self, allowed, proxies=0):
+		with override_settings(ADMIN_ALLOWED_IPS=allowed, TRUSTED_PROXY_COUNT=proxies, ADMIN_URL='panel/'):
+			return AdminIPRestrictionMiddleware(lambda request: HttpResponse('ok'))
+
+	def status(self, middleware, remote_addr, path='/panel/', xff=None):
+		extra = {'REMOTE_ADDR': remote_addr}
+		if xff is not None:
+			extra['HTTP_X_FORWARDED_FOR'] = xff
+		return middleware(RequestFactory().get(path, **extra)).status_code
+
+	def test_cidr_blocks_and_ipv6(self):
+		mw = self.middleware(['10.8.0.0/16', '192.168.1.7', '2001:db8::/32', 'localhost'])
+		self.assertEqual(self.status(mw, '10.8.255.1'), 200)
+		self.assertEqual(self.status(mw, '10.9.0.1'), 403)
+		self.assertEqual(self.status(mw, '192.168.1.7'), 200)
+		self.assertEqual(self.status(mw, '2001:db8:abcd::1'), 200)
+		self.assertEqual(self.status(mw, '::ffff:10.8.0.5'), 200)
+		self.assertEqual(self.status(mw, '::1'), 200)
+		self.assertEqual(self.status(mw, 'not-an-ip'), 403)
+		self.assertEqual(self.status(mw, '8.8.8.8', path='/about/'), 200)
+
+	def test_forwarded_for_needs_trusted_proxies(self):
+		direct = self.middleware(['203.0.113.0/24'])
+		# A spoofed header is ignored when no proxy is trusted
+		self.assertEqual(self.status(direct, '198.51.100.1', xff='203.0.113.5'), 403)
+
+		proxied = self.middleware(['203.0.113.0/24'], proxies=1)
+		self.assertEqual(self.status(proxied, '10.0.0.1', xff='203.0.113.5'), 200)
+		# The client prepended an allowed address; the proxy appended the real one
+		self.assertEqual(self.status(proxied, '10.0.0.1', xff='203.0.113.5, 198.51.100.1'), 403)
+		self.assertEqual(self.status(proxied, '203.0.113.5'), 403)
+
+	def test_default_allowlist_rejects_proxied_public_clients(self):
+		# nginx connects from loopback and forwards a public client address
+		misconfigured = self.middleware(settings.ADMIN_ALLOWED_IPS, proxies=0)
+		self.assertEqual(self.status(misconfigured, '127.0.0.1', xff='198.51.100.1'), 403)
+		self.assertEqual(self.status(misconfigured, '::1', xff='198.51.100.1'), 403)
+		default = self.middleware(settings.ADMIN_ALLOWED_IPS, proxies=settings.TRUSTED_PROXY_COUNT)
+		self.assertEqual(self.status(default, '127.0.0.1', xff='198.51.100.1'), 403)
+
+	def test_overlapping_ranges_are_merged(self):
+		allowlist = IPAllowlist(['10.0.0.0/8', '10.1.0.0/16', '11.0.0.0/8', '2001:db8::1'])
+		self.assertEqual(len(allowlist), 2)
+		self.assertIn('11.255.255.255', allowlist)
+		self.assertNotIn('12.0.0.0', allowlist)
+		self.assertNotIn('9.255.255.255', allowlist)
+
+	def test_invalid_entry_is_a_configuration_error(self):
+		with self.assertRaises(ImproperlyConfigured):
+			self.middleware(['10.0.0.0/33'])
+
+
+@override_settings(
+	CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+	RATE_LIMITS={'like': '3/m', 'comment': '2/m', 'contact': '2/h', 'newsletter': '2/h'},
+)
+class RateLimitTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.addCleanup(cache.clear)
+		make_article('limited')
+
+	def test_parse_rate(self):
+		self.assertEqual(ratelimit.parse_rate('10/m'), (10, 60))
+		self.assertEqual(ratelimit.parse_rate('5/10s'), (5, 10))
+		with self.assertRaises(ValueError):
+			ratelimit.parse_rate('10/week')
+
+	def test_check_warns_on_non_atomic_cache(self):
+		file_cache = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/unused'}
+		redis_cache = {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': 'redis://localhost:6379/1'}
+		with self.settings(DEBUG=False, CACHES={'default': file_cache}, RATE_LIMIT_CACHE_ALIAS='default'):
+			self.assertEqual([w.id for w in ratelimit.check_cache(None)], ['website.W001'])
+		with self.settings(DEBUG=True, CACHES={'default': file_cache}, RATE_LIMIT_CACHE_ALIAS='default'):
+			self.assertEqual(ratelimit.check_cache(None), [])
+		with self.settings(DEBUG=False, CACHES={'default': file_cache, 'ratelimit': redis_cache}, RATE_LIMIT_CACHE_ALIAS='ratelimit'):
+			self.assertEqual(ratelimit.check_cache(None), [])
+
+	def test_like_limited_with_json_429(self):
+		url = reverse('toggle_like', args=['limited'])
+		for _ in range(3):
+			self.assertEqual(self.client.post(url).status_code, 200)
+		with self.assertNumQueries(0):
+			resp = self.client.post(url)
+		self.assertEqual(resp.status_code, 429)
+		self.assertEqual(resp.json()['status'], 'error')
+		self.assertGreaterEqual(int(resp['Retry-After']), 1)
+		# Another visitor has its own bucket
+		self.assertEqual(self.client.post(url, REMOTE_ADDR='10.0.0.9').status_code, 200)
+		self.assertEqual(ratelimit.stats()['like'], {'allowed': 4, 'limited': 1})
+
+	@override_settings(TRUSTED_PROXY_COUNT=1)
+	def test_proxied_visitors_get_their_own_buckets(self):
+		url = reverse('toggle_like', args=['limited'])
+		# nginx connects from loopback for every visitor
+		for _ in range(3):
+			self.assertEqual(self.client.post(url, HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 200)
+		self.assertEqual(self.client.post(url, HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 429)
+		self.assertEqual(self.client.post(url, HTTP_X_FORWARDED_FOR='198.51.100.7').status_code, 200)
+		# A client-supplied entry left of the proxy's is ignored
+		resp = self.client.post(url, HTTP_X_FORWARDED_FOR='198.51.100.8, 203.0.113.5')
+		self.assertEqual(resp.status_code, 429)
+
+	def test_newsletter_ajax_gets_json_and_form_posts_plain_429(self):
+		url = reverse('newsletter_signup')
+		ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+		for i in range(2):
+			self.client.post(url, {'email': f'r{i}@example.com'}, **ajax)
+		resp = self.client.post(url, {'email': 'r9@example.com'}, **ajax)
+		self.assertEqual(resp.status_code, 429)
+		self.assertIn('retry_after', resp.json())
+		self.assertFalse(Newsletter.objects.filter(email='r9@example.com').exists())
+
+		resp = self.client.post(reverse('contact'), {'name': 'a', 'email': 'a@example.com', 'message': 'x'})
+		self.assertEqual(resp.status_code, 200)
+		self.client.post(reverse('contact'), {'name': 'a', 'email': 'a@example.com', 'message': 'x'})
+		resp = self.client.post(reverse('contact'), {'name': 'a', 'email': 'a@example.com', 'message': 'x'})
+		self.assertEqual((resp.status_code, resp['Content-Type']), (429, 'text/plain'))
+		# Reading the form is never limited
+		self.assertEqual(self.client.get(reverse('contact')).status_code, 200)
+
+	def test_logged_in_users_are_keyed_by_account(self):
+		user = User.objects.create_user('limited-user', password='pw')
+		self.client.force_login(user)
+		url = reverse('submit_comment', args=['limited'])
+		data = {'name': 'n', 'email': 'n@example.com', 'body': 'hi'}
+		self.assertEqual(self.client.post(url, data).status_code, 302)
+		self.assertEqual(self.client.post(url, data, REMOTE_ADDR='10.0.0.2').status_code, 302)
+		self.assertEqual(self.client.post(url, data, REMOTE_ADDR='10.0.0.3').status_code, 429)
+
+	def test_sliding_window_refills(self):
+		now = 60 * 16667 + 20.0  # 20s into a period
+		for _ in range(3):
+			self.assertTrue(ratelimit.hit('like', 'ip:x', now)[0])
+		allowed, retry_after = ratelimit.hit('like', 'ip:x', now)
+		self.assertFalse(allowed)
+		self.assertEqual(retry_after, 40)
+		# Early in the next period most of the old count still weighs in
+		self.assertFalse(ratelimit.hit('like', 'ip:x', now + 45)[0])
+		# A full period later the bucket is full again
+		self.assertTrue(ratelimit.hit('like', 'ip:x', now + 125)[0])
+
+	def test_disabled(self):
+		url = reverse('toggle_like', args=['limited'])
+		with self.settings(RATE_LIMIT_ENABLED=False):
+			for _ in range(5):
+				self.assertEqual(self.client.post(url).status_code, 200)
+
+
+class SQLiteProfileTests(TestCase):
+	def test_pragmas_applied_per_connection(self):
+		if not settings.SQLITE_TUNING:
+			self.skipTest('SQLITE_TUNING is off')
+		with connection.cursor() as cursor:
+			cursor.execute('PRAGMA busy_timeout')
+			self.assertEqual(cursor.fetchone()[0], settings.SQLITE_BUSY_TIMEOUT)
+			cursor.execute('PRAGMA synchronous')
+			self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+		self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_STICKY_SECONDS=10)
+class DbRoutingTests(TestCase):
+	def setUp(self):
+		self.router = PrimaryReplicaRouter()
+		self.factory = RequestFactory()
+
+	def routed(self, cookies=None, write=None, method='post'):
+		"""Run a fake replica_reads view through the middleware; return (read alias, response)."""
+		seen = {}
+
+		@replica_reads()
+		def view(request):
+			if write:
+				write()
+			seen['db'] = self.router.db_for_read(Article)
+			return HttpResponse('ok')
+
+		request = getattr(self.factory, method)('/')
+		request.COOKIES.update(cookies or {})
+		response = ReplicaRoutingMiddleware(view)(request)
+		return seen['db'], response
+
+	def test_reads_outside_a_request_use_the_primary(self):
+		with replica_reads():
+			self.assertIsNone(self.router.db_for_read(Article))
+
+	def test_only_replica_reads_views_use_a_replica(self):
+		db, response = self.routed()
+		self.assertEqual(db, 'replica_1')
+		self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+		def plain_view(request):
+			return HttpResponse(self.router.db_for_read(Article) or 'primary')
+		response = ReplicaRoutingMiddleware(plain_view)(self.factory.get('/'))
+		self.assertEqual(response.content, b'primary')
+
+	def subscribe(self):
+		Newsletter.objects.create(email='reader@example.com')
+
+	def test_write_pins_the_rest_of_the_request_and_sets_cookie(self):
+		db, response = self.routed(write=self.subscribe)
+		self.assertIsNone(db)
+		cookie = response.cookies[STICKY_COOKIE]
+		self.assertEqual(cookie['max-age'], 10)
+		self.assertTrue(cookie['httponly'])
+		self.assertGreater(float(cookie.value), time.time())
+
+	def test_writes_during_a_get_set_no_cookie(self):
+		db, response = self.routed(write=self.subscribe, method='get')
+		self.assertIsNone(db)
+		self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+	def test_view_count_flush_does_not_pin_the_reader(self):
+		make_article('flushed')
+		view_counter.discard()
+		view_counter.buffer.add('flushed')
+		with self.settings(VIEW_COUNT_FLUSH_INTERVAL=0):
+			db, response = self.routed(write=view_counter.maybe_flush, method='get')
+		self.assertEqual(db, 'replica_1')
+		self.assertNotIn(STICKY_COOKIE, response.cookies)
+		self.assertEqual(Article.objects.get(slug='flushed').view_count, 1)
+
+	def test_sticky_cookie_pins_reads_until_it_expires(self):
+		db, _response = self.routed(cookies={STICKY_COOKIE: str(int(time.time()) + 5)})
+		self.assertIsNone(db)
+		db, _response = self.routed(cookies={STICKY_COOKIE: str(int(time.time()) - 5)})
+		self.assertEqual(db, 'replica_1')
+		db, _response = self.routed(cookies={STICKY_COOKIE: 'junk'})
+		self.assertEqual(db, 'replica_1')
+
+	def test_replicas_are_never_migrated(self):
+		self.assertFalse(self.router.allow_migrate('replica_1', 'website'))
+		self.assertTrue(self.router.allow_migrate('default', 'website'))
+
+	@override_settings(DATABASE_REPLICAS=[])
+	def test_middleware_unused_without_replicas(self):
+		with self.assertRaises(MiddlewareNotUsed):
+			ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+
+@override_settings(
+	PAGE_CACHE_ENABLED=True,
+	CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class PageCacheTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.article = make_article('cached', category='real_estate')
+
+	def assertCache(self, url, expected, data=None):
+		resp = self.client.get(url, data)
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp['X-Page-Cache'], expected)
+		return resp
+
+	def test_anonymous_pages_are_cached_and_counted(self):
+		url = reverse('article_detail', args=['cached'])
+		self.assertCache(url, 'MISS')
+		resp = self.assertCache(url, 'HIT')
+		self.assertContains(resp, 'Cached')
+		self.assertCache(reverse('privacy_policy'), 'MISS')
+		self.assertEqual(page_cache.stats(), {'hits': 1, 'misses': 2})
+
+	def test_query_string_is_part_of_the_key(self):
+		url = reverse('article_list')
+		self.assertCache(url, 'MISS')
+		self.assertCache(url, 'MISS', {'q': 'cached'})
+		self.assertCache(url, 'HIT', {'q': 'cached'})
+
+	def test_logged_in_users_bypass_the_cache(self):
+		user = User.objects.create_user('reader', password='pw')
+		self.client.force_login(user)
+		resp = self.client.get(reverse('home'))
+		self.assertNotIn('X-Page-Cache', resp)
+
+	def test_article_save_drops_detail_home_and_category_lists(self):
+		urls = [
+			reverse('home'),
+			reverse('article_detail', args=['cached']),
+			reverse('article_list_by_category', args=['real-estate']),
+			reverse('article_list_by_category', args=['real_estate']),
+		]
+		other = reverse('article_list_by_category', args=['trade'])
+		for url in urls + [other]:
+			self.assertCache(url, 'MISS')
+		self.article.title = 'Updated'
+		with self.captureOnCommitCallbacks(execute=True):
+			self.article.save()
+		for url in urls:
+			self.assertCache(url, 'MISS')
+		self.assertCache(other, 'HIT')
+
+	def test_category_change_drops_old_and_new_lists(self):
+		old_list = reverse('article_list_by_category', args=['real_estate'])
+		self.assertCache(old_list, 'MISS')
+		article = Article.objects.get(pk=self.article.pk)
+		article.category = 'trade'
+		with self.captureOnCommitCallbacks(execute=True):
+			article.save()
+		self.assertCache(old_list, 'MISS')
+
+	def test_only_approved_comments_drop_the_article_page(self):
+		url = reverse('article_detail', args=['cached'])
+		self.assertCache(url, 'MISS')
+		with self.captureOnCommitCallbacks(execute=True):
+			comment = Comment.objects.create(article=self.article, name='A', email='a@example.com', body='Hi')
+		self.assertCache(url, 'HIT')
+		comment.is_approved = True
+		# Readers keep the committed page until the change commits
+		with self.captureOnCommitCallbacks(execute=True):
+			comment.save()
+			self.assertCache(url, 'HIT')
+		self.assertCache(url, 'MISS')
+
+	def test_like_drops_the_article_page(self):
+		url = reverse('article_detail', args=['cached'])
+		self.assertCache(url, 'MISS')
+		with self.captureOnCommitCallbacks(execute=True):
+			resp = self.client.post(reverse('toggle_like', args=['cached']))
+		self.assertEqual(resp.json()['likes_count'], 1)
+		self.assertCache(url, 'MISS')
+		self.assertCache(url, 'HIT')
+
+	def test_pages_with_csrf_tokens_or_messages_are_not_stored(self):
+		def form_view(request):
+			return HttpResponse(get_token(request))
+
+		view = page_cache.anonymous_page_cache(form_view)
+		for _ in range(2):
+			request = RequestFactory().get('/form/')
+			request.user = AnonymousUser()
+			self.assertEqual(view(request)['X-Page-Cache'], 'MISS')
+
+		self.client.post(reverse('newsletter_signup'), {'email': 'bad'})
+		resp = self.client.get(reverse('home'))
+		self.assertNotIn('X-Page-Cache', resp)
+		self.assertContains(resp, 'Please correct the errors')
+		self.assertCache(reverse('home'), 'MISS')
+		self.assertCache(reverse('home'), 'HIT')
+
+	def test_detail_page_carries_no_csrf_token(self):
+		resp = self.client.get(reverse('article_detail', args=['cached']))
+		self.assertNotIn('csrftoken', resp.cookies)
+		resp = self.client.get(reverse('csrf_cookie'))
+		self.assertEqual(resp.status_code, 204)
+		self.assertIn('csrftoken', resp.cookies)
+
+
+# Posts more likes than the limiter allows per minute across repeated runs
+@override_settings(RATE_LIMIT_ENABLED=False)
+class LikeCounterTests(TestCase):
+	def setUp(self):
+		self.article = make_article('liked')
+		self.url = reverse('toggle_like', args=['liked'])
+
+	def like_count(self):
+		return Article.objects.values_list('like_count', flat=True).get(pk=self.article.pk)
+
+	def test_toggle_updates_counter_with_the_like_row(self):
+		resp = self.client.post(self.url)
+		self.assertEqual(resp.json(), {'liked': True, 'likes_count': 1})
+		resp = self.client.post(self.url)
+		self.assertEqual(resp.json(), {'liked': False, 'likes_count': 0})
+		self.assertFalse(Like.objects.exists())
+
+	def test_explicit_actions_are_idempotent(self):
+		for _ in range(3):
+			resp = self.client.post(self.url, {'action': 'like'})
+			self.assertEqual(resp.json(), {'liked': True, 'likes_count': 1})
+		for _ in range(2):
+			resp = self.client.post(self.url, {'action': 'unlike'})
+			self.assertEqual(resp.json(), {'liked': False, 'likes_count': 0})
+		self.assertEqual(self.like_count(), 0)
+
+	def test_users_and_ips_are_counted_separately(self):
+		user = User.objects.create_user('fan', password='pw')
+		Like.objects.set_liked(self.article.pk, True, ip_address='10.0.0.1')
+		Like.objects.set_liked(self.article.pk, True, user=user)
+		self.assertEqual(Like.objects.set_liked(self.article.pk, True, ip_address='10.0.0.2'), (True, 3))
+		self.assertEqual(self.like_count(), 3)
+
+	@override_settings(TRUSTED_PROXY_COUNT=1)
+	def test_proxied_anonymous_visitors_like_separately(self):
+		# Both requests reach Django from nginx on 127.0.0.1
+		resp = self.client.post(self.url, {'action': 'like'}, HTTP_X_FORWARDED_FOR='203.0.113.5')
+		self.assertEqual(resp.json(), {'liked': True, 'likes_count': 1})
+		resp = self.client.post(self.url, {'action': 'like'}, HTTP_X_FORWARDED_FOR='198.51.100.7')
+		self.assertEqual(resp.json(), {'liked': True, 'likes_count': 2})
+		self.assertEqual(
+			set(Like.objects.values_list('ip_address', flat=True)), {'203.0.113.5', '198.51.100.7'},
+		)
+
+	def test_unknown_article_and_get(self):
+		self.assertEqual(self.client.post(reverse('toggle_like', args=['nope'])).status_code, 404)
+		self.assertEqual(self.client.get(self.url).status_code, 405)
+
+	def test_reconcile_command_fixes_drift(self):
+		Like.objects.set_liked(self.article.pk, True, ip_address='10.0.0.1')
+		Like.objects.create(article=self.article, ip_address='10.0.0.2')  # bypasses the counter
+		other = make_article('stale')
+		Article.objects.filter(pk=other.pk).update(like_count=7)
+		out = StringIO()
+		call_command('reconcile_like_counts', dry_run=True, stdout=out)
+		self.assertIn('2 articles', out.getvalue())
+		call_command('reconcile_like_counts', batch_size=1, stdout=StringIO())
+		self.assertEqual(self.like_count(), 2)
+		self.assertEqual(Article.objects.get(pk=other.pk).like_count, 0)
+
+
+class CommentPaginationTests(QueryBudgetMixin, TestCase):
+	def setUp(self):
+		self.article = make_article('discussed')
+		self.url = reverse('article_comments', args=['discussed'])
+
+	def add_comments(self, count, approved=True):
+		for i in range(count):
+			Comment.objects.create(
+				article=self.article, name=f'reader-{i}', email='r@example.com',
+				body=f'comment body {i}', is_approved=approved,
+			)
+
+	def comment_count(self):
+		return Article.objects.values_list('approved_comment_count', flat=True).get(pk=self.article.pk)
+
+	def test_counter_follows_approval_and_deletes(self):
+		self.add_comments(2)
+		self.add_comments(1, approved=False)
+		self.assertEqual(self.comment_count(), 2)
+		pending = Comment.objects.get(is_approved=False)
+		pending.is_approved = True
+		pending.save()
+		pending.save()  # saving again without a change must not double count
+		self.assertEqual(self.comment_count(), 3)
+		pending.is_approved = False
+		pending.save()
+		self.assertEqual(self.comment_count(), 2)
+		Comment.objects.filter(is_approved=True).first().delete()
+		self.assertEqual(self.comment_count(), 1)
+
+	@override_settings(COMMENTS_PER_PAGE=5)
+	def test_detail_renders_first_page_only(self):
+		self.add_comments(12)
+		resp = self.get_within_budget(
+			QueryBudgetTests.DETAIL_BUDGET, reverse('article_detail', args=['discussed'])
+		)
+		self.assertContains(resp, 'Comments (12)')
+		self.assertContains(resp, 'comment body 4')
+		self.assertNotContains(resp, 'comment body 5')
+		self.assertContains(resp, 'id="load-comments"')
+
+	@override_settings(COMMENTS_PER_PAGE=5)
+	def test_endpoint_walks_every_approved_comment_in_order(self):
+		self.add_comments(12)
+		self.add_comments(1, approved=False)
+		bodies, cursor = [], None
+		while True:
+			data = self.client.get(self.url, {'cursor': cursor} if cursor else {}).json()
+			bodies += [c['body'] for c in data['comments']]
+			cursor = data['next_cursor']
+			if not cursor:
+				break
+		self.assertEqual(bodies, [f'comment body {i}' for i in range(12)])
+
+	@override_settings(COMMENTS_PER_PAGE=5)
+	def test_html_fragment_and_errors(self):
+		self.add_comments(6)
+		first = self.client.get(self.url).json()
+		data = self.client.get(self.url, {'cursor': first['next_cursor'], 'format': 'html'}).json()
+		self.assertIn('comment body 5', data['html'])
+		self.assertIsNone(data['next_cursor'])
+		self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 400)
+		self.assertEqual(self.client.get(reverse('article_comments', args=['nope'])).status_code, 404)
+
+
+class ConcurrentLikeTests(TransactionTestCase):
+	def test_parallel_toggles_keep_counter_consistent(self):
+		article = make_article('viral')
+		errors = []
+		barrier = threading.Barrier(8)
+
+		def worker(n):
+			barrier.wait()
+			try:
+				# Half the threads hammer the same visitor, the rest are unique
+				ip = '10.0.0.1' if n % 2 else f'10.0.1.{n}'
+				for _ in range(5):
+					for attempt in range(50):
+						try:
+							Like.objects.set_liked(article.pk, True, ip_address=ip)
+							break
+						except OperationalError:
+							# SQLite's shared-cache test database reports
+							# lock contention instead of waiting
+							time.sleep(0.001 * attempt)
+					else:
+						raise AssertionError(f'{ip} never got the write lock')
+			except Exception as exc:
+				errors.append(exc)
+			finally:
+				close_old_connections()
+
+		threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(errors, [])
+		article.refresh_from_db()
+		self.assertEqual(Like.objects.filter(article=article).count(), 5)
+		self.assertEqual(article.like_count, 5)
+
+
+@override_settings(
+	VIEW_COUNT_DEDUPE_WINDOW=0,
+	CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ViewCounterTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		view_counter.discard()
+		self.article = make_article('read-me')
+		self.other = make_article('read-me-too')
+		self.url = reverse('article_detail', args=['read-me'])
+
+	def view_counts(self):
+		return dict(Article.objects.values_list('slug', 'view_count'))
+
+	def test_detail_views_are_buffered_then_written_in_one_update(self):
+		for _ in range(3):
+			self.client.get(self.url)
+		self.client.get(reverse('article_detail', args=['read-me-too']))
+		self.client.get(reverse('article_detail', args=['missing']))
+		self.assertEqual(self.view_counts(), {'read-me': 0, 'read-me-too': 0})
+		with CaptureQueriesContext(connection) as ctx:
+			self.assertEqual(view_counter.flush(), 4)
+		updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+		self.assertEqual(len(updates), 1)
+		self.assertEqual(self.view_counts(), {'read-me': 3, 'read-me-too': 1})
+		self.assertEqual(view_counter.flush(), 0)
+
+	def test_interval_triggers_flush(self):
+		with self.settings(VIEW_COUNT_FLUSH_INTERVAL=0):
+			self.client.get(self.url)
+		self.assertEqual(self.view_counts()['read-me'], 1)
+
+	def test_repeat_views_are_deduplicated_within_window(self):
+		with self.settings(VIEW_COUNT_DEDUPE_WINDOW=60):
+			self.client.get(self.url)
+			self.client.get(self.url)
+			self.client.get(self.url, REMOTE_ADDR='10.1.1.1')
+		view_counter.flush()
+		self.assertEqual(self.view_counts()['read-me'], 2)
+
+	def test_failed_flush_keeps_deltas(self):
+		self.client.get(self.url)
+		with mock.patch('website.view_counter.write_deltas', side_effect=DatabaseError):
+			with self.assertRaises(DatabaseError):
+				view_counter.flush()
+		view_counter.flush()
+		self.assertEqual(self.view_counts()['read-me'], 1)
+
+	def test_shared_cache_buffer_survives_a_new_worker(self):
+		with self.settings(VIEW_COUNT_BUFFER='cache'):
+			worker = ViewCounter()
+			worker.record('read-me')
+			worker.record('read-me')
+			worker.record('read-me-too')
+			restarted = ViewCounter()
+			self.assertEqual(restarted.flush(), 3)
+			self.assertEqual(restarted.flush(), 0)
+		self.assertEqual(self.view_counts(), {'read-me': 2, 'read-me-too': 1})
+
+	def test_shared_cache_buffer_counts_views_after_a_flush(self):
+		with self.settings(VIEW_COUNT_BUFFER='cache'):
+			view_counter.record('read-me')
+			self.assertEqual(view_counter.flush(), 1)
+			view_counter.record('read-me')
+			view_counter.record('read-me')
+			self.assertEqual(view_counter.flush(), 2)
+		self.assertEqual(self.view_counts()['read-me'], 3)
+
+	@override_settings(VIEW_COUNT_DEDUPE_WINDOW=60, TRUSTED_PROXY_COUNT=1)
+	def test_dedupe_keys_on_the_forwarded_client(self):
+		# Behind the proxy every visitor shares REMOTE_ADDR
+		self.client.get(self.url, HTTP_X_FORWARDED_FOR='203.0.113.5')
+		self.client.get(self.url, HTTP_X_FORWARDED_FOR='203.0.113.5')
+		self.client.get(self.url, HTTP_X_FORWARDED_FOR='198.51.100.7')
+		view_counter.flush()
+		self.assertEqual(self.view_counts()['read-me'], 2)
+
+	def test_flush_command(self):
+		with self.settings(VIEW_COUNT_BUFFER='cache'):
+			self.client.get(self.url)
+			out = StringIO()
+			call_command('flush_view_counts', stdout=out)
+		self.assertIn('Flushed 1 views', out.getvalue())
+
+	def test_flush_command_refuses_local_buffer(self):
+		with self.settings(VIEW_COUNT_BUFFER='local'), self.assertRaises(CommandError):
+			call_command('flush_view_counts')
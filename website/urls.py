@@ -7,6 +7,7 @@ urlpatterns = [
     path("about/", views.about, name="about"),
     path("contact/", views.contact, name="contact"),
     path("newsletter/signup/", views.newsletter_signup, name="newsletter_signup"),
+    path("csrf/", views.csrf_cookie, name="csrf_cookie"),
 
     # article list pages
     path("articles/", views.article_list, name="article_list"),
@@ -15,6 +16,7 @@ urlpatterns = [
     # single article
     path("article/<slug:slug>/", views.article_detail, name="article_detail"),
     path("article/<slug:slug>/comment/", views.submit_comment, name="submit_comment"),
+    path("article/<slug:slug>/comments/", views.article_comments, name="article_comments"),
     path("article/<slug:slug>/like/", views.toggle_like, name="toggle_like"),
     
     # policy pages
@@ -0,0 +1,240 @@
+"""Write-behind counting for `Article.view_count`.
+
+Views are buffered and written to the database as one batched UPDATE per
+flush interval instead of one UPDATE per page view, which would serialize
+SQLite writers.
+
+Two buffers are available via `settings.VIEW_COUNT_BUFFER`:
+
+- ``'local'`` (default): an in-process counter per worker. Each worker
+  flushes its own deltas when the interval has passed and again at exit,
+  so a crashed worker loses at most one interval of views. The
+  `flush_view_counts` command can't reach these buffers.
+- ``'cache'``: deltas live in the shared cache, so they survive worker
+  restarts and any worker, or the `flush_view_counts` command, can flush
+  them. Use it with a persistent cache such as Redis.
+
+With `VIEW_COUNT_DEDUPE_WINDOW` set, repeat views of an article from the
+same session (or IP, see `TRUSTED_PROXY_COUNT`) within that many seconds
+are not counted.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, models, transaction
+from django.db.models import Case, F, When
+
+from core.allowlist import visitor_ip
+from core.db_routing import unrouted
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'viewcount:dirty'
+LOCK_KEY = 'viewcount:lock'
+
+
+def _pending_key(slug):
+    return f'viewcount:pending:{slug}'
+
+
+def write_deltas(deltas):
+    """Add `{slug: n}` to view_count with a single UPDATE statement."""
+    from .models import Article
+
+    deltas = {slug: n for slug, n in deltas.items() if n > 0}
+    if not deltas:
+        return 0
+    with transaction.atomic():
+        return Article.objects.filter(slug__in=deltas).update(view_count=Case(
+            *[When(slug=slug, then=F('view_count') + n) for slug, n in deltas.items()],
+            default=F('view_count'),
+            output_field=models.PositiveIntegerField(),
+        ))
+
+
+class LocalBuffer:
+    def __init__(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, slug):
+        with self._lock:
+            self._pending[slug] += 1
+
+    def flush(self):
+        with self._lock:
+            deltas, self._pending = self._pending, Counter()
+        if not deltas:
+            return 0
+        try:
+            write_deltas(deltas)
+        except DatabaseError:
+            # Keep the views for the next attempt rather than dropping them
+            with self._lock:
+                self._pending.update(deltas)
+            raise
+        return sum(deltas.values())
+
+
+class CacheBuffer:
+    """Deltas kept in the shared cache under one key per article, plus an
+    index of which articles have pending views."""
+
+    def add(self, slug):
+        key = _pending_key(slug)
+        if cache.add(key, 1, None):
+            self._mark_dirty(slug)
+            return
+        try:
+            pending = cache.incr(key)
+        except ValueError:  # expired between add() and incr()
+            cache.add(key, 1, None)
+            pending = 1
+        # A flush leaves the key at 0 and takes it out of the dirty index
+        if pending == 1:
+            self._mark_dirty(slug)
+
+    def _mark_dirty(self, slug):
+        with self._locked():
+            dirty = cache.get(DIRTY_KEY) or set()
+            dirty.add(slug)
+            cache.set(DIRTY_KEY, dirty, None)
+
+    def _locked(self):
+        return _CacheLock(LOCK_KEY)
+
+    def flush(self):
+        with self._locked():
+            dirty = cache.get(DIRTY_KEY) or set()
+            cache.delete(DIRTY_KEY)
+        if not dirty:
+            return 0
+        keys = {_pending_key(slug): slug for slug in dirty}
+        deltas = {keys[key]: n for key, n in cache.get_many(keys).items()}
+        try:
+            write_deltas(deltas)
+        except DatabaseError:
+            with self._locked():
+                cache.set(DIRTY_KEY, (cache.get(DIRTY_KEY) or set()) | dirty, None)
+            raise
+        # Subtract what was written; views recorded meanwhile stay pending
+        for slug, n in deltas.items():
+            try:
+                remaining = cache.decr(_pending_key(slug), n)
+            except ValueError:
+                continue
+            if remaining > 0:
+                self._mark_dirty(slug)
+        return sum(deltas.values())
+
+
+class _CacheLock:
+    """Best-effort mutex built on the atomic `cache.add()`."""
+
+    def __init__(self, key, timeout=5):
+        self.key = key
+        self.timeout = timeout
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while not cache.add(self.key, 1, self.timeout) and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def __exit__(self, *exc):
+        cache.delete(self.key)
+
+
+class ViewCounter:
+    def __init__(self):
+        self._buffer = None
+        self._last_flush = time.monotonic()
+        self._flush_lock = threading.Lock()
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            kind = getattr(settings, 'VIEW_COUNT_BUFFER', 'local')
+            self._buffer = CacheBuffer() if kind == 'cache' else LocalBuffer()
+        return self._buffer
+
+    def record(self, slug, visitor=None):
+        """Count one view of the article with `slug`.
+
+        `visitor` (a session key or IP) enables de-duplication when
+        `VIEW_COUNT_DEDUPE_WINDOW` is set. Returns True if counted.
+        """
+        window = getattr(settings, 'VIEW_COUNT_DEDUPE_WINDOW', 0)
+        if window and visitor:
+            digest = hashlib.md5(f'{slug}:{visitor}'.encode()).hexdigest()
+            if not cache.add(f'viewcount:seen:{digest}', 1, window):
+                return False
+        self.buffer.add(slug)
+        self.maybe_flush()
+        return True
+
+    def maybe_flush(self):
+        interval = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 30)
+        if time.monotonic() - self._last_flush < interval:
+            return
+        # Only one thread per process flushes; the others keep serving
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            # Flushes piggyback on a reader's request; they aren't its writes
+            with unrouted():
+                self.buffer.flush()
+        except DatabaseError:
+            logger.exception('View count flush failed; deltas kept for the next attempt')
+        finally:
+            self._flush_lock.release()
+
+    def flush(self):
+        """Write every pending view now. Returns the number of views written."""
+        with self._flush_lock:
+            self._last_flush = time.monotonic()
+            return self.buffer.flush()
+
+    def discard(self):
+        """Forget buffered views without writing them (used by tests)."""
+        self._buffer = None
+
+
+view_counter = ViewCounter()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Graceful worker restarts (e.g. gunicorn max_requests) keep their views
+    if view_counter._buffer is not None:
+        try:
+            view_counter.flush()
+        except Exception:
+            logger.exception('View count flush at exit failed')
+
+
+def count_article_view(view):
+    """Record a view for successful responses of an article detail view.
+
+    Applied outside the page cache so cached hits are counted too.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method == 'GET' and response.status_code == 200:
+            session = getattr(request, 'session', None)
+            visitor = (session.session_key if session is not None else None) or visitor_ip(
+                request.META, getattr(settings, 'TRUSTED_PROXY_COUNT', 1),
+            )
+            view_counter.record(kwargs['slug'], visitor)
+        return response
+
+    return wrapper
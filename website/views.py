@@ -1,52 +1,55 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, Http404
+from django.template.loader import render_to_string
+from django.http import HttpResponse, JsonResponse, Http404
 from django.contrib import messages
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import ensure_csrf_cookie
+from core.allowlist import visitor_ip
+from core.db_routing import replica_reads
 from .models import ContactMessage, Article, Newsletter, Comment, Like
 from .forms import ContactForm, NewsletterForm, CommentForm
+from .page_cache import anonymous_page_cache
+from .ratelimit import rate_limit
+from .pagination import InvalidCursor, keyset_paginate, paginate_articles, paginate_by_created
+from .search import search_articles
+from .view_counter import count_article_view
 
 
+@anonymous_page_cache
+@replica_reads()
 def home(request):
     """
     Homepage:
     - latest_articles: latest 5 published articles overall
     - *_articles: up to 3 per category for the Topics section
+
+    Everything comes from one windowed query: the newest 5 per category
+    always contain the newest 5 overall.
     """
-    latest_articles = Article.objects.filter(is_published=True).order_by("-created_at")[:5]
-
-    finance_articles = Article.objects.filter(
-        is_published=True, category="finance"
-    ).order_by("-created_at")[:3]
-
-    technology_articles = Article.objects.filter(
-        is_published=True, category="technology"
-    ).order_by("-created_at")[:3]
-
-    real_estate_articles = Article.objects.filter(
-        is_published=True, category="real_estate"
-    ).order_by("-created_at")[:3]
-
-    trade_articles = Article.objects.filter(
-        is_published=True, category="trade"
-    ).order_by("-created_at")[:3]
-
-    return render(
-        request,
-        "website/home.html",
-        {
-            "latest_articles": latest_articles,
-            "finance_articles": finance_articles,
-            "technology_articles": technology_articles,
-            "real_estate_articles": real_estate_articles,
-            "trade_articles": trade_articles,
-        },
-    )
+    latest_count, per_category = 5, 3
+    sections = Article.objects.published().defer("body").latest_per_category(max(latest_count, per_category))
+
+    latest_articles = sorted(
+        (article for articles in sections.values() for article in articles),
+        key=lambda article: (article.created_at, article.pk),
+        reverse=True,
+    )[:latest_count]
+
+    context = {"latest_articles": latest_articles}
+    for code, _label in Article.CATEGORY_CHOICES:
+        context[f"{code}_articles"] = sections.get(code, [])[:per_category]
 
+    return render(request, "website/home.html", context)
 
 
 def about(request):
     return render(request, "website/about.html")
 
 
+@rate_limit('contact')
 def contact(request):
     if request.method == "POST":
         form = ContactForm(request.POST)
@@ -58,6 +61,7 @@ def contact(request):
     return render(request, "website/contact.html", {"form": form})
 
 
+@rate_limit('newsletter')
 def newsletter_signup(request):
     if request.method == "POST":
         form = NewsletterForm(request.POST)
@@ -74,28 +78,18 @@ def newsletter_signup(request):
             return redirect(request.META.get('HTTP_REFERER', 'home'))
     return redirect('home')
 
-from django.db.models import Q
-
 
+@anonymous_page_cache
+@replica_reads()
 def article_list(request, category_slug=None):
     """
     Show all published articles.
     If a category is in the URL, filter by that category only.
+    With ?q= the full-text index is searched and results come back ranked.
     """
-    qs = Article.objects.filter(is_published=True)
+    qs = Article.objects.published().for_cards()
     category_label = "All"
-
-    # Search support: ?q=search+terms
-    q = request.GET.get('q')
-    if q:
-        q = q.strip()
-        if q:
-            qs = qs.filter(
-                Q(title__icontains=q)
-                | Q(summary__icontains=q)
-                | Q(body__icontains=q)
-                | Q(tags__name__icontains=q)
-            ).distinct()
+    category = None
 
     # Normalize incoming category slug so both hyphen and underscore
     # versions work (e.g. 'real-estate' or 'real_estate'). Then map
@@ -110,32 +104,58 @@ def article_list(request, category_slug=None):
         }
         if normalized in allowed:
             qs = qs.filter(category=normalized)
+            category = normalized
             category_label = allowed[normalized]
 
+    # Search support: ?q=search+terms
+    q = request.GET.get('q')
+    if q:
+        q = q.strip()
+
+    # Keyset pagination: ?cursor= points at the boundary row of the
+    # previous page; a malformed token redirects back to page one.
+    cursor = request.GET.get('cursor')
+    per_page = settings.ARTICLES_PER_PAGE
+    try:
+        if q:
+            page_obj = keyset_paginate(
+                lambda **kw: search_articles(q, category=category, **kw),
+                lambda article: article.search_position,
+                cursor, per_page,
+            )
+        else:
+            page_obj = paginate_articles(qs, cursor, per_page)
+    except InvalidCursor:
+        return redirect(request.path + (f'?{urlencode({"q": q})}' if q else ''))
+
     return render(request, "website/article_list.html", {
-        "articles": qs,
+        "articles": page_obj.object_list,
+        "page_obj": page_obj,
+        "show_featured": category_label == "All" and not page_obj.has_previous,
         "category_label": category_label,
         "q": q,
     })
 
 
+@count_article_view
+@anonymous_page_cache
+@replica_reads()
 def article_detail(request, slug):
     """
     Show one article by slug.
     """
     article = get_object_or_404(Article, slug=slug, is_published=True)
-    # prepare comment form and approved comments
+    # prepare comment form and the first page of approved comments; the
+    # rest are fetched on demand from article_comments
     comment_form = CommentForm()
-    approved_comments = article.comments.filter(is_approved=True)
+    comments_page = _approved_comments_page(article, None)
 
-    # determine whether current visitor has liked this article
+    # determine whether current visitor has liked this article; anonymous
+    # pages are shared via the page cache, so their like state is kept
+    # client-side instead of being looked up by IP here
     user_liked = False
     if request.user.is_authenticated:
         user_liked = article.likes.filter(user=request.user).exists()
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-        if ip:
-            user_liked = article.likes.filter(ip_address=ip).exists()
 
     # compute absolute article url for share links (avoid calling methods in templates)
     try:
@@ -146,12 +166,45 @@ def article_detail(request, slug):
     return render(request, "website/article_detail.html", {
         "article": article,
         "comment_form": comment_form,
-        "comments": approved_comments,
+        "comments": comments_page,
         "user_liked": user_liked,
         "article_url": article_url,
     })
 
 
+def _approved_comments_page(article, cursor):
+    # Oldest first, scanning the (article, created_at) index
+    comments = article.comments.filter(is_approved=True).only('pk', 'article_id', 'name', 'body', 'created_at')
+    return paginate_by_created(comments, cursor, settings.COMMENTS_PER_PAGE, newest_first=False)
+
+
+@anonymous_page_cache
+def article_comments(request, slug):
+    """
+    One page of approved comments for an article, after `?cursor=`.
+
+    Returns JSON by default, or the rendered comment list with
+    `?format=html` (used by the "Load more" button on the detail page).
+    """
+    article = get_object_or_404(Article.objects.only('pk', 'slug'), slug=slug, is_published=True)
+    try:
+        page = _approved_comments_page(article, request.GET.get("cursor"))
+    except InvalidCursor:
+        return JsonResponse({"error": "Invalid cursor."}, status=400)
+
+    if request.GET.get("format") == "html":
+        html = render_to_string("includes/comment_list.html", {"comments": page}, request=request)
+        return JsonResponse({"html": html, "next_cursor": page.next_cursor})
+    return JsonResponse({
+        "comments": [
+            {"id": c.pk, "name": c.name, "body": c.body, "created_at": c.created_at.isoformat()}
+            for c in page
+        ],
+        "next_cursor": page.next_cursor,
+    })
+
+
+@rate_limit('comment')
 def submit_comment(request, slug):
     """Handle comment form POST for an article."""
     article = get_object_or_404(Article, slug=slug, is_published=True)
@@ -174,37 +227,42 @@ def submit_comment(request, slug):
     return redirect(article.get_absolute_url() + '#comments')
 
 
+@rate_limit('like', json=True)
 def toggle_like(request, slug):
-    """AJAX endpoint to toggle like for an article. Returns JSON with new count."""
+    """AJAX endpoint to toggle like for an article. Returns JSON with new count.
+
+    POST `action=like` or `action=unlike` to set the state explicitly (safe
+    to retry); without it the current state is flipped.
+    """
     if request.method != 'POST':
         return JsonResponse({'error': 'POST required'}, status=405)
-    article = get_object_or_404(Article, slug=slug, is_published=True)
+    article_id = (
+        Article.objects.filter(slug=slug, is_published=True)
+        .values_list('pk', flat=True).first()
+    )
+    if article_id is None:
+        raise Http404("Article not found")
     user = request.user if request.user.is_authenticated else None
-    ip = request.META.get('REMOTE_ADDR')
-
-    liked = False
-    if user:
-        like = Like.objects.filter(article=article, user=user).first()
-        if like:
-            like.delete()
-            liked = False
-        else:
-            Like.objects.create(article=article, user=user)
-            liked = True
-    else:
-        # fallback to IP-based likes for anonymous users
-        like = Like.objects.filter(article=article, ip_address=ip).first()
-        if like:
-            like.delete()
-            liked = False
-        else:
-            Like.objects.create(article=article, ip_address=ip)
-            liked = True
+    # fallback to IP-based likes for anonymous users; behind nginx
+    # REMOTE_ADDR is the proxy, so take the forwarded client address
+    ip = None if user else visitor_ip(request.META, settings.TRUSTED_PROXY_COUNT)
+    if user is None and not ip:
+        return JsonResponse({'error': 'Cannot identify visitor'}, status=400)
+
+    liked = {'like': True, 'unlike': False}.get(request.POST.get('action'))
+    liked, likes_count = Like.objects.set_liked(article_id, liked=liked, user=user, ip_address=ip)
+    return JsonResponse({'liked': liked, 'likes_count': likes_count})
+
 
-    return JsonResponse({'liked': liked, 'likes_count': article.likes.count()})
+@never_cache
+@ensure_csrf_cookie
+def csrf_cookie(request):
+    """Set the CSRF cookie for pages served from the anonymous page cache."""
+    return HttpResponse(status=204)
 
 # ...existing code...
 
+@anonymous_page_cache
 def policy_page(request, policy_type):
     """
     Render the appropriate policy template based on policy_type.